@@ -1,10 +1,16 @@
+import multiprocessing
 import sys
 from PySide6.QtWidgets import QApplication
 from ui.main_window import MainWindow
+from datasource import datasource_container
 
 if __name__ == '__main__':
+    # 打包后的程序启动 XLSX 写入子进程时需要
+    multiprocessing.freeze_support()
     app = QApplication(sys.argv)
     app.setStyle("Fusion")  # 设置为Fusion风格
+    # 退出时关闭连接池
+    app.aboutToQuit.connect(datasource_container.shutdown)
     window = MainWindow()
     window.show()
     sys.exit(app.exec())
\ No newline at end of file
@@ -0,0 +1,347 @@
+"""
+导出性能基准：用本地替身数据源运行真实的导出流程(MySQLDataSource/PostgreSQLDataSource 的拉取和写入代码)，
+报告不同行数、列组合、输出格式、批次策略和流水线下的吞吐量与峰值内存，便于离线比较性能改动.
+
+用法:
+    python -m benchmarks.export_benchmark
+    python -m benchmarks.export_benchmark --rows 100000 --profiles mixed --formats xlsx csv parquet
+    python -m benchmarks.export_benchmark --source sqlite --batches fixed-500 adaptive --json results.jsonl
+"""
+import argparse
+import itertools
+import json
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass, asdict
+from decimal import Decimal
+from typing import Any, Dict, List, Optional
+
+from benchmarks.fake_dbapi import PROFILES, FakeColumn, FakeDatabase
+from core.export_context import ExportContext, STAGE_FETCH, STAGE_WRITE, STAGE_CLOSE
+from core.models import DataBase, DataBaseType, ExportScript, OutputFormat, OutputCompression, ColumnType, \
+    TotalRowsStrategy
+from datasource.datasource import MySQLDataSource, PostgreSQLDataSource
+from utils import output_writer
+
+# 输出格式选项 -> (格式, 压缩方式)
+FORMATS = {
+    'xlsx': (OutputFormat.XLSX, OutputCompression.NONE),
+    'csv': (OutputFormat.CSV, OutputCompression.NONE),
+    'csv.gz': (OutputFormat.CSV, OutputCompression.GZIP),
+    'csv.zst': (OutputFormat.CSV, OutputCompression.ZSTD),
+    'tsv': (OutputFormat.TSV, OutputCompression.NONE),
+    'parquet': (OutputFormat.PARQUET, OutputCompression.SNAPPY),
+}
+# 批次策略选项 -> (初始批次大小, 是否自适应)
+BATCHES = {
+    'fixed-500': (500, False),
+    'fixed-5000': (5000, False),
+    'adaptive': (500, True),
+}
+# 流水线选项 -> 分区数(1 表示单连接流式拉取)
+PIPELINES = {
+    'stream': 1,
+    'partitioned': 4,
+}
+TABLE_NAME = "bench"
+
+
+def _inverse_type_map(datasource_class: type) -> Dict[ColumnType, Any]:
+    """列类型 -> 该数据源的驱动类型码(取映射表中第一个)，未映射的类型(字符串)使用 None"""
+    type_codes = {}
+    for type_code, column_type in datasource_class._COLUMN_TYPE_MAP.items():
+        type_codes.setdefault(column_type, type_code)
+    return type_codes
+
+
+class FakeMySQLDataSource(MySQLDataSource):
+    """MySQL 导出流程，连接替换为内存中的假游标"""
+
+    def __init__(self, fake_database: FakeDatabase) -> None:
+        self.fake_database = fake_database
+        super().__init__(DataBase(name="benchmark", type=DataBaseType.MYSQL, host="localhost", port="0"))
+
+    def _get_connection(self) -> Optional[Any]:
+        return self.fake_database.connect()
+
+
+class FakePostgreSQLDataSource(PostgreSQLDataSource):
+    """PostgreSQL 导出流程(游标方式)，连接替换为内存中的假游标"""
+
+    def __init__(self, fake_database: FakeDatabase) -> None:
+        self.fake_database = fake_database
+        super().__init__(DataBase(name="benchmark", type=DataBaseType.POSTGRESQL, host="localhost", port="0"))
+
+    def _get_connection(self) -> Optional[Any]:
+        return self.fake_database.connect()
+
+
+class _SQLiteCursor:
+    """把 %(name)s 形式的参数转换为 sqlite3 的 :name，使 SQLite 可以执行导出流程生成的 SQL"""
+
+    def __init__(self, connection: sqlite3.Connection):
+        self.cursor = connection.cursor()
+        self.itersize = 2000
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.cursor.close()
+
+    def execute(self, sql: str, params: Optional[dict] = None):
+        sql = re.sub(r'%\((\w+)\)s', r':\1', sql)
+        if params is not None:
+            sql = sql.replace('%%', '%')
+        self.cursor.execute(sql, params or {})
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.cursor, name)
+
+
+class _SQLiteConnection:
+    def __init__(self, path: str):
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+
+    def cursor(self, *args, name: Optional[str] = None) -> _SQLiteCursor:
+        return _SQLiteCursor(self.connection)
+
+    def ping(self, reconnect: bool = False):
+        pass
+
+    def cancel(self):
+        self.connection.interrupt()
+
+    def rollback(self):
+        self.connection.rollback()
+
+    def close(self):
+        self.connection.close()
+
+
+class SQLiteDataSource(MySQLDataSource):
+    """
+    MySQL 导出流程，连接替换为本地 SQLite 文件(包含真实的 SQL 执行和驱动取数开销).
+
+    注意：SQLite 不返回列类型，按列定义确定写入类型；Decimal 和日期以文本存储
+    """
+
+    def __init__(self, path: str, columns: List[FakeColumn]) -> None:
+        self.path = path
+        self.columns = columns
+        super().__init__(DataBase(name="benchmark", type=DataBaseType.MYSQL, host="localhost", port="0"))
+
+    def _get_connection(self) -> Optional[Any]:
+        return _SQLiteConnection(self.path)
+
+    def _set_statement_timeout(self, connection: _SQLiteConnection, seconds: int):
+        pass
+
+    def _cancel_query(self, connection: _SQLiteConnection):
+        connection.cancel()
+
+    def _column_types(self, description: Any) -> List[ColumnType]:
+        return [column.column_type for column in self.columns]
+
+    @staticmethod
+    def create_database(path: str, fake_database: FakeDatabase):
+        """把假数据写入 SQLite 表"""
+        columns = fake_database.columns
+        connection = sqlite3.connect(path)
+        try:
+            connection.execute(f"DROP TABLE IF EXISTS {TABLE_NAME}")
+            connection.execute(f"CREATE TABLE {TABLE_NAME} ({', '.join(column.name for column in columns)})")
+            placeholders = ', '.join('?' * len(columns))
+            for start in range(1, fake_database.rows + 1, 10000):
+                count = min(10000, fake_database.rows + 1 - start)
+                rows = [tuple(str(value) if isinstance(value, Decimal) or hasattr(value, 'isoformat') else value
+                              for value in row) for row in fake_database.make_rows(start, count)]
+                connection.executemany(f"INSERT INTO {TABLE_NAME} VALUES ({placeholders})", rows)
+            connection.commit()
+        finally:
+            connection.close()
+
+
+@dataclass
+class BenchmarkResult:
+    source: str
+    rows: int
+    profile: str
+    output_format: str
+    batch: str
+    pipeline: str
+    seconds: float
+    rows_per_second: float
+    mb_per_second: float  # 输出文件大小 / 耗时
+    output_bytes: int
+    peak_memory_mb: Optional[float]  # tracemalloc 统计的 Python 分配峰值，未测量时为 None
+    fetch_seconds: float
+    write_seconds: float
+    close_seconds: float
+
+
+def _build_script(columns: List[FakeColumn], output_format: str, batch: str, pipeline: str) -> ExportScript:
+    fmt, compression = FORMATS[output_format]
+    fetch_size, adaptive = BATCHES[batch]
+    partition_count = PIPELINES[pipeline]
+    return ExportScript(
+        name="benchmark",
+        fields=','.join(column.name for column in columns),
+        sql=f"SELECT * FROM {TABLE_NAME}",
+        data_source_name="benchmark",
+        fetch_size=fetch_size,
+        adaptive_fetch=adaptive,
+        total_rows_strategy=TotalRowsStrategy.EXACT,
+        partition_column="id" if partition_count > 1 else "",
+        partition_count=partition_count,
+        output_format=fmt,
+        output_compression=compression
+    )
+
+
+def _run_export(datasource: Any, script: ExportScript, output_dir: str) -> ExportContext:
+    messages = []
+    context = ExportContext(on_failed=messages.append)
+    path = output_writer.output_file_path(os.path.join(output_dir, "benchmark"), script.output_format,
+                                          script.output_compression)
+    datasource.export(script, path, context)
+    if messages:
+        raise RuntimeError(messages[0])
+    for file_name in os.listdir(output_dir):
+        os.remove(os.path.join(output_dir, file_name))
+    return context
+
+
+def run_scenario(datasource: Any, source: str, rows: int, profile: str, output_format: str, batch: str,
+                 pipeline: str, output_dir: str, measure_memory: bool = True) -> BenchmarkResult:
+    """
+            运行一个场景：先计时导出一次，需要时再在 tracemalloc 下导出一次统计峰值内存(跟踪会拖慢速度，不计入耗时).
+
+            参数:
+                datasource: 替身数据源.
+                source: 数据源名称(fake-mysql/fake-postgresql/sqlite)，仅用于报告.
+                rows: 行数.
+                profile: 列组合名称.
+                output_format/batch/pipeline: 对应 FORMATS/BATCHES/PIPELINES 中的选项.
+                output_dir: 临时输出目录.
+                measure_memory: 是否统计峰值内存.
+            """
+    script = _build_script(PROFILES[profile], output_format, batch, pipeline)
+    start = time.perf_counter()
+    context = _run_export(datasource, script, output_dir)
+    seconds = time.perf_counter() - start
+    stats = context.stats
+
+    peak_memory_mb = None
+    if measure_memory:
+        tracemalloc.start()
+        try:
+            _run_export(datasource, script, output_dir)
+            peak_memory_mb = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+        finally:
+            tracemalloc.stop()
+
+    def stage_seconds(stage: str) -> float:
+        stage_stats = stats.stages.get(stage)
+        return stage_stats.seconds if stage_stats else 0.0
+
+    return BenchmarkResult(
+        source=source,
+        rows=rows,
+        profile=profile,
+        output_format=output_format,
+        batch=batch,
+        pipeline=pipeline,
+        seconds=seconds,
+        rows_per_second=rows / seconds if seconds > 0 else 0.0,
+        mb_per_second=stats.output_bytes / 1024 / 1024 / seconds if seconds > 0 else 0.0,
+        output_bytes=stats.output_bytes,
+        peak_memory_mb=peak_memory_mb,
+        fetch_seconds=stage_seconds(STAGE_FETCH),
+        write_seconds=stage_seconds(STAGE_WRITE),
+        close_seconds=stage_seconds(STAGE_CLOSE)
+    )
+
+
+def _available(output_format: str) -> bool:
+    """可选依赖未安装的输出格式跳过"""
+    module_name = {'csv.zst': 'zstandard', 'parquet': 'pyarrow'}.get(output_format)
+    if module_name is None:
+        return True
+    try:
+        __import__(module_name)
+        return True
+    except ImportError:
+        return False
+
+
+def _print_result(result: BenchmarkResult):
+    memory_text = f"{result.peak_memory_mb:8.1f}" if result.peak_memory_mb is not None else f"{'-':>8}"
+    print(f"{result.rows:>9} {result.profile:<7} {result.output_format:<8} {result.batch:<10} {result.pipeline:<11} "
+          f"{result.seconds:7.2f} {result.rows_per_second:10,.0f} {result.mb_per_second:7.2f} {memory_text} "
+          f"{result.fetch_seconds:7.2f} {result.write_seconds:7.2f} {result.close_seconds:7.2f}", flush=True)
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(prog="export_benchmark", description="Export hot path benchmarks")
+    parser.add_argument("--source", choices=["fake", "sqlite"], default="fake",
+                        help="fake: 内存中生成数据的假游标；sqlite: 本地 SQLite 文件")
+    parser.add_argument("--dialect", choices=["mysql", "postgresql"], default="mysql",
+                        help="假游标使用的导出流程(sqlite 始终使用 MySQL 流程)")
+    parser.add_argument("--rows", type=int, nargs="+", default=[20000], help="行数")
+    parser.add_argument("--profiles", nargs="+", choices=list(PROFILES), default=list(PROFILES), help="列组合")
+    parser.add_argument("--formats", nargs="+", choices=list(FORMATS), default=['xlsx', 'csv'], help="输出格式")
+    parser.add_argument("--batches", nargs="+", choices=list(BATCHES), default=['fixed-500', 'adaptive'],
+                        help="批次策略")
+    parser.add_argument("--pipelines", nargs="+", choices=list(PIPELINES), default=list(PIPELINES),
+                        help="stream: 单连接流式；partitioned: 按 id 分区并行拉取")
+    parser.add_argument("--latency-ms", type=float, default=1.0, help="假游标每次往返模拟的延迟(毫秒)")
+    parser.add_argument("--no-memory", action="store_true", help="不统计峰值内存(省去 tracemalloc 下的第二次导出)")
+    parser.add_argument("--json", help="把结果以 JSON Lines 追加到文件，便于比较不同版本")
+    parser.add_argument("--seed", type=int, default=0, help="生成数据的随机种子")
+    args = parser.parse_args(argv)
+
+    formats = [output_format for output_format in args.formats if _available(output_format)]
+    for output_format in sorted(set(args.formats) - set(formats)):
+        print(f"Skipping {output_format}: optional dependency not installed", file=sys.stderr)
+
+    fake_class = FakePostgreSQLDataSource if args.dialect == "postgresql" else FakeMySQLDataSource
+    source_name = "sqlite" if args.source == "sqlite" else f"fake-{args.dialect}"
+    print(f"{'rows':>9} {'profile':<7} {'format':<8} {'batch':<10} {'pipeline':<11} "
+          f"{'seconds':>7} {'rows/s':>10} {'MB/s':>7} {'peak MB':>8} {'fetch':>7} {'write':>7} {'close':>7}")
+    results = []
+    with tempfile.TemporaryDirectory(prefix="sql2excel_benchmark_") as work_dir:
+        output_dir = os.path.join(work_dir, "output")
+        os.makedirs(output_dir)
+        for rows, profile in itertools.product(args.rows, args.profiles):
+            fake_database = FakeDatabase(PROFILES[profile], rows, _inverse_type_map(fake_class),
+                                         args.latency_ms / 1000, args.seed)
+            if args.source == "sqlite":
+                sqlite_path = os.path.join(work_dir, f"{profile}_{rows}.db")
+                SQLiteDataSource.create_database(sqlite_path, fake_database)
+                datasource = SQLiteDataSource(sqlite_path, PROFILES[profile])
+            else:
+                datasource = fake_class(fake_database)
+            try:
+                for output_format, batch, pipeline in itertools.product(formats, args.batches, args.pipelines):
+                    result = run_scenario(datasource, source_name, rows, profile, output_format, batch, pipeline,
+                                          output_dir, not args.no_memory)
+                    _print_result(result)
+                    results.append(result)
+            finally:
+                datasource.close()
+
+    if args.json:
+        with open(args.json, 'a', encoding='utf-8') as f:
+            for result in results:
+                f.write(json.dumps(asdict(result)) + '\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,225 @@
+"""
+内存中生成数据的 DB-API 替身：连接和游标实现导出流程用到的接口(execute/fetchmany/fetchone/description)，
+每次往返可模拟网络延迟，用于在没有数据库的环境下测量导出性能.
+"""
+import datetime
+import random
+import re
+import string
+import time
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Tuple
+
+from core.models import ColumnType
+
+# 预生成的行模板数，实际行由递增的 id 加上模板中的其余列组成
+TEMPLATE_ROWS = 4096
+DECIMAL_PRECISION = 12
+DECIMAL_SCALE = 2
+
+
+@dataclass
+class FakeColumn:
+    name: str
+    column_type: ColumnType
+    width: int = 0  # 文本列的字符数
+
+
+# 列组合：窄表(数值和时间)、混合类型、宽文本表
+PROFILES: Dict[str, List[FakeColumn]] = {
+    'narrow': [
+        FakeColumn('id', ColumnType.INTEGER),
+        FakeColumn('amount', ColumnType.NUMBER),
+        FakeColumn('created', ColumnType.DATETIME),
+    ],
+    'mixed': [
+        FakeColumn('id', ColumnType.INTEGER),
+        FakeColumn('name', ColumnType.STRING, 16),
+        FakeColumn('quantity', ColumnType.INTEGER),
+        FakeColumn('price', ColumnType.DECIMAL),
+        FakeColumn('ratio', ColumnType.NUMBER),
+        FakeColumn('created', ColumnType.DATETIME),
+        FakeColumn('day', ColumnType.DATE),
+        FakeColumn('note', ColumnType.STRING, 48),
+    ],
+    'wide': [FakeColumn('id', ColumnType.INTEGER)]
+            + [FakeColumn(f'text_{index}', ColumnType.STRING, 32) for index in range(1, 21)]
+            + [FakeColumn(f'value_{index}', ColumnType.NUMBER) for index in range(1, 6)],
+}
+
+_TEXT_CHARS = string.ascii_letters + string.digits + "导出测试数据"
+_EPOCH = datetime.datetime(2024, 1, 1)
+
+
+def _random_value(rng: random.Random, column: FakeColumn) -> Any:
+    column_type = column.column_type
+    if column_type == ColumnType.INTEGER:
+        return rng.randint(0, 1000000)
+    if column_type == ColumnType.NUMBER:
+        return rng.random() * 10000
+    if column_type == ColumnType.DECIMAL:
+        return Decimal(rng.randint(0, 10 ** DECIMAL_PRECISION - 1)).scaleb(-DECIMAL_SCALE)
+    if column_type == ColumnType.DATETIME:
+        return _EPOCH + datetime.timedelta(seconds=rng.randint(0, 365 * 86400), microseconds=rng.randint(0, 999999))
+    if column_type == ColumnType.DATE:
+        return (_EPOCH + datetime.timedelta(days=rng.randint(0, 3650))).date()
+    if column_type == ColumnType.TIME:
+        return datetime.time(rng.randint(0, 23), rng.randint(0, 59), rng.randint(0, 59))
+    if column_type == ColumnType.BOOLEAN:
+        return rng.random() < 0.5
+    if column_type == ColumnType.BYTES:
+        return bytes(rng.getrandbits(8) for _ in range(column.width or 16))
+    return ''.join(rng.choices(_TEXT_CHARS, k=column.width or 16))
+
+
+class FakeDatabase:
+    """
+    一张按 id 递增的虚拟表，行数据由固定随机种子生成，同样的参数每次生成相同的数据.
+
+    参数:
+        columns: 列定义，第一列须为整数 id.
+        rows: 总行数(id 为 1..rows).
+        type_codes: 列类型 -> 驱动类型码，用于生成 cursor.description.
+        latency: 每次 execute/fetchmany 往返模拟的延迟秒数.
+        seed: 随机种子.
+    """
+
+    def __init__(self, columns: List[FakeColumn], rows: int, type_codes: Dict[ColumnType, Any],
+                 latency: float = 0.0, seed: int = 0):
+        self.columns = columns
+        self.rows = rows
+        self.latency = latency
+        rng = random.Random(seed)
+        self.templates = [tuple(_random_value(rng, column) for column in columns[1:]) for _ in range(TEMPLATE_ROWS)]
+        self.description = [
+            (column.name, type_codes.get(column.column_type), None, None,
+             DECIMAL_PRECISION if column.column_type == ColumnType.DECIMAL else None,
+             DECIMAL_SCALE if column.column_type == ColumnType.DECIMAL else None, None)
+            for column in columns
+        ]
+
+    def connect(self) -> 'FakeConnection':
+        return FakeConnection(self)
+
+    def make_rows(self, start: int, count: int) -> List[tuple]:
+        templates = self.templates
+        return [(row_id,) + templates[row_id % TEMPLATE_ROWS] for row_id in range(start, start + count)]
+
+    def round_trip(self):
+        if self.latency > 0:
+            time.sleep(self.latency)
+
+
+class FakeConnection:
+    def __init__(self, database: FakeDatabase):
+        self.database = database
+        self.closed = 0
+
+    def cursor(self, *args, name: Optional[str] = None) -> 'FakeCursor':
+        return FakeCursor(self.database)
+
+    def ping(self, reconnect: bool = False):
+        pass
+
+    def get_server_info(self) -> str:
+        return "8.0.0-fake"
+
+    def thread_id(self) -> int:
+        return id(self)
+
+    def cancel(self):
+        pass
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = 1
+
+
+class FakeCursor:
+    """
+    按 SQL 的形态返回结果：COUNT(*)、MIN/MAX(分区范围)、EXPLAIN(估算行数)、
+    分区区间(%(_low)s/%(_high)s 参数)和 IS NULL 区间，SET/KILL 没有结果，其余语句返回整张表.
+    """
+
+    def __init__(self, database: FakeDatabase):
+        self.database = database
+        self.description = None
+        self.itersize = 2000
+        self.rowcount = -1
+        self._result: List[tuple] = []  # 统计类语句的结果
+        self._next_id = 0
+        self._end_id = 0  # 数据行的结束 id(不含)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def execute(self, sql: str, params: Optional[dict] = None):
+        database = self.database
+        database.round_trip()
+        self._result = []
+        self._next_id = self._end_id = 0
+        upper_sql = sql.upper()
+        if upper_sql.startswith(("SET ", "KILL ")):
+            self.description = None
+        elif upper_sql.startswith("EXPLAIN"):
+            if "FORMAT JSON" in upper_sql:
+                self.description = [('QUERY PLAN', None, None, None, None, None, None)]
+                self._result = [([{'Plan': {'Plan Rows': database.rows}}],)]
+            else:
+                self.description = [(name, None, None, None, None, None, None) for name in ('id', 'rows', 'filtered')]
+                self._result = [('1', database.rows, 100.0)]
+        elif "COUNT(*)" in upper_sql:
+            self.description = [('count', None, None, None, None, None, None)]
+            self._result = [(database.rows,)]
+        elif re.search(r"SELECT MIN\(", upper_sql):
+            self.description = [('min', None, None, None, None, None, None), ('max', None, None, None, None, None, None)]
+            self._result = [(1, database.rows) if database.rows else (None, None)]
+        else:
+            self.description = database.description
+            low, high = self._id_range(sql, params)
+            self._next_id, self._end_id = low, high
+        self.rowcount = len(self._result) if self._result else self._end_id - self._next_id
+
+    def _id_range(self, sql: str, params: Optional[dict]) -> Tuple[int, int]:
+        rows = self.database.rows
+        if "IS NULL" in sql.upper() or "LIMIT 0" in sql.upper():
+            return 0, 0
+        if params and '_low' in params:
+            low = max(int(params['_low']), 1)
+            high = int(params['_high'])
+            # 最后一个区间右闭
+            end = high + 1 if "<= %(_high)s" in sql else high
+            return low, min(end, rows + 1)
+        return 1, rows + 1
+
+    def fetchmany(self, size: int) -> List[tuple]:
+        if self._result:
+            result, self._result = self._result[:size], self._result[size:]
+            return result
+        count = min(size, self._end_id - self._next_id)
+        if count <= 0:
+            return []
+        self.database.round_trip()
+        rows = self.database.make_rows(self._next_id, count)
+        self._next_id += count
+        return rows
+
+    def fetchone(self) -> Optional[tuple]:
+        rows = self.fetchmany(1)
+        return rows[0] if rows else None
+
+    def fetchall(self) -> List[tuple]:
+        return self.fetchmany(max(len(self._result), self._end_id - self._next_id))
+
+    def close(self):
+        self._result = []
+        self._next_id = self._end_id = 0
@@ -0,0 +1,185 @@
+"""
+命令行导出入口(不依赖 PySide6)，可用于定时任务或 CI.
+
+用法:
+    python cli.py [--param NAME=VALUE ...] export --script NAME --out PATH
+    python cli.py [--param NAME=VALUE ...] batch [--scripts NAME ...] --out-dir DIR [--workers N]
+    python cli.py [--param NAME=VALUE ...] workbook --name NAME --out PATH
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Union
+
+from core.export_context import ExportContext, ExportProgress, STAGES
+from core.export_service import run_export
+from core.local_storage import LocalStorage
+from datasource import datasource_container
+from utils.output_writer import file_extension
+
+
+class _ExportResult:
+    def __init__(self, script_name: str):
+        self.script_name = script_name
+        self.succeeded = False
+        self.message = ""
+        self.stats = None
+
+
+def _print_progress(script_name: str, progress: ExportProgress):
+    if progress.total_rows > 0:
+        total_text = f"~{progress.total_rows}" if progress.is_estimate else str(progress.total_rows)
+        text = f"{progress.processed_rows}/{total_text}"
+    else:
+        text = str(progress.processed_rows)
+    print(f"[{script_name}] {text} rows, {progress.rows_per_second:,.0f} rows/s", file=sys.stderr, flush=True)
+
+
+def _export_one(db: LocalStorage, script_name: str, output_path: str, contexts: List[ExportContext],
+                quiet: bool, refresh: bool, params: Dict[str, Union[str, List[str]]], stats_log: str, resume: bool,
+                export: Callable = run_export) -> _ExportResult:
+    result = _ExportResult(script_name)
+
+    def on_finished(message):
+        result.succeeded = True
+        result.message = message
+
+    def on_failed(message):
+        result.message = message
+
+    context = ExportContext(
+        on_progress=None if quiet else lambda progress: _print_progress(script_name, progress),
+        on_finished=on_finished,
+        on_failed=on_failed,
+        max_updates_per_second=1
+    )
+    context.force_refresh = refresh
+    context.stats_log_path = stats_log
+    context.resume = resume
+    contexts.append(context)
+    export(db, script_name, output_path, context, params)
+    result.stats = context.stats
+    if context.is_cancelled:
+        result.message = "Export cancelled"
+    return result
+
+
+def _run(db: LocalStorage, jobs: Dict[str, str], workers: int, quiet: bool, refresh: bool,
+         params: Dict[str, Union[str, List[str]]], stats_log: str = None, resume: bool = False, export: Callable = run_export) -> int:
+    """并发执行导出，每个数据源的并发数不超过其 max_concurrent_exports；export 为工作簿导出时 jobs 的键为工作簿名称"""
+    contexts: List[ExportContext] = []
+    limits = {name: threading.Semaphore(max(ds.max_concurrent_exports, 1)) for name, ds in db.data_sources.items()}
+
+    def export_with_limit(script_name: str, output_path: str) -> _ExportResult:
+        script = db.scripts.get(script_name) if export is run_export else None
+        limit = limits.get(script.data_source_name) if script else None
+        if limit is None:
+            return _export_one(db, script_name, output_path, contexts, quiet, refresh, params, stats_log, resume,
+                               export)
+        with limit:
+            return _export_one(db, script_name, output_path, contexts, quiet, refresh, params, stats_log, resume,
+                               export)
+
+    executor = ThreadPoolExecutor(max_workers=max(workers, 1))
+    futures = [executor.submit(export_with_limit, name, path) for name, path in jobs.items()]
+    try:
+        results = [future.result() for future in futures]
+    except KeyboardInterrupt:
+        for context in contexts:
+            context.cancel()
+        executor.shutdown(wait=True, cancel_futures=True)
+        print("Cancelled", file=sys.stderr)
+        return 130
+    finally:
+        executor.shutdown(wait=True)
+        datasource_container.shutdown()
+
+    for result in results:
+        status = "OK" if result.succeeded else "FAILED"
+        print(f"[{result.script_name}] {status}: {result.message}")
+        if result.succeeded and not quiet:
+            stats = result.stats
+            if stats.batches:
+                print(f"[{result.script_name}] {stats.batches} batches, batch size {stats.batch_size} "
+                      f"(max {stats.max_batch_size}), ~{stats.bytes_per_row:,.0f} bytes/row")
+            stage_texts = [f"{stage} {stats.stages[stage].seconds:.2f}s" for stage in STAGES if stage in stats.stages]
+            print(f"[{result.script_name}] {stats.elapsed_seconds:.2f}s ({', '.join(stage_texts)}), "
+                  f"{stats.output_bytes:,} bytes written, peak RSS {stats.peak_rss_bytes / 1024 / 1024:,.0f} MB, "
+                  f"extraction {'/'.join(stats.extractions) or '-'}")
+    return 0 if all(result.succeeded for result in results) else 1
+
+
+def _parse_param(text: str):
+    name, separator, value = text.partition("=")
+    if not separator or not name.strip():
+        raise argparse.ArgumentTypeError(f"Invalid parameter '{text}', expected NAME=VALUE")
+    return name.strip(), value
+
+
+def _collect_params(pairs: List[tuple]) -> Dict[str, Union[str, List[str]]]:
+    """同一参数只填写一次时为文本值，重复填写时为各次文本值的列表"""
+    values: Dict[str, List[str]] = {}
+    for name, value in pairs:
+        values.setdefault(name, []).append(value)
+    return {name: items[0] if len(items) == 1 else items for name, items in values.items()}
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(prog="sql2excel", description="Export SQL query results to Excel/CSV")
+    parser.add_argument("--config", default="config.json", help="数据源与脚本配置文件")
+    parser.add_argument("--quiet", action="store_true", help="不输出进度")
+    parser.add_argument("--refresh", action="store_true", help="忽略结果缓存和登记的列信息，重新查询数据库")
+    parser.add_argument("--param", action="append", type=_parse_param, default=[], metavar="NAME=VALUE",
+                        help="脚本参数，可重复；同一参数重复填写时每个值导出一个文件，值中的逗号原样保留")
+    parser.add_argument("--resume", action="store_true",
+                        help="从断点继续上次中断的导出(脚本需设置断点排序键，输出路径与上次相同)")
+    parser.add_argument("--stats-log", help="把每次导出的分阶段统计追加到 JSON Lines 文件(默认取配置中的 stats_log_path)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="导出单个脚本")
+    export_parser.add_argument("--script", required=True, help="脚本名称")
+    export_parser.add_argument("--out", required=True, help="输出文件路径，缺少后缀时按脚本的导出格式补上")
+
+    batch_parser = subparsers.add_parser("batch", help="并发导出多个脚本")
+    batch_parser.add_argument("--scripts", nargs="*", help="脚本名称，默认导出配置中的全部脚本")
+    batch_parser.add_argument("--out-dir", required=True, help="输出目录，文件名为脚本名称")
+    batch_parser.add_argument("--workers", type=int, default=4, help="最大并发导出数")
+
+    workbook_parser = subparsers.add_parser("workbook", help="把工作簿中的多个脚本导出到同一个 Excel 文件")
+    workbook_parser.add_argument("--name", required=True, help="工作簿名称")
+    workbook_parser.add_argument("--out", required=True, help="输出文件路径，缺少后缀时补上 .xlsx")
+
+    args = parser.parse_args(argv)
+    if not os.path.exists(args.config):
+        print(f"Config file '{args.config}' not found", file=sys.stderr)
+        return 2
+    db = LocalStorage(args.config)
+    params = _collect_params(args.param)
+
+    if args.command == "export":
+        return _run(db, {args.script: args.out}, 1, args.quiet, args.refresh, params, args.stats_log, args.resume)
+    if args.command == "workbook":
+        if args.resume:
+            print("Workbook exports do not support --resume", file=sys.stderr)
+            return 2
+        # 工作簿只输出 Excel，按需导入，避免其它命令加载 xlsxwriter
+        from core.workbook_service import run_workbook_export
+        return _run(db, {args.name: args.out}, 1, args.quiet, args.refresh, params, args.stats_log,
+                    export=run_workbook_export)
+
+    script_names = args.scripts or list(db.scripts.keys())
+    os.makedirs(args.out_dir, exist_ok=True)
+    jobs = {}
+    for name in script_names:
+        script = db.scripts.get(name)
+        extension = file_extension(script.output_format, script.output_compression) if script else ".xlsx"
+        jobs[name] = os.path.join(args.out_dir, f"{name}{extension}")
+    return _run(db, jobs, args.workers, args.quiet, args.refresh, params, args.stats_log, args.resume)
+
+
+if __name__ == '__main__':
+    multiprocessing.freeze_support()
+    sys.exit(main())
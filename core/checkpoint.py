@@ -0,0 +1,176 @@
+import glob
+import json
+import os
+from dataclasses import dataclass, field
+from typing import Any, Callable, List, Optional
+
+from core.models import ColumnType
+from core.watermark import encode_watermark, decode_watermark
+from utils.output_writer import OutputWriter, part_file_path, suffixed_file_path
+
+# 断点文件与输出文件放在一起：report.xlsx -> report.xlsx.checkpoint.json
+CHECKPOINT_SUFFIX = ".checkpoint.json"
+
+
+@dataclass
+class Checkpoint:
+    fingerprint: str  # 查询、数据源和参数的哈希，继续导出时须一致
+    key_column: str  # 排序键
+    max_rows_per_file: int
+    parts: List[str] = field(default_factory=list)  # 已完整写出的拆分文件
+    rows: int = 0  # 已完整写出的行数
+    last_key: Any = None  # 已完整写出的最后一行的排序键
+
+
+def checkpoint_path(output_path: str) -> str:
+    return f"{output_path}{CHECKPOINT_SUFFIX}"
+
+
+def load_checkpoint(output_path: str) -> Optional[Checkpoint]:
+    """读取输出文件的断点，不存在时返回 None"""
+    try:
+        with open(checkpoint_path(output_path), 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return None
+    return Checkpoint(
+        fingerprint=data['fingerprint'],
+        key_column=data['key_column'],
+        max_rows_per_file=data['max_rows_per_file'],
+        parts=data['parts'],
+        rows=data['rows'],
+        last_key=decode_watermark(data['last_key'])
+    )
+
+
+def save_checkpoint(output_path: str, checkpoint: Checkpoint):
+    """先写临时文件再替换，进程在写入中途退出时不会留下损坏的断点"""
+    path = checkpoint_path(output_path)
+    data = {
+        'fingerprint': checkpoint.fingerprint,
+        'key_column': checkpoint.key_column,
+        'max_rows_per_file': checkpoint.max_rows_per_file,
+        'parts': checkpoint.parts,
+        'rows': checkpoint.rows,
+        'last_key': encode_watermark(checkpoint.last_key),
+    }
+    with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(f"{path}.tmp", path)
+
+
+def has_progress(output_file: str) -> bool:
+    """输出文件(含按参数值拆分的各文件)是否有可继续的断点，即至少已完整写出一个拆分文件"""
+    pattern = suffixed_file_path(glob.escape(output_file), '*') + CHECKPOINT_SUFFIX
+    paths = [output_file] + [path[:-len(CHECKPOINT_SUFFIX)] for path in glob.glob(pattern)]
+    for path in paths:
+        try:
+            saved = load_checkpoint(path)
+        except (OSError, ValueError, KeyError):
+            continue
+        if saved and saved.parts:
+            return True
+    return False
+
+
+def remove_checkpoint(output_path: str):
+    try:
+        os.remove(checkpoint_path(output_path))
+    except FileNotFoundError:
+        pass
+
+
+class CheckpointWriter(OutputWriter):
+    """
+    按 max_rows_per_file 拆分文件，每写完一个文件就把已完成的文件和最后一行的排序键保存到断点文件，
+    导出中断后可从下一个文件继续.
+
+    参数:
+        create_part_writer: 根据路径创建单个文件的写入器(不拆分).
+        write_file_path: 写入文件路径，拆分文件按 part_file_path 命名.
+        checkpoint: 断点，继续导出时为读取的断点，否则为空断点.
+    注意：查询结果须按排序键排序且 max_rows_per_file 须大于 0(断点只在拆分文件写完时记录)；
+    导出完成后删除断点文件，取消或出错时删除未写完的文件并保留断点
+    """
+
+    def __init__(self, create_part_writer: Callable[[str], OutputWriter], write_file_path: str,
+                 checkpoint: Checkpoint):
+        super().__init__()
+        self.create_part_writer = create_part_writer
+        self.write_file_path = write_file_path
+        self.checkpoint = checkpoint
+        self.max_rows_per_file = checkpoint.max_rows_per_file
+        self.output_files = list(checkpoint.parts)
+        self.rows_written = checkpoint.rows
+        self.key_index: Optional[int] = None
+        self.writer: Optional[OutputWriter] = None
+        self.file_rows = 0
+        self.last_key: Any = None
+        self.finished = False  # 已关闭或已放弃
+        save_checkpoint(write_file_path, checkpoint)
+
+    def set_column_types(self, column_types: List[ColumnType], description: Any = None):
+        super().set_column_types(column_types, description)
+        names = [column[0].lower() for column in description or []]
+        key_column = self.checkpoint.key_column.strip('`"').lower()
+        if key_column not in names:
+            raise ValueError(f"Checkpoint column '{self.checkpoint.key_column}' not found in query result")
+        self.key_index = names.index(key_column)
+        if self.writer is not None:
+            self.writer.set_column_types(column_types, description)
+
+    def write_rows(self, rows: List[Any]):
+        start = 0
+        while start < len(rows):
+            if self.writer is None:
+                self._open_part()
+            room = self.max_rows_per_file - self.file_rows if self.max_rows_per_file else len(rows) - start
+            chunk = rows[start:start + room]
+            self.writer.write_rows(chunk)
+            if self.key_index is not None:
+                self.last_key = chunk[-1][self.key_index]
+            self.file_rows += len(chunk)
+            self.rows_written += len(chunk)
+            start += len(chunk)
+            if self.max_rows_per_file and self.file_rows >= self.max_rows_per_file:
+                self._complete_part()
+
+    def close(self):
+        if self.finished:
+            return
+        self.finished = True
+        if self.writer is None and not self.output_files:
+            # 没有数据时也生成只包含表头的文件
+            self._open_part()
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+        remove_checkpoint(self.write_file_path)
+
+    def abort(self):
+        if self.finished:
+            return
+        self.finished = True
+        if self.writer is not None:
+            self.writer.abort()
+            self.writer = None
+            path = self.output_files.pop()
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _open_part(self):
+        path = part_file_path(self.write_file_path, len(self.output_files) + 1)
+        self.writer = self.create_part_writer(path)
+        if self.column_types is not None:
+            self.writer.set_column_types(self.column_types, self.description)
+        self.output_files.append(path)
+        self.file_rows = 0
+
+    def _complete_part(self):
+        self.writer.close()
+        self.writer = None
+        checkpoint = self.checkpoint
+        checkpoint.parts.append(self.output_files[-1])
+        checkpoint.rows += self.file_rows
+        checkpoint.last_key = self.last_key
+        save_checkpoint(self.write_file_path, checkpoint)
@@ -0,0 +1,252 @@
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+from utils.resource_util import peak_rss_bytes
+
+# 导出阶段
+STAGE_CONNECT = "connect"  # 从连接池借出连接
+STAGE_COUNT = "count"  # 统计总行数(COUNT/EXPLAIN)
+STAGE_EXECUTE = "execute"  # 执行查询直到可以拉取
+STAGE_FETCH = "fetch"  # 从数据库拉取批次(分区导出时为各区间累计)
+STAGE_CACHE = "cache"  # 从结果缓存读取批次
+STAGE_WRITE = "write"  # 写入器处理批次(行转换、序列化)
+STAGE_CLOSE = "close"  # 关闭写入器(如 XLSX 打包压缩)
+STAGES = [STAGE_CONNECT, STAGE_COUNT, STAGE_EXECUTE, STAGE_FETCH, STAGE_CACHE, STAGE_WRITE, STAGE_CLOSE]
+
+# 实际使用的数据提取方式
+EXTRACTION_CURSOR = "cursor"  # 游标按批拉取
+EXTRACTION_COPY = "copy"  # COPY 的输出解析为批次后写入(缓存、水位、断点或拆分文件需要逐行处理)
+EXTRACTION_COPY_RAW = "copy_raw"  # COPY 的输出原样写入 CSV/TSV 文件
+EXTRACTION_CACHE = "cache"  # 从结果缓存写出
+
+
+@dataclass
+class ExportProgress:
+    processed_rows: int  # 已处理行数
+    total_rows: int  # 总行数，0 表示未知
+    is_estimate: bool  # 总行数是否为估算值
+    rows_per_second: float  # 平均吞吐量
+    eta_seconds: Optional[float]  # 预计剩余时间，总行数未知时为 None
+
+
+class ProgressReporter:
+    """
+    进度聚合器：累加每批次处理的行数，按时间节流后再发出进度，
+    避免逐行发信号把 GUI 事件循环淹没。
+    """
+
+    def __init__(self, emit: Callable[[ExportProgress], None], max_updates_per_second: float = 10):
+        self.emit = emit
+        self.min_interval = 1 / max_updates_per_second
+        self.total_rows = 0
+        self.is_estimate = False
+        self.processed_rows = 0
+        self.start_time = time.monotonic()
+        self.last_emit_time = 0.0
+        self.lock = threading.Lock()
+
+    def set_total_rows(self, total_rows: int, is_estimate: bool = False):
+        self.total_rows = total_rows
+        self.is_estimate = is_estimate
+        # 从拿到总行数后开始计时，吞吐量只统计数据拉取阶段
+        self.start_time = time.monotonic()
+
+    def add_rows(self, rows: int):
+        """累加已处理行数，距离上次发出超过节流间隔时才发出进度(可在多个拉取线程中调用)"""
+        with self.lock:
+            self.processed_rows += rows
+            now = time.monotonic()
+            if now - self.last_emit_time < self.min_interval:
+                return
+            self.last_emit_time = now
+            progress = self._snapshot(now)
+        self.emit(progress)
+
+    def flush(self):
+        """发出最终进度"""
+        now = time.monotonic()
+        self.last_emit_time = now
+        self.emit(self._snapshot(now))
+
+    def _snapshot(self, now: float) -> ExportProgress:
+        elapsed = now - self.start_time
+        rows_per_second = self.processed_rows / elapsed if elapsed > 0 else 0.0
+        eta_seconds = None
+        if self.total_rows > 0 and rows_per_second > 0:
+            eta_seconds = max(self.total_rows - self.processed_rows, 0) / rows_per_second
+        return ExportProgress(
+            processed_rows=self.processed_rows,
+            total_rows=self.total_rows,
+            is_estimate=self.is_estimate,
+            rows_per_second=rows_per_second,
+            eta_seconds=eta_seconds
+        )
+
+
+@dataclass
+class StageStats:
+    seconds: float = 0.0  # 累计耗时
+    rows: int = 0
+    batches: int = 0
+    peak_rss_bytes: int = 0  # 该阶段结束时的进程峰值内存
+
+
+@dataclass
+class ExportStats:
+    rows: int = 0  # 拉取的行数
+    batches: int = 0  # 拉取的批次数
+    batch_size: int = 0  # 最后一批使用的批次大小
+    max_batch_size: int = 0  # 自适应调整过程中的最大批次大小
+    bytes_per_row: float = 0.0  # 估算的每行内存字节数
+    stages: Dict[str, StageStats] = field(default_factory=dict)  # 阶段名称 -> 耗时统计
+    output_bytes: int = 0  # 输出文件总大小
+    elapsed_seconds: float = 0.0  # 导出总耗时
+    peak_rss_bytes: int = 0  # 导出结束时的进程峰值内存
+    extractions: List[str] = field(default_factory=list)  # 实际使用的提取方式(多组参数时可能不止一种)
+
+
+class ExportContext:
+    """
+    一次导出的上下文：取消标志、进度聚合和结果回调，不依赖 Qt，
+    GUI(ExportTask)和命令行都通过它与 DataSource.export 交互.
+
+    注意：取消时除设置标志外，还会在后台线程中调用已注册的取消回调(如中止数据库上正在执行的查询)，
+    使阻塞在 execute/fetch 上的导出线程及时退出；回调在锁外执行，可以在回调中注册或注销其它回调
+    """
+
+    def __init__(self,
+                 on_total_rows: Callable[[int], None] = None,
+                 on_progress: Callable[[ExportProgress], None] = None,
+                 on_finished: Callable[[str], None] = None,
+                 on_failed: Callable[[str], None] = None,
+                 max_updates_per_second: float = 10):
+        self.on_total_rows = on_total_rows
+        self.on_finished = on_finished
+        self.on_failed = on_failed
+        self.progress_reporter = ProgressReporter(on_progress or (lambda progress: None), max_updates_per_second)
+        self.stats = ExportStats()
+        self.stats_lock = threading.Lock()  # 分区导出时多个线程会同时更新统计
+        self.start_time = time.monotonic()
+        self.is_cancelled = False  # 取消标志
+        self.force_refresh = False  # 忽略结果缓存，重新查询数据库
+        self.resume = False  # 从断点继续上次中断的导出
+        self.watermark = None  # 增量导出：上次导出记录的水位
+        self.new_watermark = None  # 增量导出：本次导出成功后的新水位
+        self.schema = None  # 已登记的查询列信息(ScriptSchema)，为空时导出前探测
+        self.new_schema = None  # 本次导出新登记的列信息，由调用方保存
+        self.is_finished = False  # 是否已成功完成
+        self.stats_log_path = None  # 导出统计日志路径，为空时使用配置中的路径
+        self.warnings: List[str] = []  # 不影响导出结果的提示，附在完成消息之后
+        self.cancel_callbacks: Dict[int, Callable[[], None]] = {}
+        # 保护回调表；注销回调时通过它等待正在执行的同一回调结束
+        self.cancel_condition = threading.Condition()
+        self._running_callbacks: Dict[int, int] = {}  # 正在执行的回调编号 -> 执行线程
+        self._next_callback_id = 0
+
+    def cancel(self):
+        """标记导出为已取消，并在后台线程中执行取消回调(不阻塞调用方，如 GUI 线程)"""
+        if self.is_cancelled:
+            return
+        self.is_cancelled = True
+        self._start_cancel_callbacks()
+
+    def add_cancel_callback(self, callback: Callable[[], None]) -> int:
+        """注册取消回调，返回用于注销的编号；已取消时在后台线程中执行"""
+        with self.cancel_condition:
+            self._next_callback_id += 1
+            self.cancel_callbacks[self._next_callback_id] = callback
+            callback_id = self._next_callback_id
+        if self.is_cancelled:
+            self._start_cancel_callbacks()
+        return callback_id
+
+    def remove_cancel_callback(self, callback_id: int):
+        """
+        注销取消回调(如归还连接前)；该回调正在其它线程中执行时等待其结束，
+        避免连接归还后又被中止其上的查询.
+        """
+        current_thread = threading.get_ident()
+        with self.cancel_condition:
+            self.cancel_callbacks.pop(callback_id, None)
+            while self._running_callbacks.get(callback_id, current_thread) != current_thread:
+                self.cancel_condition.wait()
+
+    def _start_cancel_callbacks(self):
+        threading.Thread(target=self._run_cancel_callbacks, name="export-cancel", daemon=True).start()
+
+    def _run_cancel_callbacks(self):
+        current_thread = threading.get_ident()
+        with self.cancel_condition:
+            callback_ids = list(self.cancel_callbacks)
+        for callback_id in callback_ids:
+            with self.cancel_condition:
+                # 执行前才取出：每个回调只执行一次，尚未执行的回调可以直接注销
+                callback = self.cancel_callbacks.pop(callback_id, None)
+                if callback is None:
+                    continue
+                self._running_callbacks[callback_id] = current_thread
+            try:
+                callback()
+            except Exception:
+                # 中止查询失败时仍依靠取消标志在批次之间退出
+                pass
+            finally:
+                with self.cancel_condition:
+                    self._running_callbacks.pop(callback_id, None)
+                    self.cancel_condition.notify_all()
+
+    def start(self):
+        """开始计时(任务排队的时间不计入总耗时)"""
+        self.start_time = time.monotonic()
+
+    def add_stage(self, stage: str, seconds: float, rows: int = 0, batches: int = 0):
+        """累加一个阶段的耗时(可在多个拉取线程中调用)"""
+        peak_rss = peak_rss_bytes()
+        with self.stats_lock:
+            stage_stats = self.stats.stages.get(stage)
+            if stage_stats is None:
+                stage_stats = self.stats.stages[stage] = StageStats()
+            stage_stats.seconds += seconds
+            stage_stats.rows += rows
+            stage_stats.batches += batches
+            stage_stats.peak_rss_bytes = max(stage_stats.peak_rss_bytes, peak_rss)
+
+    def add_extraction(self, extraction: str):
+        """记录实际使用的提取方式，如 COPY 是否原样写入文件"""
+        with self.stats_lock:
+            if extraction not in self.stats.extractions:
+                self.stats.extractions.append(extraction)
+
+    @contextmanager
+    def timed_stage(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_stage(stage, time.perf_counter() - start)
+
+    def set_total_rows(self, total_rows: int, is_estimate: bool = False):
+        self.progress_reporter.set_total_rows(total_rows, is_estimate)
+        if self.on_total_rows:
+            self.on_total_rows(total_rows)
+
+    def warn(self, message: str):
+        """记录提示(如表头改用查询列名)，相同的提示只记录一次"""
+        if message not in self.warnings:
+            self.warnings.append(message)
+
+    def finished(self, message: str):
+        if self.warnings:
+            message = f"{message} (warning: {'; '.join(self.warnings)})"
+        self.stats.elapsed_seconds = time.monotonic() - self.start_time
+        self.stats.peak_rss_bytes = peak_rss_bytes()
+        self.is_finished = True
+        if self.on_finished:
+            self.on_finished(message)
+
+    def failed(self, message: str):
+        if self.on_failed:
+            self.on_failed(message)
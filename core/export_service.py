@@ -0,0 +1,113 @@
+import time
+from dataclasses import replace
+from typing import Dict, List, Optional, Union
+
+from core import parameters, preview, schema_registry, stats_log
+from core.export_context import ExportContext
+from core.local_storage import LocalStorage
+from core.models import ExportScript
+from datasource import datasource_container
+from utils import output_writer
+
+
+def run_export(db: LocalStorage, script_name: str, output_path: str, context: ExportContext,
+               params: Optional[Dict[str, Union[str, List[str]]]] = None):
+    """
+            按脚本名称执行一次导出，结果通过 context 的回调通知.
+
+            参数:
+                db: 本地存储的数据源与脚本配置.
+                script_name: 脚本名称.
+                output_path: 输出文件路径，缺少导出格式的后缀(.xlsx/.csv/.csv.gz 等)时自动补上.
+                context: 导出上下文(取消标志、进度及结果回调).
+                params: 脚本参数名称 -> 文本值，未填写的参数使用默认值；值为列表时每个值导出一个文件.
+            """
+    context.start()
+    try:
+        script = db.scripts.get(script_name)
+        if not script:
+            context.failed(f"Script '{script_name}' not found")
+            return
+
+        data_source = db.data_sources.get(script.data_source_name)
+        if not data_source:
+            context.failed(f"Data source '{script.data_source_name}' not found")
+            return
+
+        datasource_service = datasource_container.get_datasource(data_source)
+
+        try:
+            script_runs = parameters.resolve_runs(script.parameters, params)
+        except ValueError as e:
+            context.failed(str(e))
+            return
+
+        output_file = output_writer.output_file_path(output_path, script.output_format, script.output_compression)
+        runs = [(output_writer.suffixed_file_path(output_file, suffix) if suffix else output_file, run_params)
+                for suffix, run_params in script_runs]
+        if script.checkpoint_column and db.checkpoint_outputs.get(script.name) != output_file:
+            # 记录输出文件，界面据此判断是否有可继续的断点
+            db.save_script_state(db.checkpoint_outputs, script.name, output_file)
+        if script.watermark_column:
+            context.watermark = db.watermarks.get(script.name)
+        schema = db.schemas.get(script.name)
+        # SQL 或数据源修改后登记的列信息失效；忽略缓存时也重新探测
+        if schema and not context.force_refresh and \
+                schema.fingerprint == schema_registry.schema_fingerprint(data_source, script.sql):
+            context.schema = schema
+        try:
+            datasource_service.export_runs(script, runs, context)
+        finally:
+            # 查询的列发生变化导致导出失败时也保存新的列信息，下次导出即可使用
+            if context.new_schema is not None:
+                db.save_script_state(db.schemas, script.name, context.new_schema)
+        if context.new_watermark is not None and not context.is_cancelled:
+            db.save_script_state(db.watermarks, script.name, context.new_watermark)
+        stats_log_path = context.stats_log_path or db.stats_log_path
+        if stats_log_path and context.is_finished:
+            try:
+                stats_log.append_stats(stats_log_path, script.name, output_file, context.stats)
+            except OSError:
+                # 统计日志写入失败不影响导出结果
+                pass
+    except Exception as e:
+        if not context.is_cancelled:
+            # 只有在未取消的情况下才发出失败信号
+            context.failed(f"Export failed: {str(e)}")
+
+
+def run_preview(db: LocalStorage, script: ExportScript, context: ExportContext,
+                params: Optional[Dict[str, Union[str, List[str]]]] = None, limit: int = preview.DEFAULT_PREVIEW_ROWS,
+                force_refresh: bool = False) -> preview.PreviewResult:
+    """
+            在数据库端截取脚本查询的前 limit 行，相同脚本、SQL 和参数的样本从内存缓存返回.
+
+            参数:
+                db: 本地存储的数据源与脚本配置.
+                script: 导出脚本(可以是尚未保存的编辑内容).
+                context: 导出上下文(取消标志).
+                params: 脚本参数名称 -> 文本值，多个值时只预览第一组.
+                limit: 预览行数.
+                force_refresh: 忽略缓存重新查询.
+            """
+    data_source = db.data_sources.get(script.data_source_name)
+    if not data_source:
+        raise ValueError(f"Data source '{script.data_source_name}' not found")
+    _, run_params = parameters.resolve_runs(script.parameters, params)[0]
+    key = preview.preview_key(script.name, data_source, script.sql, run_params, limit)
+    cache = preview.default_cache()
+    cached = None if force_refresh else cache.get(key)
+    if cached:
+        return replace(cached, from_cache=True)
+
+    start = time.perf_counter()
+    datasource_service = datasource_container.get_datasource(data_source)
+    description, column_types, rows = datasource_service.preview(script, run_params, limit, context)
+    result = preview.PreviewResult(
+        columns=[column[0] for column in description],
+        column_types=column_types,
+        rows=rows,
+        elapsed_seconds=time.perf_counter() - start
+    )
+    cache.put(key, result)
+    return result
@@ -1,99 +1,313 @@
-from PySide6.QtCore import QObject, Signal, QRunnable, QThreadPool, QMetaObject, Qt
-from PySide6.QtCore import Q_ARG
+import itertools
+from collections import Counter
+from dataclasses import dataclass
+from enum import Enum
+from typing import Dict, Optional
 
-from datasource import datasource_container
+from PySide6.QtCore import QObject, Signal, QRunnable, QThreadPool
+
+from core import export_service, preview, workbook_service
+from core.export_context import ExportContext, ExportProgress, ExportStats
 
 
 class ExportTask(QRunnable):
-    def __init__(self, db, script_name, output_path):
+    def __init__(self, db, script_name, output_path, force_refresh=False, params=None, resume=False):
         super().__init__()
         self.db = db
         self.script_name = script_name
         self.output_path = output_path
+        self.params = params
+        # 任务对象由 ExportJob 持有，线程池运行结束后不自动销毁
+        self.setAutoDelete(False)
         self.signals = ExportSignals()
-        self.is_cancelled = False  # 取消标志
+        self.context = ExportContext(
+            on_total_rows=self.signals.total_rows.emit,
+            on_progress=self.signals.progress.emit,
+            on_finished=lambda message: self.signals.finished.emit(message, self.context.stats),
+            on_failed=self.signals.failed.emit
+        )
+        self.context.force_refresh = force_refresh
+        self.context.resume = resume
+
+    @property
+    def is_cancelled(self) -> bool:
+        return self.context.is_cancelled
 
     def cancel(self):
         """标记任务为已取消"""
-        self.is_cancelled = True
+        self.context.cancel()
+
+    def run(self):
+        try:
+            export_service.run_export(self.db, self.script_name, self.output_path, self.context, self.params)
+        finally:
+            self.signals.done.emit()
+
+
+class WorkbookExportTask(ExportTask):
+    """把工作簿的多个脚本导出到同一个 Excel 文件，script_name 为工作簿名称"""
 
     def run(self):
         try:
-            script = self.db.scripts.get(self.script_name)
-            if not script:
-                self.signals.failed.emit(f"Script '{self.script_name}' not found")
-                return
+            workbook_service.run_workbook_export(self.db, self.script_name, self.output_path, self.context,
+                                                 self.params)
+        finally:
+            self.signals.done.emit()
+
+
+class PreviewTask(QRunnable):
+    """
+    在后台线程中执行预览查询，结果通过 signals 返回.
 
-            data_source = self.db.data_sources.get(script.data_source_name)
-            if not data_source:
-                self.signals.failed.emit(f"Data source '{script.data_source_name}' not found")
-                return
+    参数:
+        preview_id: 预览编号，调用方据此忽略已被新预览取代的结果.
+        db: 本地存储的数据源与脚本配置.
+        script: 导出脚本(可以是尚未保存的编辑内容).
+        params: 脚本参数名称 -> 文本值.
+        limit: 预览行数.
+        force_refresh: 忽略缓存重新查询.
+    """
 
-            datasource_service = datasource_container.get_datasource(data_source)
+    def __init__(self, preview_id, db, script, params=None, limit=preview.DEFAULT_PREVIEW_ROWS, force_refresh=False):
+        super().__init__()
+        self.preview_id = preview_id
+        self.db = db
+        self.script = script
+        self.params = params
+        self.limit = limit
+        self.force_refresh = force_refresh
+        # 由调用方持有，用于取消
+        self.setAutoDelete(False)
+        self.signals = PreviewSignals()
+        self.context = ExportContext()
 
-            output_file = self.output_path if self.output_path.endswith('.xlsx') else f"{self.output_path}.xlsx"
-            datasource_service.export(script, output_file, self)
+    def cancel(self):
+        """取消预览并中止数据库上的查询"""
+        self.context.cancel()
+
+    def run(self):
+        try:
+            result = export_service.run_preview(self.db, self.script, self.context, self.params, self.limit,
+                                                self.force_refresh)
         except Exception as e:
-            if not self.is_cancelled:
-                # 只有在未取消的情况下才发出失败信号
-                self.signals.failed.emit(f"Export failed: {str(e)}")
+            if not self.context.is_cancelled:
+                self.signals.failed.emit(self.preview_id, str(e))
+            return
+        if not self.context.is_cancelled:
+            self.signals.finished.emit(self.preview_id, result)
+
+
+class PreviewSignals(QObject):
+    finished = Signal(int, object)  # 预览编号, PreviewResult
+    failed = Signal(int, str)  # 预览编号, 错误信息
 
 
 class ExportSignals(QObject):
-    progress = Signal(int)  # 当前已处理行数
+    progress = Signal(object)  # ExportProgress
     total_rows = Signal(int)  # 总行数
-    finished = Signal(str)  # 完成信号
+    finished = Signal(str, object)  # 完成信号(消息, ExportStats)
     failed = Signal(str)  # 失败信号
+    done = Signal()  # 任务线程结束(包括取消)
+
+
+class ExportJobStatus(Enum):
+    QUEUED = "排队中"
+    RUNNING = "导出中"
+    FINISHED = "已完成"
+    FAILED = "失败"
+    CANCELLED = "已取消"
+
+
+@dataclass
+class ExportJob:
+    job_id: int
+    script_name: str  # 工作簿导出时为工作簿名称
+    output_path: str
+    data_source_name: str
+    task: ExportTask
+    status: ExportJobStatus = ExportJobStatus.QUEUED
+    progress: Optional[ExportProgress] = None
+    message: str = ""
+    stats: Optional[ExportStats] = None  # 导出完成后的分阶段统计
+
+    @property
+    def is_active(self) -> bool:
+        return self.status in (ExportJobStatus.QUEUED, ExportJobStatus.RUNNING)
+
+
+class _JobSignalRelay(QObject):
+    """把单个任务的信号附上任务 ID 转发给 Exporter(对象位于主线程，跨线程信号会排队投递)"""
+
+    def __init__(self, job_id: int, exporter: 'Exporter'):
+        super().__init__(exporter)
+        self.job_id = job_id
+        self.exporter = exporter
+
+    def on_progress(self, progress: ExportProgress):
+        self.exporter._update_progress(self.job_id, progress)
+
+    def on_total_rows(self, total_rows: int):
+        self.exporter._set_total_rows(self.job_id, total_rows)
+
+    def on_finished(self, message: str, stats: ExportStats):
+        self.exporter._export_finished(self.job_id, message, stats)
+
+    def on_failed(self, message: str):
+        self.exporter._export_failed(self.job_id, message)
+
+    def on_done(self):
+        self.exporter._job_done(self.job_id)
 
 
 class Exporter(QObject):
-    # 这些信号将在主线程中发出
-    progress_updated = Signal(int)
-    total_rows_updated = Signal(int)
-    export_finished = Signal(str)
-    export_failed = Signal(str)
+    """
+    导出任务调度器：任务先进入队列，按每个数据源的并发上限(DataBase.max_concurrent_exports)
+    和全局上限并发执行.
+    """
+    MAX_CONCURRENT_JOBS = 8
+
+    # 这些信号将在主线程中发出，第一个参数为任务 ID
+    job_updated = Signal(int)  # 任务状态或进度变化
+    progress_updated = Signal(int, object)
+    total_rows_updated = Signal(int, int)
+    export_finished = Signal(int, str, object)
+    export_failed = Signal(int, str)
 
     def __init__(self, db):
         super().__init__()
         self.db = db
         self.thread_pool = QThreadPool()
-        self.thread_pool.setMaxThreadCount(1)  # 限制同时只能有一个导出任务
-        self.current_task = None  # 跟踪当前任务
-
-    def export_to_excel(self, script_name, output_path):
-        self.current_task = ExportTask(self.db, script_name, output_path)
-        self.current_task.signals.progress.connect(self._update_progress)
-        self.current_task.signals.total_rows.connect(self._set_total_rows)
-        self.current_task.signals.finished.connect(self._export_finished)
-        self.current_task.signals.failed.connect(self._export_failed)
-        self.thread_pool.start(self.current_task)
-
-    def _update_progress(self, rows_processed):
-        # 通过主线程更新UI
-        QMetaObject.invokeMethod(self, "progress_updated",
-                                 Qt.ConnectionType.QueuedConnection,
-                                 Q_ARG(int, rows_processed))
-
-    def _set_total_rows(self, total_rows):
-        QMetaObject.invokeMethod(self, "total_rows_updated",
-                                 Qt.ConnectionType.QueuedConnection,
-                                 Q_ARG(int, total_rows))
-
-    def _export_finished(self, message):
-        QMetaObject.invokeMethod(self, "export_finished",
-                                 Qt.ConnectionType.QueuedConnection,
-                                 Q_ARG(str, message))
-
-    def _export_failed(self, message):
-        QMetaObject.invokeMethod(self, "export_failed",
-                                 Qt.ConnectionType.QueuedConnection,
-                                 Q_ARG(str, message))
-
-    def cancel_export(self):
-        """取消当前导出任务"""
-        if self.current_task:
-            self.current_task.cancel()
-        self.thread_pool.clear()  # 清除线程池中的任务
+        self.thread_pool.setMaxThreadCount(self.MAX_CONCURRENT_JOBS)
+        self.jobs: Dict[int, ExportJob] = {}  # 按提交顺序保存
+        self._job_ids = itertools.count(1)
+        self._relays: Dict[int, _JobSignalRelay] = {}
+
+    def export_to_excel(self, script_name, output_path, force_refresh=False, params=None, resume=False) -> int:
+        """
+        提交导出任务，返回任务 ID；force_refresh 为 True 时忽略结果缓存，params 为脚本参数名称 -> 文本值，
+        resume 为 True 时从断点继续上次中断的导出.
+        """
+        script = self.db.scripts.get(script_name)
+        return self._submit(ExportJob(
+            job_id=next(self._job_ids),
+            script_name=script_name,
+            output_path=output_path,
+            data_source_name=script.data_source_name if script else "",
+            task=ExportTask(self.db, script_name, output_path, force_refresh, params, resume)
+        ))
+
+    def export_workbook(self, workbook_name, output_path, params=None) -> int:
+        """
+        提交工作簿导出任务，返回任务 ID；工作簿内的查询在任务内部并发执行，
+        任务按第一个工作表所用脚本的数据源参与并发调度.
+        """
+        workbook = self.db.workbooks.get(workbook_name)
+        script = self.db.scripts.get(workbook.sheets[0].script_name) if workbook and workbook.sheets else None
+        return self._submit(ExportJob(
+            job_id=next(self._job_ids),
+            script_name=workbook_name,
+            output_path=output_path,
+            data_source_name=script.data_source_name if script else "",
+            task=WorkbookExportTask(self.db, workbook_name, output_path, params=params)
+        ))
+
+    def _submit(self, job: ExportJob) -> int:
+        relay = _JobSignalRelay(job.job_id, self)
+        job.task.signals.progress.connect(relay.on_progress)
+        job.task.signals.total_rows.connect(relay.on_total_rows)
+        job.task.signals.finished.connect(relay.on_finished)
+        job.task.signals.failed.connect(relay.on_failed)
+        job.task.signals.done.connect(relay.on_done)
+        self._relays[job.job_id] = relay
+        self.jobs[job.job_id] = job
+        self.job_updated.emit(job.job_id)
+        self._schedule()
+        return job.job_id
+
+    def active_job_for_script(self, script_name) -> Optional[ExportJob]:
+        """返回脚本最近一个排队中或导出中的任务"""
+        for job in reversed(list(self.jobs.values())):
+            if job.script_name == script_name and job.is_active:
+                return job
+        return None
+
+    def cancel_export(self, job_id):
+        """取消指定导出任务：排队中的任务直接移出队列，运行中的任务标记取消"""
+        job = self.jobs.get(job_id)
+        if not job or not job.is_active:
+            return
+        job.task.cancel()
+        if job.status == ExportJobStatus.QUEUED:
+            self._set_status(job, ExportJobStatus.CANCELLED, "导出已取消")
+            self._release_relay(job_id)
+
+    def clear_completed(self):
+        """移除已结束的任务记录"""
+        for job_id in [job.job_id for job in self.jobs.values() if not job.is_active]:
+            del self.jobs[job_id]
+            self.job_updated.emit(job_id)
+
+    def _schedule(self):
+        running = Counter(job.data_source_name for job in self.jobs.values()
+                          if job.status == ExportJobStatus.RUNNING)
+        total_running = sum(running.values())
+        for job in self.jobs.values():
+            if total_running >= self.MAX_CONCURRENT_JOBS:
+                break
+            if job.status != ExportJobStatus.QUEUED:
+                continue
+            if running[job.data_source_name] >= self._concurrency_limit(job.data_source_name):
+                continue
+            running[job.data_source_name] += 1
+            total_running += 1
+            self._set_status(job, ExportJobStatus.RUNNING)
+            self.thread_pool.start(job.task)
+
+    def _concurrency_limit(self, data_source_name) -> int:
+        data_source = self.db.data_sources.get(data_source_name)
+        return max(data_source.max_concurrent_exports, 1) if data_source else 1
+
+    def _set_status(self, job: ExportJob, status: ExportJobStatus, message: str = ""):
+        job.status = status
+        if message:
+            job.message = message
+        self.job_updated.emit(job.job_id)
+
+    def _release_relay(self, job_id):
+        relay = self._relays.pop(job_id, None)
+        if relay:
+            relay.deleteLater()
+
+    def _update_progress(self, job_id, progress: ExportProgress):
+        job = self.jobs.get(job_id)
+        if job:
+            job.progress = progress
+            self.job_updated.emit(job_id)
+        self.progress_updated.emit(job_id, progress)
+
+    def _set_total_rows(self, job_id, total_rows):
+        self.total_rows_updated.emit(job_id, total_rows)
+
+    def _export_finished(self, job_id, message, stats):
+        job = self.jobs.get(job_id)
+        if job:
+            job.stats = stats
+            self._set_status(job, ExportJobStatus.FINISHED, message)
+        self.export_finished.emit(job_id, message, stats)
+
+    def _export_failed(self, job_id, message):
+        job = self.jobs.get(job_id)
+        if job:
+            self._set_status(job, ExportJobStatus.FAILED, message)
+        self.export_failed.emit(job_id, message)
+
+    def _job_done(self, job_id):
+        job = self.jobs.get(job_id)
+        if job and job.status == ExportJobStatus.RUNNING:
+            # 线程结束但未发出完成或失败信号，说明任务已被取消
+            self._set_status(job, ExportJobStatus.CANCELLED, "导出已取消")
+        self._release_relay(job_id)
+        self._schedule()
 
     @staticmethod
     def _write_to_excel_rowline(sheet: any, row: int, rowline: list):
@@ -1,13 +1,29 @@
 import json
+import threading
 from pathlib import Path
-from typing import Dict, List
-from core.models import DataBase, ExportScript, DataBaseType
+from typing import Any, Dict, List
+from core.models import DataBase, ExportScript, DataBaseType, TotalRowsStrategy, OutputFormat, OutputCompression, \
+    ExtractionMode, WatermarkMode, ScriptParameter, ParameterType, ScriptSchema, WorkbookJob, WorkbookSheet
+from core.schema_registry import schema_to_dict, schema_from_dict
+from core.watermark import encode_watermark, decode_watermark
 
 class LocalStorage:
     def __init__(self, file_path: str = "config.json"):
         self.file_path = Path(file_path)
         self.data_sources: Dict[str, DataBase] = {}
         self.scripts: Dict[str, ExportScript] = {}
+        # 多工作表导出：工作簿名称 -> 各工作表对应的脚本
+        self.workbooks: Dict[str, WorkbookJob] = {}
+        # 增量导出的水位：脚本名称 -> 上次导出的水位字段最大值
+        self.watermarks: Dict[str, Any] = {}
+        # 查询结果的列信息：脚本名称 -> 最近一次导出时登记的列名和类型
+        self.schemas: Dict[str, ScriptSchema] = {}
+        # 断点续传：脚本名称 -> 最近一次导出的输出文件，断点文件保存在其旁边
+        self.checkpoint_outputs: Dict[str, str] = {}
+        # 导出统计日志(JSON Lines)路径，为空表示不记录
+        self.stats_log_path = ""
+        # 导出线程更新水位、列信息并保存时，界面可能同时修改配置；可重入，修改后在锁内调用 save
+        self.lock = threading.RLock()
         self.load()
 
     def load(self):
@@ -22,18 +38,88 @@ class LocalStorage:
                         port=ds['port'],
                         username=ds.get('username', ''),
                         password=ds.get('password', ''),
-                        database=ds.get('database', '')
+                        database=ds.get('database', ''),
+                        pool_size=ds.get('pool_size', 2),
+                        pool_idle_timeout=ds.get('pool_idle_timeout', 300),
+                        max_concurrent_exports=ds.get('max_concurrent_exports', 2)
                     )
                 for script in data.get('scripts', []):
                     self.scripts[script['name']] = ExportScript(
                         name=script['name'],
                         fields=script['fields'],
                         sql=script['sql'],
-                        data_source_name=script.get('data_source_name', '')
+                        data_source_name=script.get('data_source_name', ''),
+                        fetch_size=script.get('fetch_size', 500),
+                        adaptive_fetch=script.get('adaptive_fetch', True),
+                        fetch_memory_limit_mb=script.get('fetch_memory_limit_mb', 64),
+                        total_rows_strategy=TotalRowsStrategy(script.get('total_rows_strategy', 'exact')),
+                        max_rows_per_file=script.get('max_rows_per_file', 0),
+                        partition_column=script.get('partition_column', ''),
+                        partition_count=script.get('partition_count', 1),
+                        decimal_as_text=script.get('decimal_as_text', False),
+                        output_format=OutputFormat(script.get('output_format', 'xlsx')),
+                        output_compression=OutputCompression(script.get('output_compression', 'none')),
+                        extraction_mode=ExtractionMode(script.get('extraction_mode', 'cursor')),
+                        xlsx_processes=script.get('xlsx_processes', 1),
+                        cache_ttl_seconds=script.get('cache_ttl_seconds', 0),
+                        statement_timeout_seconds=script.get('statement_timeout_seconds', 0),
+                        checkpoint_column=script.get('checkpoint_column', ''),
+                        watermark_column=script.get('watermark_column', ''),
+                        watermark_mode=WatermarkMode(script.get('watermark_mode', 'delta')),
+                        parameters=[
+                            ScriptParameter(
+                                name=parameter['name'],
+                                type=ParameterType(parameter.get('type', 'string')),
+                                default=parameter.get('default', '')
+                            ) for parameter in script.get('parameters', [])
+                        ]
                     )
+                for workbook in data.get('workbooks', []):
+                    self.workbooks[workbook['name']] = WorkbookJob(
+                        name=workbook['name'],
+                        sheets=[
+                            WorkbookSheet(
+                                script_name=sheet['script_name'],
+                                sheet_name=sheet.get('sheet_name', '')
+                            ) for sheet in workbook.get('sheets', [])
+                        ],
+                        max_concurrent_queries=workbook.get('max_concurrent_queries', 4)
+                    )
+                for name, value in data.get('watermarks', {}).items():
+                    self.watermarks[name] = decode_watermark(value)
+                for name, schema in data.get('schemas', {}).items():
+                    self.schemas[name] = schema_from_dict(schema)
+                self.checkpoint_outputs = dict(data.get('checkpoint_outputs', {}))
+                self.stats_log_path = data.get('stats_log_path', '')
 
     def save(self):
-        data = {
+        with self.lock:
+            self._write(self._snapshot())
+
+    def save_script_state(self, states: Dict[str, Any], script_name: str, value: Any):
+        """
+            在锁内记录脚本的导出状态(水位、列信息、断点输出文件)并保存，导出期间脚本已被删除时忽略，避免写回已删除的脚本.
+
+            参数:
+                states: 按脚本名称保存的状态表，如 watermarks.
+                script_name: 脚本名称.
+                value: 状态值.
+            """
+        with self.lock:
+            if script_name not in self.scripts:
+                return
+            states[script_name] = value
+            self.save()
+
+    def _snapshot(self) -> Dict[str, Any]:
+        """复制各配置表后再序列化(调用方持有 lock，界面和导出线程都在 lock 内修改配置)"""
+        data_sources = list(self.data_sources.values())
+        scripts = list(self.scripts.values())
+        workbooks = list(self.workbooks.values())
+        watermarks = dict(self.watermarks)
+        schemas = dict(self.schemas)
+        checkpoint_outputs = dict(self.checkpoint_outputs)
+        return {
             'data_sources': [
                 {
                     'name': ds.name,
@@ -42,17 +128,63 @@ class LocalStorage:
                     'port': ds.port,
                     'username': ds.username,
                     'password': ds.password,
-                    'database': ds.database
-                } for ds in self.data_sources.values()
+                    'database': ds.database,
+                    'pool_size': ds.pool_size,
+                    'pool_idle_timeout': ds.pool_idle_timeout,
+                    'max_concurrent_exports': ds.max_concurrent_exports
+                } for ds in data_sources
             ],
             'scripts': [
                 {
                     'name': script.name,
                     'fields': script.fields,
                     'sql': script.sql,
-                    'data_source_name': script.data_source_name
-                } for script in self.scripts.values()
-            ]
+                    'data_source_name': script.data_source_name,
+                    'fetch_size': script.fetch_size,
+                    'adaptive_fetch': script.adaptive_fetch,
+                    'fetch_memory_limit_mb': script.fetch_memory_limit_mb,
+                    'total_rows_strategy': script.total_rows_strategy.value,
+                    'max_rows_per_file': script.max_rows_per_file,
+                    'partition_column': script.partition_column,
+                    'partition_count': script.partition_count,
+                    'decimal_as_text': script.decimal_as_text,
+                    'output_format': script.output_format.value,
+                    'output_compression': script.output_compression.value,
+                    'extraction_mode': script.extraction_mode.value,
+                    'xlsx_processes': script.xlsx_processes,
+                    'cache_ttl_seconds': script.cache_ttl_seconds,
+                    'statement_timeout_seconds': script.statement_timeout_seconds,
+                    'checkpoint_column': script.checkpoint_column,
+                    'watermark_column': script.watermark_column,
+                    'watermark_mode': script.watermark_mode.value,
+                    'parameters': [
+                        {
+                            'name': parameter.name,
+                            'type': parameter.type.value,
+                            'default': parameter.default
+                        } for parameter in script.parameters
+                    ]
+                } for script in scripts
+            ],
+            'workbooks': [
+                {
+                    'name': workbook.name,
+                    'sheets': [
+                        {
+                            'script_name': sheet.script_name,
+                            'sheet_name': sheet.sheet_name
+                        } for sheet in workbook.sheets
+                    ],
+                    'max_concurrent_queries': workbook.max_concurrent_queries
+                } for workbook in workbooks
+            ],
+            'watermarks': {name: encode_watermark(value) for name, value in watermarks.items()
+                           if value is not None},
+            'schemas': {name: schema_to_dict(schema) for name, schema in schemas.items()},
+            'checkpoint_outputs': checkpoint_outputs,
+            'stats_log_path': self.stats_log_path
         }
+
+    def _write(self, data: Dict[str, Any]):
         with open(self.file_path, 'w', encoding='utf-8') as f:
             json.dump(data, f, indent=2, ensure_ascii=False)
\ No newline at end of file
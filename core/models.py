@@ -1,10 +1,49 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from enum import Enum
+from typing import Any, List, Optional
 
 class DataBaseType(Enum):
     MYSQL = "MySQL"
     POSTGRESQL = "PostgreSQL"
 
+class TotalRowsStrategy(Enum):
+    EXACT = "exact"  # 执行 COUNT(*) 精确统计
+    ESTIMATE = "estimate"  # 使用 EXPLAIN 的估算行数
+    NONE = "none"  # 不统计总行数(进度不确定)
+
+class ExtractionMode(Enum):
+    CURSOR = "cursor"  # 游标 fetchmany 按批拉取
+    COPY = "copy"  # PostgreSQL COPY (sql) TO STDOUT，导出 CSV/TSV 时原样写入(布尔为 t/f，bytea 为 \x 十六进制)
+
+class WatermarkMode(Enum):
+    DELTA = "delta"  # 每次导出新增的行到新文件
+    APPEND = "append"  # 追加到已有文件(仅 CSV/TSV，其它格式按 DELTA 处理)
+
+class OutputFormat(Enum):
+    XLSX = "xlsx"
+    CSV = "csv"
+    TSV = "tsv"
+    PARQUET = "parquet"  # 需要安装 pyarrow
+
+class OutputCompression(Enum):
+    """CSV/TSV 文件或 Parquet 列数据的压缩方式"""
+    NONE = "none"
+    GZIP = "gzip"
+    ZSTD = "zstd"  # 需要安装 zstandard
+    SNAPPY = "snappy"  # 仅 Parquet
+
+class ColumnType(Enum):
+    """查询结果列在 Excel 中的写入类型"""
+    STRING = "string"
+    NUMBER = "number"
+    INTEGER = "integer"
+    DECIMAL = "decimal"
+    DATETIME = "datetime"
+    DATE = "date"
+    TIME = "time"
+    BOOLEAN = "boolean"
+    BYTES = "bytes"
+
 @dataclass
 class DataBase:
     name: str
@@ -14,10 +53,72 @@ class DataBase:
     username: str = ""
     password: str = ""
     database: str = ""
+    pool_size: int = 2  # 连接池保留的最大空闲连接数
+    pool_idle_timeout: int = 300  # 空闲连接保留秒数
+    max_concurrent_exports: int = 2  # 该数据源同时执行的导出任务上限
+
+class ParameterType(Enum):
+    STRING = "string"
+    INTEGER = "integer"
+    NUMBER = "number"
+    DATE = "date"
+    DATETIME = "datetime"
+
+@dataclass
+class ScriptParameter:
+    """脚本参数，SQL 中以 %(name)s 引用，由驱动绑定"""
+    name: str
+    type: ParameterType = ParameterType.STRING
+    default: str = ""  # 默认值(文本形式)，为空表示导出时必须填写
+
+@dataclass
+class SchemaColumn:
+    """查询结果的一列，来自 cursor.description"""
+    name: str
+    column_type: ColumnType = ColumnType.STRING  # 写入类型，决定单元格格式
+    type_code: Any = None  # 驱动类型码(MySQL FIELD_TYPE / PostgreSQL OID)
+    precision: Optional[int] = None
+    scale: Optional[int] = None
+
+@dataclass
+class ScriptSchema:
+    """脚本查询结果的列信息，SQL 或数据源变化后失效"""
+    fingerprint: str  # 数据源和 SQL 的哈希
+    columns: List[SchemaColumn] = field(default_factory=list)
 
 @dataclass
 class ExportScript:
     name: str
-    fields: str  # 逗号分隔的字段名
+    fields: str  # 逗号分隔的表头名称，为空时使用查询返回的列名
     sql: str
-    data_source_name: str = ""
\ No newline at end of file
+    data_source_name: str = ""
+    fetch_size: int = 500  # 每批次从数据库拉取的行数(PostgreSQL 服务端游标 itersize)，自适应时为初始值
+    adaptive_fetch: bool = True  # 根据行宽和拉取耗时自动调整每批行数
+    fetch_memory_limit_mb: int = 64  # 拉取数据占用内存的上限
+    total_rows_strategy: TotalRowsStrategy = TotalRowsStrategy.EXACT
+    statement_timeout_seconds: int = 0  # 单条语句在数据库上的最长执行时间，超时由数据库中止，0 表示不限制
+    max_rows_per_file: int = 0  # 每个文件最多写入的行数，超过后拆分为多个文件，0 表示不拆分
+    partition_column: str = ""  # 分区字段(数值或日期)，为空表示不分区
+    partition_count: int = 1  # 分区数，即并行拉取的连接数
+    decimal_as_text: bool = False  # 超过 Excel 15 位有效数字的 Decimal 以文本写入，保留精度
+    output_format: OutputFormat = OutputFormat.XLSX
+    output_compression: OutputCompression = OutputCompression.NONE
+    watermark_column: str = ""  # 水位字段(自增 ID 或更新时间)，为空表示全量导出
+    watermark_mode: WatermarkMode = WatermarkMode.DELTA
+    parameters: List[ScriptParameter] = field(default_factory=list)  # 有参数时 SQL 中的 % 需写为 %%
+    cache_ttl_seconds: int = 0  # 查询结果缓存的有效期，0 表示不缓存
+    checkpoint_column: str = ""  # 断点续传的排序键(唯一且不变，如主键)，每写完一个拆分文件记录一次断点
+    xlsx_processes: int = 1  # 拆分文件时并行生成 XLSX 的进程数，1 表示不使用子进程
+    extraction_mode: ExtractionMode = ExtractionMode.CURSOR  # COPY 仅适用于 PostgreSQL 且不分区的导出
+
+@dataclass
+class WorkbookSheet:
+    script_name: str
+    sheet_name: str = ""  # 工作表名称，为空时使用脚本名称
+
+@dataclass
+class WorkbookJob:
+    """把多个脚本的查询结果写入同一个 Excel 文件的不同工作表"""
+    name: str
+    sheets: List[WorkbookSheet] = field(default_factory=list)  # 按工作表顺序排列
+    max_concurrent_queries: int = 4  # 同时执行的查询数(每个查询使用一个连接)
\ No newline at end of file
@@ -0,0 +1,63 @@
+import datetime
+import itertools
+import re
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from core.models import ParameterType, ScriptParameter
+
+_PARSERS = {
+    ParameterType.STRING: str,
+    ParameterType.INTEGER: int,
+    ParameterType.NUMBER: float,
+    ParameterType.DATE: datetime.date.fromisoformat,
+    ParameterType.DATETIME: datetime.datetime.fromisoformat,
+}
+
+
+def parse_value(parameter: ScriptParameter, text: str) -> Any:
+    """按参数类型把文本转换为绑定值"""
+    try:
+        return _PARSERS[parameter.type](text if parameter.type == ParameterType.STRING else text.strip())
+    except ValueError:
+        raise ValueError(f"Invalid {parameter.type.value} value '{text}' for parameter '{parameter.name}'")
+
+
+def resolve_runs(parameters: List[ScriptParameter],
+                 values: Optional[Dict[str, Union[str, List[str]]]] = None) -> List[Tuple[str, Dict[str, Any]]]:
+    """
+            根据填写的参数值生成每次导出的参数.
+
+            参数:
+                parameters: 脚本定义的参数.
+                values: 参数名称 -> 文本值，未填写时使用默认值；值为列表时按所有组合各导出一个文件，
+                    文本值中的逗号等字符原样绑定.
+            返回:
+                [(文件名后缀, 参数名称 -> 绑定值)]，只有一次导出时后缀为空.
+            """
+    values = values or {}
+    choices = []
+    for parameter in parameters:
+        text = values.get(parameter.name, parameter.default)
+        texts = [text] if text is None or isinstance(text, str) else list(text)
+        if not texts or any(item is None or item == "" for item in texts):
+            raise ValueError(f"Missing value for parameter '{parameter.name}'")
+        choices.append([(item, parse_value(parameter, item)) for item in texts])
+
+    runs = []
+    fan_out = any(len(items) > 1 for items in choices)
+    for combination in itertools.product(*choices):
+        suffix = "_".join(_file_name_part(text) for text, _ in combination) if fan_out else ""
+        params = {parameter.name: value for parameter, (_, value) in zip(parameters, combination)}
+        runs.append((suffix, params))
+
+    # 不同的值替换特殊字符后可能得到相同的文件名(文件系统可能不区分大小写)，导出前拒绝，避免互相覆盖
+    seen = set()
+    for suffix, _ in runs:
+        if suffix.lower() in seen:
+            raise ValueError(f"Parameter values produce duplicate file name suffix '{suffix}'")
+        seen.add(suffix.lower())
+    return runs
+
+
+def _file_name_part(text: str) -> str:
+    return re.sub(r'[\\/:*?"<>|\s]+', '-', text)
@@ -0,0 +1,91 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, List, Optional
+
+from core import result_cache
+from core.models import ColumnType, DataBase
+
+# 默认预览行数
+DEFAULT_PREVIEW_ROWS = 200
+
+
+@dataclass
+class PreviewResult:
+    columns: List[str]  # 列名(来自 cursor.description)
+    column_types: List[ColumnType]
+    rows: List[tuple]  # 最多 limit 行
+    elapsed_seconds: float = 0.0  # 查询耗时
+    from_cache: bool = False
+
+
+def preview_key(script_name: str, database: DataBase, sql: str, params: Optional[dict], limit: int) -> str:
+    """
+            预览样本的缓存键：脚本名称、查询结果缓存键(数据源、SQL 和参数的哈希)及行数.
+
+            参数:
+                script_name: 脚本名称(新建未保存的脚本为空).
+                database: 数据源.
+                sql: 查询语句.
+                params: 查询参数.
+                limit: 预览行数.
+            """
+    payload = f"{script_name}\n{result_cache.cache_key(database, sql, params)}\n{limit}"
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class PreviewCache:
+    """
+    内存中的预览样本缓存，按最近使用淘汰(LRU).
+
+    参数:
+        max_entries: 最多保留的样本数.
+    注意：样本只有几百行，不设过期时间；需要最新数据时由调用方跳过缓存重新查询
+    """
+
+    def __init__(self, max_entries: int = 32):
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[str, PreviewResult]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[PreviewResult]:
+        with self._lock:
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+            return result
+
+    def put(self, key: str, result: PreviewResult):
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_default_cache: Optional[PreviewCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def default_cache() -> PreviewCache:
+    """进程内共享的预览缓存"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = PreviewCache()
+        return _default_cache
+
+
+def format_value(value: Any) -> str:
+    """预览表格中单元格的显示文本"""
+    if value is None:
+        return "NULL"
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        data = bytes(value)
+        return "0x" + data[:32].hex() + ("..." if len(data) > 32 else "")
+    return str(value)
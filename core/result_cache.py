@@ -0,0 +1,243 @@
+import hashlib
+import json
+import os
+import stat
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Iterator, List, Optional
+
+from core.models import ColumnType, DataBase
+from utils import spool_util
+from utils.output_writer import OutputWriter
+
+# 缓存总大小上限
+DEFAULT_MAX_BYTES = 2 * 1024 * 1024 * 1024
+
+
+def default_cache_dir() -> str:
+    """当前用户的缓存目录：Windows 为 %LOCALAPPDATA%，macOS 为 ~/Library/Caches，其它系统为 $XDG_CACHE_HOME 或 ~/.cache"""
+    if sys.platform == 'win32':
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser(os.path.join('~', 'AppData', 'Local'))
+    elif sys.platform == 'darwin':
+        base = os.path.expanduser(os.path.join('~', 'Library', 'Caches'))
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser(os.path.join('~', '.cache'))
+    return os.path.join(base, 'sql2excel', 'results')
+
+
+def _ensure_private_dir(directory: str):
+    """创建仅当前用户可访问(0700)的目录；目录属于其他用户或为符号链接时抛出 PermissionError"""
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    if not hasattr(os, 'getuid'):
+        # Windows 的用户目录本身只有当前用户可访问
+        return
+    st = os.lstat(directory)
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid():
+        raise PermissionError(f"Cache directory '{directory}' is not a directory owned by the current user")
+    if st.st_mode & 0o077:
+        os.chmod(directory, 0o700)
+
+
+def _is_private_file(path: str) -> bool:
+    """文件是否为当前用户所有、其他用户不可写的普通文件(缓存数据用 pickle 读取，不能信任其他来源)"""
+    try:
+        st = os.lstat(path)
+    except OSError:
+        return False
+    if not stat.S_ISREG(st.st_mode):
+        return False
+    if not hasattr(os, 'getuid'):
+        return True
+    return st.st_uid == os.getuid() and not st.st_mode & 0o022
+
+
+def cache_key(database: DataBase, sql: str, params: Optional[dict] = None) -> str:
+    """
+            查询结果的缓存键：SQL、数据源标识(类型、地址、用户、库名)和参数的哈希.
+
+            参数:
+                database: 数据源.
+                sql: 查询语句.
+                params: 查询参数.
+            """
+    identity = [database.type.value, database.host, str(database.port), database.username, database.database]
+    payload = json.dumps([identity, sql, params or {}], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+@dataclass
+class CacheEntry:
+    key: str
+    data_path: str  # 数据批次(spool 格式)
+    rows: int
+    created: float
+    column_types: Optional[List[ColumnType]] = None
+    description: Optional[List[tuple]] = None
+
+    def iter_batches(self) -> Iterator[List[Any]]:
+        return spool_util.read_batches(self.data_path)
+
+
+class ResultCache:
+    """
+    磁盘上的查询结果缓存：每个结果由数据文件(.spool)和元数据文件(.json)组成.
+
+    - 过期时间由调用方按脚本传入，过期的结果在读取时删除；
+    - 总大小超过 max_bytes 时按最近访问时间淘汰(LRU，命中时刷新元数据文件的修改时间).
+
+    参数:
+        directory: 缓存目录，默认为当前用户的缓存目录.
+        max_bytes: 缓存总大小上限.
+    注意：缓存目录仅当前用户可访问，不是当前用户所有的缓存文件一律视为未命中
+    """
+
+    def __init__(self, directory: str = None, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = directory or default_cache_dir()
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        _ensure_private_dir(self.directory)
+
+    def get(self, key: str, ttl_seconds: int) -> Optional[CacheEntry]:
+        """读取未过期的缓存结果，不存在或已过期时返回 None"""
+        meta_path, data_path = self._paths(key)
+        with self._lock:
+            if not _is_private_file(meta_path):
+                return None
+            try:
+                with open(meta_path, 'r', encoding='utf-8') as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                return None
+            if time.time() - meta['created'] > ttl_seconds or not _is_private_file(data_path):
+                self._remove(key)
+                return None
+            os.utime(meta_path)
+        return CacheEntry(
+            key=key,
+            data_path=data_path,
+            rows=meta['rows'],
+            created=meta['created'],
+            column_types=[ColumnType(value) for value in meta['column_types']] if meta.get('column_types') else None,
+            description=[tuple(column) for column in meta['description']] if meta.get('description') else None
+        )
+
+    def recorder(self, key: str, writer: OutputWriter) -> 'CacheRecorder':
+        """包装写入器，写入的同时把数据记录到缓存，调用 commit 后生效"""
+        return CacheRecorder(self, key, writer)
+
+    def put(self, key: str, spool_path: str, rows: int, column_types: Optional[List[ColumnType]],
+            description: Optional[List[tuple]]):
+        """把已写完的暂存文件登记为缓存结果，并按 LRU 淘汰超出大小上限的结果"""
+        meta_path, data_path = self._paths(key)
+        meta = {
+            'created': time.time(),
+            'rows': rows,
+            'column_types': [column_type.value for column_type in column_types] if column_types else None,
+            'description': [list(column) for column in description] if description else None,
+        }
+        with self._lock:
+            os.replace(spool_path, data_path)
+            temp_meta_path = f"{meta_path}.tmp"
+            with open(temp_meta_path, 'w', encoding='utf-8') as f:
+                json.dump(meta, f, default=str)
+            os.replace(temp_meta_path, meta_path)
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            for key in self._keys():
+                self._remove(key)
+
+    def _evict(self):
+        entries = []
+        total_bytes = 0
+        for key in self._keys():
+            meta_path, data_path = self._paths(key)
+            try:
+                size = os.path.getsize(data_path) + os.path.getsize(meta_path)
+                accessed = os.path.getmtime(meta_path)
+            except OSError:
+                continue
+            entries.append((accessed, key, size))
+            total_bytes += size
+        for _, key, size in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            self._remove(key)
+            total_bytes -= size
+
+    def _keys(self) -> List[str]:
+        return [name[:-len(".json")] for name in os.listdir(self.directory) if name.endswith(".json")]
+
+    def _remove(self, key: str):
+        for path in self._paths(key):
+            spool_util.remove_spool(path)
+
+    def _paths(self, key: str):
+        return os.path.join(self.directory, f"{key}.json"), os.path.join(self.directory, f"{key}.spool")
+
+
+class CacheRecorder(OutputWriter):
+    """
+    转发到实际写入器，同时把数据批次写入缓存暂存文件.
+
+    注意：写入器关闭后调用 commit 缓存才生效，取消或出错(abort)时暂存文件被删除
+    """
+
+    def __init__(self, cache: ResultCache, key: str, writer: OutputWriter):
+        # 写入行数和文件列表取自实际写入器，不调用基类初始化
+        self.column_types: Optional[List[ColumnType]] = None
+        self.description: Any = None
+        self.cache = cache
+        self.key = key
+        self.writer = writer
+        self.spool = spool_util.SpoolWriter(cache.directory)
+
+    @property
+    def rows_written(self) -> int:
+        return self.writer.rows_written
+
+    @property
+    def output_files(self) -> List[str]:
+        return self.writer.output_files
+
+    def set_column_types(self, column_types: List[ColumnType], description: Any = None):
+        super().set_column_types(column_types, description)
+        self.writer.set_column_types(column_types, description)
+
+    def write_rows(self, rows: List[Any]):
+        self.spool.write_batch(rows)
+        self.writer.write_rows(rows)
+
+    def commit(self):
+        """数据已完整写入，登记为缓存结果"""
+        description = [tuple(column) for column in self.description] if self.description else None
+        self.cache.put(self.key, self.spool.path, self.spool.rows, self.column_types, description)
+
+    def close(self):
+        self.spool.close()
+        try:
+            self.writer.close()
+        except BaseException:
+            spool_util.remove_spool(self.spool.path)
+            raise
+
+    def abort(self):
+        self.spool.close()
+        spool_util.remove_spool(self.spool.path)
+        self.writer.abort()
+
+
+_default_cache: Optional[ResultCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def default_cache() -> ResultCache:
+    """进程内共享的结果缓存"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ResultCache()
+        return _default_cache
@@ -0,0 +1,173 @@
+import os
+from typing import Any, Callable, Dict, List, Optional
+
+from core import result_cache
+from core.models import ColumnType, DataBase, ExportScript, SchemaColumn, ScriptSchema
+from utils.output_writer import OutputWriter
+
+
+def schema_fingerprint(database: DataBase, sql: str) -> str:
+    """列信息的有效性标识：数据源和 SQL 不变时列不变(参数只影响行)"""
+    return result_cache.cache_key(database, sql)
+
+
+def build_schema(fingerprint: str, description: Any, column_types: List[ColumnType]) -> ScriptSchema:
+    """
+            根据 cursor.description 和驱动类型映射出的列类型登记列信息.
+
+            参数:
+                fingerprint: 数据源和 SQL 的哈希.
+                description: 查询结果的 cursor.description.
+                column_types: 每列的写入类型.
+            """
+    return ScriptSchema(
+        fingerprint=fingerprint,
+        columns=[
+            SchemaColumn(
+                name=column[0],
+                column_type=column_type,
+                type_code=column[1],
+                precision=column[4],
+                scale=column[5]
+            ) for column, column_type in zip(description, column_types)
+        ]
+    )
+
+
+def schema_description(schema: ScriptSchema) -> List[tuple]:
+    """还原为 cursor.description 形式(列名、类型码、精度和小数位)，供写入器使用"""
+    return [(column.name, column.type_code, None, None, column.precision, column.scale, None)
+            for column in schema.columns]
+
+
+def schema_column_types(schema: ScriptSchema) -> List[ColumnType]:
+    return [column.column_type for column in schema.columns]
+
+
+def matches_description(schema: ScriptSchema, description: Any) -> bool:
+    """查询实际返回的列与登记的列是否一致(列数和列名)"""
+    names = [column[0] for column in description or []]
+    return names == [column.name for column in schema.columns]
+
+
+def header_columns(script: ExportScript, schema: ScriptSchema) -> List[str]:
+    """
+            表头：脚本填写了字段名称时作为各列的显示名称，否则使用查询返回的列名；
+            字段名称的数量与查询列数不一致时同样使用查询返回的列名(见 fields_warning).
+
+            参数:
+                script: 导出脚本.
+                schema: 查询结果的列信息.
+            """
+    fields = script_fields(script)
+    if not fields or len(fields) != len(schema.columns):
+        return [column.name for column in schema.columns]
+    return fields
+
+
+def fields_warning(script: ExportScript, schema: ScriptSchema) -> Optional[str]:
+    """脚本填写的字段名称数量与查询列数不一致时返回提示，否则返回 None"""
+    fields = script_fields(script)
+    if not fields or len(fields) == len(schema.columns):
+        return None
+    return (f"Script has {len(fields)} fields but the query returns {len(schema.columns)} columns "
+            f"({', '.join(column.name for column in schema.columns)}); the query column names were used as the header")
+
+
+def script_fields(script: ExportScript) -> List[str]:
+    """脚本填写的字段名称，未填写时为空列表"""
+    if not script.fields.strip():
+        return []
+    return [name.strip() for name in script.fields.split(',')]
+
+
+class SchemaWriter(OutputWriter):
+    """
+    转发到按列信息创建的写入器，查询实际返回的列与登记的不一致时按新的列信息重新创建写入器(表头和列类型).
+
+    参数:
+        create_writer: 根据列信息创建写入器并设置列类型.
+        schema: 登记的列信息.
+        replaceable: 是否允许重新创建(追加到已有文件或继续断点时，已写出的数据使用原来的列，不能替换).
+    注意：只能在写入第一批数据前重新创建，原写入器生成的文件被删除后由新写入器重新生成
+    """
+
+    def __init__(self, create_writer: Callable[[ScriptSchema], OutputWriter], schema: ScriptSchema,
+                 replaceable: bool = True):
+        # 列类型、写入行数和文件列表取自实际写入器，不调用基类初始化
+        self.create_writer = create_writer
+        self.replaceable = replaceable
+        self.started = False
+        self.writer = create_writer(schema)
+
+    @property
+    def column_types(self) -> Optional[List[ColumnType]]:
+        return self.writer.column_types
+
+    @property
+    def description(self) -> Any:
+        return self.writer.description
+
+    @property
+    def rows_written(self) -> int:
+        return self.writer.rows_written
+
+    @property
+    def output_files(self) -> List[str]:
+        return self.writer.output_files
+
+    def set_column_types(self, column_types: List[ColumnType], description: Any = None):
+        self.writer.set_column_types(column_types, description)
+
+    def write_rows(self, rows: List[Any]):
+        self.started = True
+        self.writer.write_rows(rows)
+
+    def reopen(self, schema: ScriptSchema):
+        """放弃当前写入器及其生成的文件，按新的列信息重新创建"""
+        if self.started or not self.replaceable:
+            raise ValueError("Query columns have changed and no longer match the data already written; "
+                             "the column schema has been refreshed, please export again")
+        # 重新创建失败时外层放弃的是空写入器，不会再次放弃原写入器
+        writer, self.writer = self.writer, OutputWriter()
+        writer.abort()
+        for path in writer.output_files:
+            if os.path.exists(path):
+                os.remove(path)
+        self.writer = self.create_writer(schema)
+
+    def close(self):
+        self.writer.close()
+
+    def abort(self):
+        self.writer.abort()
+
+
+def schema_to_dict(schema: ScriptSchema) -> Dict[str, Any]:
+    return {
+        'fingerprint': schema.fingerprint,
+        'columns': [
+            {
+                'name': column.name,
+                'column_type': column.column_type.value,
+                'type_code': column.type_code,
+                'precision': column.precision,
+                'scale': column.scale
+            } for column in schema.columns
+        ]
+    }
+
+
+def schema_from_dict(data: Dict[str, Any]) -> ScriptSchema:
+    return ScriptSchema(
+        fingerprint=data['fingerprint'],
+        columns=[
+            SchemaColumn(
+                name=column['name'],
+                column_type=ColumnType(column.get('column_type', 'string')),
+                type_code=column.get('type_code'),
+                precision=column.get('precision'),
+                scale=column.get('scale')
+            ) for column in data.get('columns', [])
+        ]
+    )
@@ -0,0 +1,31 @@
+import datetime
+import json
+import threading
+from dataclasses import asdict
+
+from core.export_context import ExportStats
+
+# 多个导出任务可能同时追加
+_lock = threading.Lock()
+
+
+def append_stats(path: str, script_name: str, output_path: str, stats: ExportStats):
+    """
+            把一次导出的统计追加为 JSON Lines 日志的一行，便于分析耗时趋势.
+
+            参数:
+                path: 日志文件路径.
+                script_name: 脚本名称.
+                output_path: 输出文件路径.
+                stats: 导出统计.
+            """
+    record = {
+        'time': datetime.datetime.now().isoformat(timespec='seconds'),
+        'script': script_name,
+        'output_path': output_path,
+        **asdict(stats)
+    }
+    line = json.dumps(record, ensure_ascii=False)
+    with _lock:
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(line + '\n')
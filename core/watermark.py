@@ -0,0 +1,89 @@
+import datetime
+from decimal import Decimal
+from typing import Any, List, Optional
+
+from core.models import ColumnType
+from utils.output_writer import OutputWriter
+
+# 水位值在配置文件中的类型标记
+_VALUE_TYPES = {
+    'int': (int, int),
+    'float': (float, float),
+    'decimal': (Decimal, Decimal),
+    'datetime': (datetime.datetime, datetime.datetime.fromisoformat),
+    'date': (datetime.date, datetime.date.fromisoformat),
+    'str': (str, str),
+}
+
+
+def encode_watermark(value: Any) -> Optional[dict]:
+    """把水位值转换为可保存到 json 的形式，如 {'type': 'datetime', 'value': '2024-01-01T00:00:00'}"""
+    if value is None:
+        return None
+    for type_name, (value_type, _) in _VALUE_TYPES.items():
+        # bool 是 int 的子类，datetime 是 date 的子类，按字典顺序先匹配 int 和 datetime
+        if isinstance(value, value_type) and not isinstance(value, bool):
+            if type_name in ('datetime', 'date'):
+                return {'type': type_name, 'value': value.isoformat()}
+            return {'type': type_name, 'value': str(value) if type_name == 'decimal' else value}
+    return {'type': 'str', 'value': str(value)}
+
+
+def decode_watermark(data: Optional[dict]) -> Any:
+    if not data:
+        return None
+    _, parse = _VALUE_TYPES[data['type']]
+    return parse(data['value'])
+
+
+class WatermarkTracker(OutputWriter):
+    """
+    转发到实际写入器，同时记录水位字段的最大值.
+
+    参数:
+        writer: 实际写入器.
+        column: 水位字段名(按查询结果的列名匹配，不区分大小写).
+    """
+
+    def __init__(self, writer: OutputWriter, column: str):
+        # 写入行数和文件列表取自实际写入器，不调用基类初始化
+        self.column_types: Optional[List[ColumnType]] = None
+        self.description: Any = None
+        self.writer = writer
+        self.column = column
+        self.column_index: Optional[int] = None
+        self.max_value: Any = None
+
+    @property
+    def rows_written(self) -> int:
+        return self.writer.rows_written
+
+    @property
+    def output_files(self) -> List[str]:
+        return self.writer.output_files
+
+    def set_column_types(self, column_types: List[ColumnType], description: Any = None):
+        self.column_types = list(column_types)
+        self.description = description
+        names = [column[0].lower() for column in description or []]
+        column = self.column.strip('`"').lower()
+        if column not in names:
+            raise ValueError(f"Watermark column '{self.column}' not found in query result")
+        self.column_index = names.index(column)
+        self.writer.set_column_types(column_types, description)
+
+    def write_rows(self, rows: List[Any]):
+        if rows:
+            index = self.column_index
+            values = [data[index] for data in rows if data[index] is not None]
+            if values:
+                batch_max = max(values)
+                if self.max_value is None or batch_max > self.max_value:
+                    self.max_value = batch_max
+        self.writer.write_rows(rows)
+
+    def close(self):
+        self.writer.close()
+
+    def abort(self):
+        self.writer.abort()
@@ -0,0 +1,187 @@
+import os
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from core import parameters, schema_registry, stats_log
+from core.export_context import ExportContext, STAGE_WRITE, STAGE_CLOSE
+from core.local_storage import LocalStorage
+from core.models import OutputFormat, WorkbookJob, WorkbookSheet
+from datasource import datasource_container
+from utils import output_writer, spool_util
+from utils.xlsxwriter_util import MAX_SHEET_NAME_LENGTH, WorkbookWriter, sheet_part_name
+
+# 工作表名称中不允许的字符
+_INVALID_SHEET_CHARS = re.compile(r'[\[\]:*?/\\]')
+# 以 _数字 结尾的名称可能与续写的工作表重名
+_PART_SUFFIX = re.compile(r'.+_(\d+)')
+
+
+def sheet_name(sheet: WorkbookSheet) -> str:
+    """工作表名称，未填写时使用脚本名称"""
+    return sheet.sheet_name or sheet.script_name
+
+
+def check_sheet_names(sheets: List[WorkbookSheet]):
+    """
+            检查工作表名称是否符合 Excel 的限制且不重复(不区分大小写)，不符合时抛出 ValueError.
+
+            工作表超过行数上限时续写到 name_2、name_3 …，这些名称保留给对应的工作表，
+            避免导出进行到一半时才因重名失败.
+            """
+    names = [sheet_name(sheet) for sheet in sheets]
+    seen = set()
+    for name in names:
+        if not name or len(name) > MAX_SHEET_NAME_LENGTH:
+            raise ValueError(f"Sheet name '{name}' must be 1 to {MAX_SHEET_NAME_LENGTH} characters")
+        if _INVALID_SHEET_CHARS.search(name):
+            raise ValueError(f"Sheet name '{name}' must not contain any of []:*?/\\")
+        if name.lower() in seen:
+            raise ValueError(f"Duplicate sheet name '{name}'")
+        seen.add(name.lower())
+    for name in names:
+        match = _PART_SUFFIX.fullmatch(name)
+        if not match:
+            continue
+        part = int(match.group(1))
+        for other in names:
+            if other != name and sheet_part_name(other, part).lower() == name.lower():
+                raise ValueError(f"Sheet name '{name}' is reserved for rows of sheet '{other}' "
+                                 f"beyond the Excel row limit")
+
+
+def run_workbook_export(db: LocalStorage, workbook_name: str, output_path: str, context: ExportContext,
+                        params: Optional[Dict[str, str]] = None):
+    """
+            把工作簿中各脚本的查询结果写入同一个 Excel 文件的不同工作表，结果通过 context 的回调通知.
+
+            各查询使用连接池中的独立连接并发执行并暂存到临时文件，工作表按顺序写入：
+            constant_memory 模式下同一时刻只能写一个工作表，总耗时接近最慢的查询加上写入时间.
+
+            参数:
+                db: 本地存储的数据源、脚本与工作簿配置.
+                workbook_name: 工作簿名称.
+                output_path: 输出文件路径，缺少 .xlsx 后缀时自动补上.
+                context: 导出上下文(取消标志、进度及结果回调).
+                params: 脚本参数名称 -> 文本值，各脚本按名称取用自己的参数，每个参数只能填写一个值.
+            """
+    context.start()
+    futures: List[Future] = []
+    stop_event = threading.Event()
+    executor = None
+    try:
+        workbook = db.workbooks.get(workbook_name)
+        if not workbook:
+            context.failed(f"Workbook '{workbook_name}' not found")
+            return
+        if not workbook.sheets:
+            context.failed(f"Workbook '{workbook_name}' has no sheets")
+            return
+        try:
+            check_sheet_names(workbook.sheets)
+            queries = _resolve_queries(db, workbook, params)
+        except ValueError as e:
+            context.failed(str(e))
+            return
+
+        output_file = output_writer.output_file_path(output_path, OutputFormat.XLSX)
+        # 各工作表的总行数未知，进度只显示已拉取的行数
+        context.set_total_rows(0)
+        executor = ThreadPoolExecutor(max_workers=max(1, min(workbook.max_concurrent_queries, len(queries))),
+                                      thread_name_prefix="workbook-query")
+        futures = [executor.submit(datasource_service.spool_query, script, run_params, context, stop_event)
+                   for _, script, datasource_service, run_params in queries]
+        writer = _write_sheets(db, queries, futures, output_file, context)
+        if writer is None:
+            return
+
+        context.progress_reporter.flush()
+        context.stats.output_bytes = os.path.getsize(output_file) if os.path.exists(output_file) else 0
+        context.finished(f"Exported {writer.rows_written} rows in {len(queries)} sheets to {output_file}")
+        stats_log_path = context.stats_log_path or db.stats_log_path
+        if stats_log_path:
+            try:
+                stats_log.append_stats(stats_log_path, workbook.name, output_file, context.stats)
+            except OSError:
+                # 统计日志写入失败不影响导出结果
+                pass
+    except Exception as e:
+        if not context.is_cancelled:
+            # 只有在未取消的情况下才发出失败信号
+            context.failed(f"Export failed: {str(e)}")
+    finally:
+        # 取消或出错时通知其余查询停止拉取
+        stop_event.set()
+        if executor:
+            executor.shutdown(wait=True, cancel_futures=True)
+        # 清理未写入的暂存文件
+        for future in futures:
+            if future.done() and not future.cancelled() and future.exception() is None:
+                spool_util.remove_spool(future.result()[0])
+
+
+def _resolve_queries(db: LocalStorage, workbook: WorkbookJob, params: Optional[Dict[str, str]]) -> List[tuple]:
+    """按工作表顺序返回 (工作表名称, 脚本, 数据源服务, 参数绑定值)"""
+    queries = []
+    for sheet in workbook.sheets:
+        script = db.scripts.get(sheet.script_name)
+        if not script:
+            raise ValueError(f"Script '{sheet.script_name}' not found")
+        data_source = db.data_sources.get(script.data_source_name)
+        if not data_source:
+            raise ValueError(f"Data source '{script.data_source_name}' not found")
+        script_params = {parameter.name: params[parameter.name]
+                         for parameter in script.parameters if params and parameter.name in params}
+        runs = parameters.resolve_runs(script.parameters, script_params)
+        if len(runs) > 1:
+            raise ValueError(f"Sheet '{sheet_name(sheet)}' does not support multiple parameter values")
+        queries.append((sheet_name(sheet), script, datasource_container.get_datasource(data_source), runs[0][1]))
+    return queries
+
+
+def _write_sheets(db: LocalStorage, queries: List[tuple], futures: List[Future], output_file: str,
+                  context: ExportContext) -> Optional[WorkbookWriter]:
+    """按工作表顺序等待各查询的暂存结果并写入工作簿，后面的查询在等待期间继续执行；取消时返回 None"""
+    writer = None
+    try:
+        for (name, script, _, _), future in zip(queries, futures):
+            spool_path, schema = future.result()
+            try:
+                if context.is_cancelled:
+                    break
+                # 登记实际返回的列，单脚本导出时可直接使用
+                if db.schemas.get(script.name) != schema:
+                    db.save_script_state(db.schemas, script.name, schema)
+                warning = schema_registry.fields_warning(script, schema)
+                if warning:
+                    context.warn(f"Sheet '{name}': {warning}")
+                header = schema_registry.header_columns(script, schema)
+                if writer is None:
+                    writer = WorkbookWriter(output_file, name, header, script.decimal_as_text)
+                else:
+                    writer.start_sheet(name, header, script.decimal_as_text)
+                writer.set_column_types(schema_registry.schema_column_types(schema),
+                                        schema_registry.schema_description(schema))
+                for result in spool_util.read_batches(spool_path):
+                    if context.is_cancelled:
+                        break
+                    start = time.perf_counter()
+                    writer.write_rows(result)
+                    context.add_stage(STAGE_WRITE, time.perf_counter() - start, len(result), 1)
+            finally:
+                spool_util.remove_spool(spool_path)
+    except Exception:
+        if writer:
+            writer.abort()
+        raise
+
+    if context.is_cancelled:
+        if writer:
+            writer.abort()
+        return None
+    close_start = time.perf_counter()
+    writer.close()
+    context.add_stage(STAGE_CLOSE, time.perf_counter() - close_start)
+    return writer
@@ -0,0 +1,63 @@
+import sys
+import time
+from typing import Any, List
+
+
+class AdaptiveBatchSizer:
+    """
+    自适应的 fetchmany 批次大小：根据每批拉取耗时和每行估算字节数调整下一批的行数.
+
+    - 单批耗时低于 target_latency 的一半时(往返延迟占主导)，批次翻倍；
+    - 单批耗时超过 target_latency 的两倍时，批次减半；
+    - 批次大小不超过 memory_limit_bytes / (buffered_batches * 每行字节数)，避免大字段造成内存峰值.
+
+    参数:
+        initial_size: 初始批次大小.
+        memory_limit_bytes: 拉取数据占用内存的上限.
+        buffered_batches: 同时驻留内存的批次数(流水线队列深度 + 正在拉取和写入的批次).
+        adaptive: 为 False 时始终使用 initial_size.
+    """
+    MIN_SIZE = 50
+    MAX_SIZE = 100000
+    TARGET_LATENCY = 0.5  # 秒
+    SAMPLE_ROWS = 20  # 估算行宽时抽样的行数
+
+    def __init__(self, initial_size: int, memory_limit_bytes: int, buffered_batches: int = 1,
+                 adaptive: bool = True):
+        self.batch_size = initial_size
+        self.memory_limit_bytes = memory_limit_bytes
+        self.buffered_batches = max(buffered_batches, 1)
+        self.adaptive = adaptive
+        self.bytes_per_row = 0.0
+        self.max_batch_size = initial_size
+        self.batches = 0
+        self.rows = 0
+
+    def fetch(self, cursor: Any) -> List[Any]:
+        """按当前批次大小拉取一批数据，并根据本批的耗时和行宽调整下一批大小"""
+        start = time.monotonic()
+        rows = cursor.fetchmany(self.batch_size)
+        elapsed = time.monotonic() - start
+        if rows:
+            self.batches += 1
+            self.rows += len(rows)
+            if self.adaptive:
+                self._adjust(rows, elapsed)
+        return rows
+
+    def _adjust(self, rows: List[Any], elapsed: float):
+        sample = rows[:self.SAMPLE_ROWS]
+        sample_bytes = sum(sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row) for row in sample)
+        row_bytes = sample_bytes / len(sample)
+        # 指数平滑，避免个别宽行导致批次大小剧烈抖动
+        self.bytes_per_row = row_bytes if self.bytes_per_row == 0 else self.bytes_per_row * 0.7 + row_bytes * 0.3
+
+        size = self.batch_size
+        if len(rows) == self.batch_size:
+            if elapsed < self.TARGET_LATENCY / 2:
+                size *= 2
+            elif elapsed > self.TARGET_LATENCY * 2:
+                size //= 2
+        memory_cap = int(self.memory_limit_bytes / (self.buffered_batches * self.bytes_per_row))
+        self.batch_size = max(self.MIN_SIZE, min(size, memory_cap, self.MAX_SIZE))
+        self.max_batch_size = max(self.max_batch_size, self.batch_size)
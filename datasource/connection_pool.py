@@ -0,0 +1,87 @@
+import threading
+import time
+from typing import Any, Callable, List, Optional, Tuple
+
+
+class ConnectionPool:
+    """
+    数据库连接池：复用已建立的连接，避免每次导出/测试连接都重新握手.
+
+    参数:
+        create_connection: 新建连接，失败时返回 None.
+        is_healthy: 借出前检查连接是否可用.
+        max_size: 池中最多保留的空闲连接数；同时借出的连接超过该数量时会临时新建，归还时直接关闭.
+        idle_timeout: 空闲连接的最长保留秒数，超时的连接在借出或归还连接时全部关闭.
+    注意：空闲连接按归还时间排列，借出最近归还的连接(最可能仍然可用)，较早归还的连接因此会超时并被关闭
+    """
+
+    def __init__(self, create_connection: Callable[[], Optional[Any]], is_healthy: Callable[[Any], bool],
+                 max_size: int = 2, idle_timeout: float = 300):
+        self.create_connection = create_connection
+        self.is_healthy = is_healthy
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self._idle: List[Tuple[Any, float]] = []  # (连接, 归还时间)
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def acquire(self) -> Optional[Any]:
+        """借出一个连接：优先复用健康的空闲连接，否则新建"""
+        while True:
+            with self._lock:
+                expired = self._pop_expired()
+                connection = self._idle.pop()[0] if self._idle else None
+            for idle_connection in expired:
+                self._close_quietly(idle_connection)
+            if connection is None:
+                break
+            if not self._check(connection):
+                self._close_quietly(connection)
+                continue
+            return connection
+        return self.create_connection()
+
+    def release(self, connection: Any, discard: bool = False):
+        """归还连接，discard 为 True 或池已满/已关闭时直接关闭连接"""
+        if connection is None:
+            return
+        with self._lock:
+            expired = self._pop_expired()
+            if not discard and not self._closed and len(self._idle) < self.max_size:
+                self._idle.append((connection, time.monotonic()))
+                connection = None
+        for idle_connection in expired:
+            self._close_quietly(idle_connection)
+        if connection is not None:
+            self._close_quietly(connection)
+
+    def close(self):
+        """关闭所有空闲连接，之后归还的连接也会被直接关闭"""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for connection, _ in idle:
+            self._close_quietly(connection)
+
+    def _pop_expired(self) -> List[Any]:
+        """取出所有超时的空闲连接(持有锁时调用)，由调用方在锁外关闭"""
+        deadline = time.monotonic() - self.idle_timeout
+        count = 0
+        while count < len(self._idle) and self._idle[count][1] < deadline:
+            count += 1
+        expired = [connection for connection, _ in self._idle[:count]]
+        del self._idle[:count]
+        return expired
+
+    def _check(self, connection: Any) -> bool:
+        try:
+            return self.is_healthy(connection)
+        except Exception:
+            return False
+
+    @staticmethod
+    def _close_quietly(connection: Any):
+        try:
+            connection.close()
+        except Exception:
+            pass
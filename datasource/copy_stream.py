@@ -0,0 +1,112 @@
+import csv
+import datetime
+import io
+from decimal import Decimal, InvalidOperation
+from typing import Any, Callable, List
+
+from core.models import ColumnType
+
+# 解析 COPY 输出时使用的 NULL 标记(CSV 格式下无法区分空字符串与未加引号的空值)
+COPY_NULL = '\\N'
+
+
+class CopyCancelled(Exception):
+    """导出取消时由 CopySink 抛出，中止 copy_expert"""
+
+
+class CopySink(io.TextIOBase):
+    """
+    copy_expert 的写入目标：psycopg2 每行调用一次 write，这里攒成大块后交给 on_chunk.
+
+    参数:
+        on_chunk: 处理一块完整行的文本.
+        is_cancelled: 返回任务是否已取消，取消时抛出 CopyCancelled 中止 COPY.
+        chunk_size: 每块文本的大致字符数.
+    注意：继承 TextIOBase，psycopg2 会按连接编码解码后写入 str
+    """
+
+    def __init__(self, on_chunk: Callable[[str], None], is_cancelled: Callable[[], bool],
+                 chunk_size: int = 256 * 1024):
+        super().__init__()
+        self.on_chunk = on_chunk
+        self.is_cancelled = is_cancelled
+        self.chunk_size = chunk_size
+        self.parts: List[str] = []
+        self.size = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: str) -> int:
+        self.parts.append(data)
+        self.size += len(data)
+        if self.size >= self.chunk_size:
+            self.emit_chunk()
+        return len(data)
+
+    def emit_chunk(self):
+        """交出已缓存的文本(COPY 结束后需再调用一次)"""
+        if self.is_cancelled():
+            raise CopyCancelled()
+        if self.parts:
+            chunk = ''.join(self.parts)
+            self.parts = []
+            self.size = 0
+            self.on_chunk(chunk)
+
+
+def copy_sql(sql: str, delimiter: str = ',', null: str = '') -> str:
+    """
+            把查询包装为 COPY (sql) TO STDOUT 的 CSV 输出.
+
+            参数:
+                sql: 查询语句.
+                delimiter: 分隔符.
+                null: NULL 的输出形式，默认与 csv 模块写入 None 一致(空字段).
+            """
+    delimiter_literal = "E'\\t'" if delimiter == '\t' else f"'{delimiter}'"
+    null_literal = "E'" + null.replace('\\', '\\\\').replace("'", "''") + "'"
+    return f"COPY ({sql}) TO STDOUT WITH (FORMAT csv, DELIMITER {delimiter_literal}, NULL {null_literal})"
+
+
+def _parse_bytes(value: str) -> bytes:
+    # bytea 的 hex 输出格式：\x0a1b…
+    return bytes.fromhex(value[2:]) if value.startswith('\\x') else value.encode('utf-8')
+
+
+_VALUE_PARSERS = {
+    ColumnType.INTEGER: int,
+    ColumnType.NUMBER: float,
+    ColumnType.DECIMAL: Decimal,
+    ColumnType.DATETIME: datetime.datetime.fromisoformat,
+    ColumnType.DATE: datetime.date.fromisoformat,
+    ColumnType.TIME: datetime.time.fromisoformat,
+    ColumnType.BOOLEAN: lambda value: value == 't',
+    ColumnType.BYTES: _parse_bytes,
+}
+
+
+def build_row_parser(column_types: List[ColumnType]) -> Callable[[List[str]], List[Any]]:
+    """按列类型把 COPY 输出的文本字段转换为 Python 值，无法转换的值(如 infinity)保留文本"""
+    parsers = [_VALUE_PARSERS.get(column_type) for column_type in column_types]
+
+    def parse_row(fields: List[str]) -> List[Any]:
+        row = []
+        for parser, value in zip(parsers, fields):
+            if value == COPY_NULL:
+                row.append(None)
+            elif parser is None:
+                row.append(value)
+            else:
+                try:
+                    row.append(parser(value))
+                except (ValueError, InvalidOperation):
+                    row.append(value)
+        return row
+
+    return parse_row
+
+
+def parse_chunk(chunk: str, parse_row: Callable[[List[str]], List[Any]], delimiter: str = ',') -> List[Any]:
+    """解析一块完整行的 CSV 文本(块边界总在行尾，多行的引号字段不会被截断)"""
+    return [parse_row(fields) for fields in csv.reader(io.StringIO(chunk), delimiter=delimiter)]
@@ -1,86 +1,704 @@
-from typing import Any
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+from typing import Any, Dict, List, Tuple
 from typing import Optional
 
 import psycopg2
 import pymysql
+from pymysql.constants import FIELD_TYPE
 from pymysql.cursors import SSCursor
 
-from core.exporter import ExportTask
-from core.models import DataBase, ExportScript
-from utils import xlsxwriter_util
+from core import checkpoint, result_cache, schema_registry
+from core.export_context import ExportContext, STAGE_CONNECT, STAGE_COUNT, STAGE_EXECUTE, STAGE_FETCH, \
+    STAGE_CACHE, STAGE_WRITE, STAGE_CLOSE, EXTRACTION_CURSOR, EXTRACTION_COPY, EXTRACTION_COPY_RAW, EXTRACTION_CACHE
+from core.models import ColumnType, DataBase, ExportScript, TotalRowsStrategy, ExtractionMode, WatermarkMode, \
+    ScriptSchema
+from core.watermark import WatermarkTracker
+from datasource import copy_stream, fetch_pipeline
+from datasource.batch_sizer import AdaptiveBatchSizer
+from datasource.connection_pool import ConnectionPool
+from utils import csv_util, output_writer, spool_util
 
 
 class DataSource:
+    # 拉取线程与写入线程之间最多缓存的批次数
+    PIPELINE_QUEUE_SIZE = 4
+    # 驱动类型码 -> 列类型，未列出的类型按字符串写入
+    _COLUMN_TYPE_MAP: Dict[Any, ColumnType] = {}
+
     def __init__(self, database_info: DataBase) -> None:
         self.database_info = database_info
+        self.connection_pool = ConnectionPool(self._get_connection, self._is_healthy,
+                                              database_info.pool_size, database_info.pool_idle_timeout)
 
     def is_valid_connection(self) -> bool:
+        """测试数据库连接是否成功(从连接池借出时会做健康检查)"""
+        try:
+            connection = self._acquire_connection()
+        except Exception:
+            return False
+        if not connection:
+            return False
+        self._release_connection(connection)
+        return True
+
+    def close(self):
+        """关闭连接池中的空闲连接"""
+        self.connection_pool.close()
+
+    def export(self, script: ExportScript, output_path: str, context: ExportContext,
+               params: Optional[Dict[str, Any]] = None) -> None:
+        """
+            导出一个文件.
+
+            参数:
+                script: 导出脚本.
+                output_path: 输出文件路径.
+                context: 导出上下文.
+                params: 脚本参数的绑定值.
+            """
+        self.export_runs(script, [(output_path, params or {})], context)
+
+    def export_runs(self, script: ExportScript, runs: List[Tuple[str, Dict[str, Any]]], context: ExportContext):
+        """依次按多组参数导出(每组参数一个文件)，全部复用同一个数据库连接"""
+        connection = None
+        cancel_id = None
+        # 出错或取消时连接状态不确定(可能还有未读完的结果集)，不放回连接池
+        discard = False
+        writers = []
+        cached_runs = 0
+        completed_runs = 0
+        try:
+            for output_path, params in runs:
+                # 增量导出时缓存键包含上次水位
+                cache_params = {**params, '_watermark': context.watermark} if script.watermark_column else params
+                resume_from = None
+                if script.checkpoint_column:
+                    if context.resume:
+                        resume_from = checkpoint.load_checkpoint(output_path)
+                        if resume_from is None and os.path.exists(output_path):
+                            # 没有断点但文件已存在，说明这组参数的导出已完成
+                            completed_runs += 1
+                            continue
+                        fingerprint = result_cache.cache_key(self.database_info, script.sql, cache_params)
+                        if resume_from and (resume_from.fingerprint != fingerprint
+                                            or resume_from.key_column != script.checkpoint_column
+                                            or resume_from.max_rows_per_file != script.max_rows_per_file):
+                            context.failed(f"Checkpoint for {output_path} does not match the current script")
+                            return
+                    else:
+                        checkpoint.remove_checkpoint(output_path)
+                # 启用缓存时，有效期内的相同查询直接从本地缓存写出，不访问数据库(继续导出时只查询剩余数据，不使用缓存)
+                cache_key = None
+                if script.cache_ttl_seconds > 0 and resume_from is None:
+                    cache_key = result_cache.cache_key(self.database_info, script.sql, cache_params)
+                    entry = None if context.force_refresh else \
+                        result_cache.default_cache().get(cache_key, script.cache_ttl_seconds)
+                    if entry and context.schema is None and entry.description:
+                        self._record_schema(script, entry.description, context)
+                    # 没有列信息的旧缓存无法确定表头，重新查询
+                    if entry and context.schema is not None:
+                        writers.append(self._write_cached(script, output_path, entry, context))
+                        cached_runs += 1
+                        if context.is_cancelled:
+                            return
+                        continue
+
+                if connection is None:
+                    with context.timed_stage(STAGE_CONNECT):
+                        connection = self._acquire_connection()
+                    if not connection:
+                        context.failed("Failed to connect to database")
+                        return
+                    cancel_id = self._prepare_connection(connection, script, context)
+                discard = True
+                if context.schema is None:
+                    # 没有登记的列信息时执行 LIMIT 0 探测，只返回列信息
+                    with context.timed_stage(STAGE_EXECUTE):
+                        description = self._probe_description(connection, script, params)
+                    if description is not None:
+                        self._record_schema(script, description, context)
+                    elif context.is_cancelled:
+                        return
+                    else:
+                        # 暂按空的列信息创建写入器(不保存)，第一批数据到达时按实际返回的列重新登记并重新创建
+                        context.schema = schema_registry.build_schema(
+                            schema_registry.schema_fingerprint(self.database_info, script.sql), [], [])
+                writers.append(self._write_query(connection, script, output_path, params, cache_params,
+                                                 cache_key, resume_from, context))
+                discard = context.is_cancelled
+                if context.is_cancelled:
+                    return
+            if completed_runs and not writers:
+                context.finished("Export already completed, nothing to resume")
+                return
+            self._report_finished(writers, context, " (from cache)" if cached_runs == len(writers) else "")
+        finally:
+            if connection:
+                if cancel_id is not None:
+                    context.remove_cancel_callback(cancel_id)
+                self._release_connection(connection, discard)
+
+    def preview(self, script: ExportScript, params: Dict[str, Any], limit: int,
+                context: ExportContext) -> Tuple[List[tuple], List[ColumnType], List[tuple]]:
+        """
+            在数据库端用 LIMIT 截取查询结果的前 limit 行，用于预览和读取列名.
+
+            参数:
+                script: 导出脚本(使用其 SQL、数据源和语句超时).
+                params: 脚本参数的绑定值.
+                limit: 最多返回的行数，0 表示只读取列信息.
+                context: 导出上下文(取消预览时中止查询).
+            返回:
+                (cursor.description, 列类型, 数据行)
+            """
+        connection = self._acquire_connection()
+        if not connection:
+            raise ConnectionError("Failed to connect to database")
+        discard = True
+        cancel_id = None
+        try:
+            cancel_id = self._prepare_connection(connection, script, context)
+            with connection.cursor() as cursor:
+                cursor.execute(f"SELECT * FROM ({self._sql_template(script.sql, params)}) as subquery "
+                               f"LIMIT %(_limit)s", {**params, '_limit': limit})
+                rows = [tuple(row) for row in cursor.fetchall()]
+                description = [tuple(column) for column in cursor.description]
+            discard = context.is_cancelled
+            return description, self._column_types(description), rows
+        finally:
+            if cancel_id is not None:
+                context.remove_cancel_callback(cancel_id)
+            self._release_connection(connection, discard)
+
+    def spool_query(self, script: ExportScript, params: Dict[str, Any], context: ExportContext,
+                    stop_event: threading.Event) -> Tuple[str, ScriptSchema]:
+        """
+            使用独立连接执行脚本查询，把结果写入暂存文件(多工作表导出时各查询并行执行).
+
+            参数:
+                script: 导出脚本.
+                params: 脚本参数的绑定值.
+                context: 导出上下文.
+                stop_event: 其它查询失败或写入出错时由调用方设置，停止拉取.
+            返回:
+                (暂存文件路径, 查询结果的列信息)
+            """
+        spool_path, description = self._spool_slice(script, script.sql, params or None, context, stop_event)
+        description = description or []
+        schema = schema_registry.build_schema(schema_registry.schema_fingerprint(self.database_info, script.sql),
+                                              description, self._column_types(description))
+        return spool_path, schema
+
+    def _write_query(self, connection: Any, script: ExportScript, output_path: str, params: Dict[str, Any], cache_params: Dict[str, Any], cache_key: Optional[str],
+                     resume_from: Optional[checkpoint.Checkpoint],
+                     context: ExportContext) -> output_writer.OutputWriter:
+        """执行查询并写出一个文件"""
+        original_script = script
+        if script.watermark_column:
+            sql, params = self._after_key_query(script, params, script.watermark_column, context.watermark,
+                                                '_watermark')
+            script = replace(script, sql=sql)
+        if script.checkpoint_column:
+            self._check_checkpoint_column(script)
+            sql, params = self._after_key_query(script, params, script.checkpoint_column,
+                                                resume_from.last_key if resume_from else None, '_checkpoint')
+            script = replace(script, sql=sql)
+        with context.timed_stage(STAGE_COUNT):
+            total_rows = self._get_total_rows(connection, script, params)
+        context.set_total_rows(total_rows, script.total_rows_strategy == TotalRowsStrategy.ESTIMATE)
+        # 追加到已有内容的文件或继续断点时，已写出的数据使用原来的列
+        appends_existing = script.watermark_mode == WatermarkMode.APPEND and os.path.exists(output_path) \
+            and os.path.getsize(output_path) > 0
+        recorder = None
+
+        def create_writer(schema: ScriptSchema) -> output_writer.OutputWriter:
+            nonlocal recorder
+            fields = schema_registry.header_columns(original_script, schema)
+            if script.checkpoint_column:
+                # 由 CheckpointWriter 拆分文件，每个文件写完后记录断点
+                part_script = replace(script, max_rows_per_file=0, xlsx_processes=1)
+                writer = checkpoint.CheckpointWriter(
+                    lambda path: self._create_output_writer(part_script, path, fields), output_path, resume_from)
+            else:
+                writer = self._create_output_writer(script, output_path, fields)
+            recorder = result_cache.default_cache().recorder(cache_key, writer) if cache_key else None
+            writer = recorder or writer
+            tracker = WatermarkTracker(writer, script.watermark_column) if script.watermark_column else None
+            writer = tracker or writer
+            # 按登记的列类型写入，不必等到第一批数据
+            writer.set_column_types(schema_registry.schema_column_types(schema),
+                                    schema_registry.schema_description(schema))
+            return writer
+
+        if script.checkpoint_column:
+            resume_from = resume_from or checkpoint.Checkpoint(
+                fingerprint=result_cache.cache_key(self.database_info, original_script.sql, cache_params),
+                key_column=script.checkpoint_column,
+                max_rows_per_file=script.max_rows_per_file
+            )
+        writer = schema_registry.SchemaWriter(create_writer, context.schema,
+                                              not appends_existing and not (resume_from and resume_from.parts))
+        with writer:
+            if script.partition_column and script.partition_count > 1:
+                self._write_partitioned(connection, script, writer, context, params)
+            else:
+                self._write_stream(connection, script, writer, context, params)
+            if context.is_cancelled:
+                writer.abort()
+            close_start = time.perf_counter()
+        context.add_stage(STAGE_CLOSE, time.perf_counter() - close_start)
+        # 按最终使用的列信息(可能已重新登记)核对字段名称
+        self._check_fields(original_script, context)
+        if recorder and not context.is_cancelled:
+            recorder.commit()
+        return writer.writer
+
+    def _write_cached(self, script: ExportScript, output_path: str, entry: result_cache.CacheEntry,
+                      context: ExportContext) -> output_writer.OutputWriter:
+        """从缓存结果写出文件"""
+        context.set_total_rows(entry.rows)
+        context.add_extraction(EXTRACTION_CACHE)
+        self._check_fields(script, context)
+        fields = schema_registry.header_columns(script, context.schema)
+        writer = self._create_output_writer(script, output_path, fields)
+        tracker = WatermarkTracker(writer, script.watermark_column) if script.watermark_column else None
+        writer = tracker or writer
+        with writer:
+            if entry.column_types is not None:
+                writer.set_column_types(entry.column_types, entry.description)
+            batches = entry.iter_batches()
+            while not context.is_cancelled:
+                read_start = time.perf_counter()
+                result = next(batches, None)
+                if result is None:
+                    break
+                context.add_stage(STAGE_CACHE, time.perf_counter() - read_start, len(result), 1)
+                self._write_batch(writer, result, context)
+            if context.is_cancelled:
+                writer.abort()
+            close_start = time.perf_counter()
+        context.add_stage(STAGE_CLOSE, time.perf_counter() - close_start)
+        return writer
+
+    def _probe_description(self, connection: Any, script: ExportScript,
+                           params: Dict[str, Any]) -> Optional[List[tuple]]:
+        """
+            执行 LIMIT 0 查询，只取 cursor.description(数据库不返回数据行).
+
+            参数:
+                connection: 数据库连接.
+                script: 导出脚本.
+                params: 脚本参数的绑定值.
+            返回:
+                cursor.description；查询不能作为子查询执行时返回 None，由第一批数据的 cursor.description 登记列信息.
+            """
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(f"SELECT * FROM ({script.sql}) as subquery LIMIT 0", params or None)
+                return [tuple(column) for column in cursor.description]
+        except Exception:
+            # 水位、断点和分区同样把查询作为子查询执行，探测失败时实际的查询也会失败，保留原来的错误；
+            # COPY 没有 cursor.description，无法按第一批数据登记列信息
+            if script.watermark_column or script.checkpoint_column or \
+                    (script.partition_column and script.partition_count > 1) or \
+                    script.extraction_mode == ExtractionMode.COPY:
+                raise
+            # 如 MySQL 的子查询不允许重名的列(多表 JOIN 后 SELECT *)，而直接执行没有问题；
+            # 回滚失败的语句(PostgreSQL 的事务随之中止)后恢复本次导出的语句超时
+            connection.rollback()
+            self._set_statement_timeout(connection, script.statement_timeout_seconds)
+            return None
+
+    def _record_schema(self, script: ExportScript, description: Any, context: ExportContext):
+        """登记查询结果的列信息，由调用方保存到本地配置"""
+        context.schema = context.new_schema = schema_registry.build_schema(
+            schema_registry.schema_fingerprint(self.database_info, script.sql),
+            description, self._column_types(description))
+
+    def _check_schema(self, description: Any, context: ExportContext, writer: schema_registry.SchemaWriter):
+        """
+            第一批数据到达时核对实际返回的列，不一致时(如 SELECT * 的表结构已修改)重新登记，
+            并按新的列重新创建写入器后继续导出.
+
+            参数:
+                description: 查询实际返回的 cursor.description.
+                context: 导出上下文(登记的列信息).
+                writer: 按登记的列信息创建的写入器.
+            """
+        if schema_registry.matches_description(context.schema, description):
+            return
+        # 执行的 SQL 可能已加上水位、断点或分区条件，沿用原脚本 SQL 的标识
+        context.schema = context.new_schema = schema_registry.build_schema(
+            context.schema.fingerprint, description, self._column_types(description))
+        writer.reopen(context.schema)
+
+    @staticmethod
+    def _check_fields(script: ExportScript, context: ExportContext):
+        """字段名称与查询列数不一致时表头改用查询列名，记录提示而不中止导出"""
+        warning = schema_registry.fields_warning(script, context.schema)
+        if warning:
+            context.warn(warning)
+
+    @staticmethod
+    def _create_output_writer(script: ExportScript, output_path: str,
+                              fields: List[str]) -> output_writer.OutputWriter:
+        return output_writer.create_output_writer(script.output_format, output_path, fields,
+                                                  script.output_compression, script.max_rows_per_file,
+                                                  script.decimal_as_text, script.xlsx_processes,
+                                                  script.watermark_mode == WatermarkMode.APPEND)
+
+    @staticmethod
+    def _report_finished(writers: List[output_writer.OutputWriter], context: ExportContext, suffix: str = ""):
+        context.progress_reporter.flush()
+        # 只在导出成功后更新水位，由调用方保存
+        watermarks = [writer.max_value for writer in writers
+                      if isinstance(writer, WatermarkTracker) and writer.max_value is not None]
+        if watermarks:
+            context.new_watermark = max(watermarks)
+
+        output_files = [path for writer in writers for path in writer.output_files]
+        context.stats.output_bytes = sum(os.path.getsize(path) for path in output_files if os.path.exists(path))
+        rows_written = sum(writer.rows_written for writer in writers)
+        if rows_written > 0:
+            context.finished(f"Exported {rows_written} rows to {', '.join(output_files)}{suffix}")
+        else:
+            context.finished("No data to export")
+
+    def _write_stream(self, connection: Any, script: ExportScript, writer: output_writer.OutputWriter,
+                      context: ExportContext, params: Dict[str, Any]):
+        """单连接流式导出：后台线程拉取，当前线程写入文件"""
+        # 队列中的批次加上正在拉取和正在写入的各一批
+        batch_sizer = self._create_batch_sizer(script, self.PIPELINE_QUEUE_SIZE + 2)
+        context.add_extraction(EXTRACTION_CURSOR)
+        with self._open_stream_cursor(connection, script) as cursor:
+            with context.timed_stage(STAGE_EXECUTE):
+                cursor.execute(script.sql, params or None)
+            checked = False
+            for result in fetch_pipeline.iter_batches(lambda: self._timed_fetch(batch_sizer, cursor, context),
+                                                      lambda: context.is_cancelled,
+                                                      self.PIPELINE_QUEUE_SIZE):
+                if not checked:
+                    # PostgreSQL 命名游标在首次拉取后才有 description
+                    self._check_schema(cursor.description, context, writer)
+                    checked = True
+                self._write_batch(writer, result, context)
+            if not checked and cursor.description and not context.is_cancelled:
+                # 没有数据时也核对列，探测失败的查询据此生成表头
+                self._check_schema(cursor.description, context, writer)
+        self._record_batch_stats(context, batch_sizer)
+
+    @staticmethod
+    def _timed_fetch(batch_sizer: AdaptiveBatchSizer, cursor: Any, context: ExportContext) -> List[Any]:
+        """拉取一批数据并计入 fetch 阶段耗时"""
+        start = time.perf_counter()
+        result = batch_sizer.fetch(cursor)
+        context.add_stage(STAGE_FETCH, time.perf_counter() - start, len(result), 1 if result else 0)
+        return result
+
+    @staticmethod
+    def _write_batch(writer: output_writer.OutputWriter, result: List[Any], context: ExportContext):
+        """写入一批数据并计入 write 阶段耗时"""
+        start = time.perf_counter()
+        writer.write_rows(result)
+        context.add_stage(STAGE_WRITE, time.perf_counter() - start, len(result), 1)
+        context.progress_reporter.add_rows(len(result))
+
+    def _write_partitioned(self, connection: Any, script: ExportScript, writer: output_writer.OutputWriter,
+                           context: ExportContext, params: Dict[str, Any]):
+        """
+        按分区字段的取值范围把查询拆成多个区间，每个区间使用独立连接并行拉取并暂存到临时文件，
+        再按区间顺序写入文件(先完成的靠前区间会先写入，其余区间继续并行拉取).
+        """
+        with context.timed_stage(STAGE_EXECUTE):
+            key_range = self._query_key_range(connection, script, params)
+        slice_queries = self._build_slice_queries(script, params, *key_range)
+
+        stop_event = threading.Event()
+        executor = ThreadPoolExecutor(max_workers=script.partition_count, thread_name_prefix="export-partition")
+        futures = [executor.submit(self._spool_slice, script, sql, params, context, stop_event)
+                   for sql, params in slice_queries]
+        try:
+            for future in futures:
+                spool_path, description = future.result()
+                if description:
+                    self._check_schema(description, context, writer)
+                try:
+                    for result in spool_util.read_batches(spool_path):
+                        if context.is_cancelled:
+                            return
+                        start = time.perf_counter()
+                        writer.write_rows(result)
+                        context.add_stage(STAGE_WRITE, time.perf_counter() - start, len(result), 1)
+                finally:
+                    spool_util.remove_spool(spool_path)
+        finally:
+            # 取消或写入出错时通知其余区间停止拉取
+            stop_event.set()
+            executor.shutdown(wait=True, cancel_futures=True)
+            # 清理未写入的区间暂存文件
+            for future in futures:
+                if future.done() and not future.cancelled() and future.exception() is None:
+                    spool_util.remove_spool(future.result()[0])
+
+    def _spool_slice(self, script: ExportScript, sql: str, params: Optional[dict], context: ExportContext,
+                     stop_event: threading.Event) -> Tuple[str, Optional[List[tuple]]]:
+        """使用独立连接拉取一个区间的数据并写入暂存文件，返回暂存文件路径和 cursor.description"""
+        connection = self._acquire_connection()
+        if not connection:
+            raise ConnectionError("Failed to connect to database")
+        discard = True
+        cancel_id = None
+        # 各区间并行拉取，内存上限按区间数平分
+        batch_sizer = self._create_batch_sizer(script, script.partition_count)
+        context.add_extraction(EXTRACTION_CURSOR)
+        try:
+            cancel_id = self._prepare_connection(connection, script, context)
+            with self._open_stream_cursor(connection, script) as cursor, spool_util.SpoolWriter() as spool:
+                with context.timed_stage(STAGE_EXECUTE):
+                    cursor.execute(sql, params)
+                while not context.is_cancelled and not stop_event.is_set():
+                    result = self._timed_fetch(batch_sizer, cursor, context)
+                    if not result:
+                        break
+                    spool.write_batch(result)
+                    context.progress_reporter.add_rows(len(result))
+                discard = context.is_cancelled or stop_event.is_set()
+                description = [tuple(column) for column in cursor.description] if cursor.description else None
+            self._record_batch_stats(context, batch_sizer)
+            return spool.path, description
+        finally:
+            if cancel_id is not None:
+                context.remove_cancel_callback(cancel_id)
+            self._release_connection(connection, discard)
+
+    @staticmethod
+    def _create_batch_sizer(script: ExportScript, buffered_batches: int) -> AdaptiveBatchSizer:
+        return AdaptiveBatchSizer(script.fetch_size, script.fetch_memory_limit_mb * 1024 * 1024,
+                                  buffered_batches, script.adaptive_fetch)
+
+    @staticmethod
+    def _record_batch_stats(context: ExportContext, batch_sizer: AdaptiveBatchSizer):
+        """把批次大小的调整结果汇总到导出统计中(分区导出时多个区间会累加)"""
+        with context.stats_lock:
+            stats = context.stats
+            stats.rows += batch_sizer.rows
+            stats.batches += batch_sizer.batches
+            stats.batch_size = batch_sizer.batch_size
+            stats.max_batch_size = max(stats.max_batch_size, batch_sizer.max_batch_size)
+            stats.bytes_per_row = batch_sizer.bytes_per_row
+
+    def _query_key_range(self, connection: Any, script: ExportScript, params: Dict[str, Any]) -> Tuple[Any, Any]:
+        column = self._quote_identifier(script.partition_column)
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT MIN({column}), MAX({column}) FROM ({script.sql}) as subquery", params or None)
+            return cursor.fetchone()
+
+    def _build_slice_queries(self, script: ExportScript, params: Dict[str, Any],
+                             low: Any, high: Any) -> List[Tuple[str, Optional[dict]]]:
+        """
+        把 [low, high] 均分为 partition_count 个左闭右开区间(最后一个区间右闭)，
+        另加一个分区字段为 NULL 的区间，保证不丢行.
+        """
+        column = self._quote_identifier(script.partition_column)
+        subquery = f"SELECT * FROM ({self._sql_template(script.sql, params)}) as subquery"
+        queries = []
+        if low is not None:
+            bounds = self._split_key_range(low, high, script.partition_count)
+            for index in range(len(bounds) - 1):
+                upper_op = "<=" if index == len(bounds) - 2 else "<"
+                queries.append((
+                    f"{subquery} WHERE {column} >= %(_low)s AND {column} {upper_op} %(_high)s ORDER BY {column}",
+                    {**params, '_low': bounds[index], '_high': bounds[index + 1]}
+                ))
+        queries.append((f"SELECT * FROM ({script.sql}) as subquery WHERE {column} IS NULL", params or None))
+        return queries
+
+    @staticmethod
+    def _split_key_range(low: Any, high: Any, count: int) -> List[Any]:
+        if isinstance(low, (str, bytes)) or isinstance(high, (str, bytes)):
+            raise ValueError("Partition column must be numeric or date/time")
+        if isinstance(low, int) and isinstance(high, int):
+            inner = [low + (high - low) * index // count for index in range(1, count)]
+        else:
+            step = (high - low) / count
+            inner = [low + step * index for index in range(1, count)]
+        return [low] + inner + [high]
+
+    def _after_key_query(self, script: ExportScript, params: Dict[str, Any], key_column: str, after: Any,
+                         param_name: str) -> Tuple[str, Dict[str, Any]]:
+        """
+        在查询外层加上 key_column > after 的条件并按该字段排序(字段有索引时为范围扫描)，
+        用于增量导出的水位和继续导出的断点.
+        """
+        column = self._quote_identifier(key_column)
+        if after is None:
+            return f"SELECT * FROM ({script.sql}) as subquery ORDER BY {column}", params
+        return (f"SELECT * FROM ({self._sql_template(script.sql, params)}) as subquery "
+                f"WHERE {column} > %({param_name})s ORDER BY {column}", {**params, param_name: after})
+
+    @staticmethod
+    def _check_checkpoint_column(script: ExportScript):
+        """断点在拆分文件写完时记录，必须拆分文件；写入顺序必须与断点排序键一致"""
+        if script.max_rows_per_file <= 0:
+            raise ValueError("Checkpoints require max rows per file: progress is saved each time a file is completed")
+        key = script.checkpoint_column.strip('`"').lower()
+        if script.partition_column and script.partition_count > 1 and \
+                script.partition_column.strip('`"').lower() != key:
+            raise ValueError("Checkpoint column must be the same as the partition column")
+        if script.watermark_column and script.watermark_column.strip('`"').lower() != key:
+            raise ValueError("Checkpoint column must be the same as the watermark column")
+        if script.watermark_column and script.watermark_mode == WatermarkMode.APPEND:
+            raise ValueError("Checkpoints cannot be used when appending to an existing file")
+
+    @staticmethod
+    def _sql_template(sql: str, params: Dict[str, Any]) -> str:
+        """追加绑定参数前的 SQL：已有参数时 SQL 本身是 %(name)s 模板，否则需要转义其中的 %"""
+        return sql if params else sql.replace('%', '%%')
+
+    def _render_sql(self, connection: Any, sql: str, params: dict) -> str:
+        """由驱动把参数转义后填入 SQL"""
         pass
 
-    def export(self, script: ExportScript, output_path: str, export_task: ExportTask):
+    def _quote_identifier(self, name: str) -> str:
+        pass
+
+    def _column_types(self, description: Any) -> List[ColumnType]:
+        """根据 cursor.description 中各列的驱动类型码确定写入的列类型"""
+        type_map = self._COLUMN_TYPE_MAP
+        return [type_map.get(column[1], ColumnType.STRING) for column in description]
+
+    def _acquire_connection(self) -> Optional[Any]:
+        return self.connection_pool.acquire()
+
+    def _prepare_connection(self, connection: Any, script: ExportScript, context: ExportContext) -> int:
+        """
+        设置脚本的语句超时，并注册取消回调：取消导出时中止该连接上正在执行的查询，
+        而不是等到下一批拉取时才检查取消标志. 返回的编号须在归还连接前注销.
+        """
+        self._set_statement_timeout(connection, script.statement_timeout_seconds)
+        return context.add_cancel_callback(lambda: self._cancel_query(connection))
+
+    def _release_connection(self, connection: Any, discard: bool = False):
+        if not discard:
+            try:
+                # 结束只读事务，避免复用连接时沿用旧的快照
+                connection.rollback()
+            except Exception:
+                discard = True
+        self.connection_pool.release(connection, discard)
+
+    def _is_healthy(self, connection: Any) -> bool:
+        """连接池借出连接前的健康检查"""
+        return True
+
+    def _get_connection(self) -> Optional[Any]:
+        pass
+
+    def _set_statement_timeout(self, connection: Any, seconds: int):
+        """设置连接上单条语句的最长执行时间，0 表示不限制"""
+        pass
+
+    def _cancel_query(self, connection: Any):
+        """中止连接上正在执行的查询(在取消线程中调用，导出线程中阻塞的 execute/fetch 随即抛出异常)"""
+        pass
+
+    def _open_stream_cursor(self, connection: Any, script: ExportScript) -> Any:
+        """打开流式(服务端)游标，结果集按批次拉取而不是一次性加载到内存"""
+        pass
+
+    def _get_total_rows(self, connection: Any, script: ExportScript, params: Dict[str, Any]) -> int:
+        """按脚本配置的策略获取总行数，返回 0 表示不确定"""
+        if script.total_rows_strategy == TotalRowsStrategy.NONE:
+            return 0
+        if script.total_rows_strategy == TotalRowsStrategy.ESTIMATE:
+            return self._estimate_rows(connection, script, params)
+        return self._count_rows(connection, script, params)
+
+    @staticmethod
+    def _count_rows(connection: Any, script: ExportScript, params: Dict[str, Any]) -> int:
+        """执行 COUNT(*) 精确统计总行数(查询会在数据库上额外执行一遍)"""
+        with connection.cursor() as cursor:
+            count_sql = f"SELECT COUNT(*) FROM ({script.sql}) as subquery"
+            cursor.execute(count_sql, params or None)
+            return cursor.fetchone()[0]
+
+    def _estimate_rows(self, connection: Any, script: ExportScript, params: Dict[str, Any]) -> int:
+        """使用 EXPLAIN 估算总行数，不实际执行查询"""
         pass
 
 
 class MySQLDataSource(DataSource):
+    _COLUMN_TYPE_MAP = {
+        FIELD_TYPE.TINY: ColumnType.INTEGER,
+        FIELD_TYPE.SHORT: ColumnType.INTEGER,
+        FIELD_TYPE.LONG: ColumnType.INTEGER,
+        FIELD_TYPE.FLOAT: ColumnType.NUMBER,
+        FIELD_TYPE.DOUBLE: ColumnType.NUMBER,
+        FIELD_TYPE.LONGLONG: ColumnType.INTEGER,
+        FIELD_TYPE.INT24: ColumnType.INTEGER,
+        FIELD_TYPE.YEAR: ColumnType.INTEGER,
+        FIELD_TYPE.DECIMAL: ColumnType.DECIMAL,
+        FIELD_TYPE.NEWDECIMAL: ColumnType.DECIMAL,
+        FIELD_TYPE.TIMESTAMP: ColumnType.DATETIME,
+        FIELD_TYPE.DATETIME: ColumnType.DATETIME,
+        FIELD_TYPE.DATE: ColumnType.DATE,
+        FIELD_TYPE.NEWDATE: ColumnType.DATE,
+        FIELD_TYPE.TIME: ColumnType.TIME,
+        FIELD_TYPE.BIT: ColumnType.BYTES,
+    }
+
     def __init__(self, database_info: DataBase) -> None:
         super().__init__(database_info)
 
-    def is_valid_connection(self) -> bool:
-        """测试数据库连接是否成功"""
-        connection = None
-        try:
-            connection = self._get_connection()
-            if connection and connection.open:
-                return True
-            return False
-        except Exception:
-            return False
-        finally:
-            if connection and connection.open:
-                connection.close()
+    def _estimate_rows(self, connection: pymysql.Connection, script: ExportScript, params: Dict[str, Any]) -> int:
+        """根据 EXPLAIN 中最外层 SELECT 各表的 rows * filtered 估算结果行数"""
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN {script.sql}", params or None)
+            columns = [column[0] for column in cursor.description]
+            plan_rows = [dict(zip(columns, plan_row)) for plan_row in cursor.fetchall()]
 
-    def export(self, script: ExportScript, output_path: str, export_task: ExportTask) -> None:
-        with self._get_connection() as connection:
-            if not connection:
-                export_task.signals.failed.emit("Failed to connect to database")
-                return
+        estimated = 1.0
+        for plan_row in plan_rows:
+            if str(plan_row.get('id')) != '1' or plan_row.get('rows') is None:
+                continue
+            filtered = plan_row.get('filtered')
+            estimated *= float(plan_row['rows']) * (float(filtered) / 100 if filtered is not None else 1)
+        return max(int(estimated), 0)
 
-            with connection.cursor() as cursor:
-                count_sql = f"SELECT COUNT(*) FROM ({script.sql}) as subquery"
-                cursor.execute(count_sql)
-                total_rows = cursor.fetchone()[0]
-                export_task.signals.total_rows.emit(total_rows)
-
-            # 执行查询
-            with connection.cursor(SSCursor) as cursor:
-                cursor.execute(script.sql)
-                # excel
-                fields = script.fields.split(',')
-                if not fields:
-                    export_task.signals.failed.emit("No fields specified and no columns returned from query")
-                    return
-                workbook, worksheet = xlsxwriter_util.create_worksheet(output_path, fields)
-                with workbook:
-                    row = 1
-                    # 逐行读取（流式）
-                    while not export_task.is_cancelled:
-                        result = cursor.fetchmany(500)
-                        if not result or export_task.is_cancelled:
-                            break
-                        for data in result:
-                            export_task.signals.progress.emit(row)
-                            # 写入Excel
-                            worksheet.write_row(row, 0, list(data))
-                            row += 1
-                        # time.sleep(0.01)  # 短暂释放控制权
-
-                if export_task.is_cancelled:
-                    return
+    def _open_stream_cursor(self, connection: pymysql.Connection, script: ExportScript) -> SSCursor:
+        return connection.cursor(SSCursor)
 
-                if row > 1:
-                    export_task.signals.finished.emit(f"Exported {total_rows} rows to {output_path}")
-                else:
-                    export_task.signals.finished.emit("No data to export")
+    def _quote_identifier(self, name: str) -> str:
+        return "`" + name.replace("`", "``") + "`"
+
+    def _is_healthy(self, connection: pymysql.Connection) -> bool:
+        connection.ping(reconnect=False)
+        return True
+
+    def _set_statement_timeout(self, connection: pymysql.Connection, seconds: int):
+        # 会话变量会随连接留在连接池中，每次借出都要设置(包括 0)
+        with connection.cursor() as cursor:
+            if 'MariaDB' in connection.get_server_info():
+                cursor.execute("SET SESSION max_statement_time = %s", (seconds,))
+            else:
+                # 只对 SELECT 生效，单位为毫秒
+                cursor.execute("SET SESSION max_execution_time = %s", (seconds * 1000,))
+
+    def _cancel_query(self, connection: pymysql.Connection):
+        """导出连接正阻塞在读取上，需通过另一个连接执行 KILL QUERY(只中止语句，不断开连接)"""
+        killer = self._get_connection()
+        if not killer:
+            return
+        try:
+            with killer.cursor() as cursor:
+                cursor.execute("KILL QUERY %s", (connection.thread_id(),))
+        finally:
+            killer.close()
 
     def _get_connection(self) -> Optional[pymysql.Connection]:
         """建立数据库连接(使用PyMySQL)"""
@@ -101,66 +719,138 @@ class MySQLDataSource(DataSource):
 
 
 class PostgreSQLDataSource(DataSource):
+    # PostgreSQL 内置类型 OID
+    _COLUMN_TYPE_MAP = {
+        16: ColumnType.BOOLEAN,  # bool
+        17: ColumnType.BYTES,  # bytea
+        20: ColumnType.INTEGER,  # int8
+        21: ColumnType.INTEGER,  # int2
+        23: ColumnType.INTEGER,  # int4
+        26: ColumnType.INTEGER,  # oid
+        700: ColumnType.NUMBER,  # float4
+        701: ColumnType.NUMBER,  # float8
+        1700: ColumnType.DECIMAL,  # numeric
+        1082: ColumnType.DATE,  # date
+        1083: ColumnType.TIME,  # time
+        1266: ColumnType.TIME,  # timetz
+        1114: ColumnType.DATETIME,  # timestamp
+        1184: ColumnType.DATETIME,  # timestamptz
+    }
+    _SERVER_CURSOR_NAME = "sql2excel_export_cursor"
+
     def __init__(self, database_info: DataBase) -> None:
         super().__init__(database_info)
 
-    def is_valid_connection(self) -> bool:
-        """测试数据库连接是否成功"""
-        connection = None
-        try:
-            connection = self._get_connection()
-            if connection and connection.open:
-                return True
-            return False
-        except Exception:
-            return False
-        finally:
-            if connection and connection.open:
-                connection.close()
+    def _estimate_rows(self, connection: Any, script: ExportScript, params: Dict[str, Any]) -> int:
+        """读取 EXPLAIN (FORMAT JSON) 顶层计划节点的 Plan Rows"""
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {script.sql}", params or None)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
 
-    def export(self, script: ExportScript, output_path: str, export_task: ExportTask) -> None:
-        with self._get_connection() as connection:
-            if not connection:
-                export_task.signals.failed.emit("Failed to connect to database")
-                return
+    def _write_stream(self, connection: Any, script: ExportScript, writer: output_writer.OutputWriter,
+                      context: ExportContext, params: Dict[str, Any]):
+        if script.extraction_mode == ExtractionMode.COPY:
+            self._write_copy(connection, script, writer, context, params)
+        else:
+            super()._write_stream(connection, script, writer, context, params)
 
-            with connection.cursor() as cursor:
-                count_sql = f"SELECT COUNT(*) FROM ({script.sql}) as subquery"
-                cursor.execute(count_sql)
-                total_rows = cursor.fetchone()[0]
-                export_task.signals.total_rows.emit(total_rows)
+    def _write_copy(self, connection: Any, script: ExportScript, writer: output_writer.OutputWriter,
+                    context: ExportContext, params: Dict[str, Any]):
+        """
+        使用 COPY (sql) TO STDOUT 拉取数据，避免驱动逐行创建 Python 对象：
+        导出 CSV/TSV、不拆分文件且未启用结果缓存、水位和断点时 COPY 输出原样写入文件，否则解析为批次后写入.
+        """
+        # 列类型已按登记的列信息设置(COPY 没有 cursor.description，无法逐批核对)
+        # COPY 语句不支持绑定参数，由驱动转义后填入
+        sql = self._render_sql(connection, script.sql, params) if params else script.sql
+        # COPY 不核对列，不会重新创建写入器
+        target = writer.writer if isinstance(writer, schema_registry.SchemaWriter) else writer
+        if isinstance(target, csv_util.CsvWriter) and not target.max_rows_per_file:
+            context.add_extraction(EXTRACTION_COPY_RAW)
+            self._copy_to_csv(connection, sql, target, context)
+            return
+        # 结果缓存、水位和断点需要逐行处理，拆分文件需要按行计数，此时解析为批次后写入(记录在导出统计中)
+        context.add_extraction(EXTRACTION_COPY)
 
-            # 执行查询
-            with connection.cursor() as cursor:
-                cursor.execute(script.sql)
-                # excel
-                fields = script.fields.split(',')
-                if not fields:
-                    export_task.signals.failed.emit("No fields specified and no columns returned from query")
-                    return
+        parse_row = copy_stream.build_row_parser(writer.column_types)
 
-                workbook, worksheet = xlsxwriter_util.create_worksheet(output_path, fields)
-                with workbook:
-                    row = 1
-                    # 逐行读取（流式）
-                    while not export_task.is_cancelled:
-                        result = cursor.fetchmany(500)
-                        if not result or export_task.is_cancelled:
-                            break
-                        for data in result:
-                            export_task.signals.progress.emit(row)
-                            # 写入Excel
-                            worksheet.write_row(row, 0, list(data))
-                            row += 1
-                        # time.sleep(0.01)  # 短暂释放控制权
-
-                if export_task.is_cancelled:
-                    return
+        def produce(emit):
+            def on_chunk(chunk):
+                # 拉取耗时包括解析，不包括等待写入线程的时间
+                start = time.perf_counter()
+                result = copy_stream.parse_chunk(chunk, parse_row)
+                context.add_stage(STAGE_FETCH, time.perf_counter() - start, len(result), 1)
+                if not emit(result):
+                    raise copy_stream.CopyCancelled()
+                chunk_seconds.append(time.perf_counter() - start)
+
+            chunk_seconds = []
+            sink = copy_stream.CopySink(on_chunk, lambda: context.is_cancelled)
+            copy_start = time.perf_counter()
+            with connection.cursor() as copy_cursor:
+                copy_cursor.copy_expert(copy_stream.copy_sql(sql, null=copy_stream.COPY_NULL), sink)
+            sink.emit_chunk()
+            context.add_stage(STAGE_FETCH, time.perf_counter() - copy_start - sum(chunk_seconds))
+
+        for result in fetch_pipeline.iter_produced_batches(produce, lambda: context.is_cancelled,
+                                                           self.PIPELINE_QUEUE_SIZE):
+            self._write_batch(writer, result, context)
+
+    @staticmethod
+    def _copy_to_csv(connection: Any, sql: str, writer: csv_util.CsvWriter, context: ExportContext):
+        def on_chunk(chunk):
+            # 按换行计数，值中含换行时进度略有偏差，结束后以 COPY 返回的行数为准
+            start = time.perf_counter()
+            rows = chunk.count('\n')
+            writer.write_raw(chunk, rows)
+            write_seconds.append(time.perf_counter() - start)
+            context.add_stage(STAGE_WRITE, write_seconds[-1], rows, 1)
+            context.progress_reporter.add_rows(rows)
+
+        write_seconds = []
+        sink = copy_stream.CopySink(on_chunk, lambda: context.is_cancelled)
+        copy_start = time.perf_counter()
+        with connection.cursor() as cursor:
+            cursor.copy_expert(copy_stream.copy_sql(sql, writer.delimiter), sink)
+            sink.emit_chunk()
+            if cursor.rowcount >= 0:
+                writer.rows_written = cursor.rowcount
+        # COPY 总耗时中除去写入文件的部分即为拉取耗时
+        context.add_stage(STAGE_FETCH, time.perf_counter() - copy_start - sum(write_seconds))
+
+    def _open_stream_cursor(self, connection: Any, script: ExportScript) -> Any:
+        # 命名游标即服务端游标，结果集保留在服务端按批次拉取，内存占用与总行数无关
+        cursor = connection.cursor(name=self._SERVER_CURSOR_NAME)
+        cursor.itersize = script.fetch_size
+        return cursor
+
+    def _render_sql(self, connection: Any, sql: str, params: dict) -> str:
+        with connection.cursor() as cursor:
+            return cursor.mogrify(sql, params).decode(psycopg2.extensions.encodings[connection.encoding])
+
+    def _quote_identifier(self, name: str) -> str:
+        return '"' + name.replace('"', '""') + '"'
+
+    def _is_healthy(self, connection: Any) -> bool:
+        if connection.closed:
+            return False
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+        connection.rollback()
+        return True
+
+    def _set_statement_timeout(self, connection: Any, seconds: int):
+        # SET LOCAL 只在当前事务内有效，归还连接时回滚即恢复默认值
+        if seconds > 0:
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL statement_timeout = %s", (seconds * 1000,))
 
-                if row > 1:
-                    export_task.signals.finished.emit(f"Exported {total_rows} rows to {output_path}")
-                else:
-                    export_task.signals.finished.emit("No data to export")
+    def _cancel_query(self, connection: Any):
+        # 由 libpq 另开连接发送取消请求(等同 pg_cancel_backend)，执行中的语句抛出 QueryCanceledError
+        connection.cancel()
 
     def _get_connection(self) -> Optional[Any]:
         """建立数据库连接(使用psycopg2)"""
@@ -1,8 +1,60 @@
+import threading
+from typing import Dict, Tuple
+
 from core.models import DataBaseType, DataBase
 from datasource.datasource import DataSource, MySQLDataSource, PostgreSQLDataSource
 
+# 按数据源名称缓存的数据源(及创建时的连接配置)，同一数据源共用一个连接池
+_datasources: Dict[str, Tuple[Tuple, DataSource]] = {}
+_lock = threading.Lock()
+
 
 def get_datasource(database_info: DataBase) -> DataSource:
+    """
+            返回数据源名称对应的数据源，连接信息或连接池配置修改后关闭旧连接池并重新创建.
+
+            参数:
+                database_info: 数据源配置.
+            """
+    config = _connection_config(database_info)
+    with _lock:
+        cached = _datasources.get(database_info.name)
+        if cached and cached[0] == config:
+            return cached[1]
+        datasource = create_datasource(database_info)
+        _datasources[database_info.name] = (config, datasource)
+    if cached:
+        # 正在使用旧连接池的导出不受影响，归还的连接直接关闭
+        cached[1].close()
+    return datasource
+
+
+def remove_datasource(name: str):
+    """数据源删除后关闭其连接池"""
+    with _lock:
+        cached = _datasources.pop(name, None)
+    if cached:
+        cached[1].close()
+
+
+def shutdown():
+    """关闭所有连接池(应用退出时调用)"""
+    with _lock:
+        datasources = [datasource for _, datasource in _datasources.values()]
+        _datasources.clear()
+    for datasource in datasources:
+        datasource.close()
+
+
+def _connection_config(database_info: DataBase) -> Tuple:
+    # 连接配置保存为值，界面原地修改配置对象时也能发现变化
+    return (database_info.type, database_info.host, database_info.port, database_info.username,
+            database_info.password, database_info.database, database_info.pool_size,
+            database_info.pool_idle_timeout)
+
+
+def create_datasource(database_info: DataBase) -> DataSource:
+    """创建不缓存的数据源(如测试尚未保存的连接配置)，用完后由调用方关闭"""
     if database_info.type == DataBaseType.MYSQL:
         return MySQLDataSource(database_info)
     elif database_info.type == DataBaseType.POSTGRESQL:
@@ -0,0 +1,87 @@
+import queue
+import threading
+from typing import Any, Callable, Iterator, List
+
+# 队列中的结束标记
+_END_OF_DATA = object()
+
+
+class _FetchError:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def iter_batches(fetch_batch: Callable[[], List[Any]],
+                 is_cancelled: Callable[[], bool],
+                 queue_size: int = 4) -> Iterator[List[Any]]:
+    """
+    在后台线程中拉取数据批次，通过有界队列交给调用方写入.
+
+    参数:
+        fetch_batch: 拉取下一批数据，返回空列表表示数据已取完(如 cursor.fetchmany).
+        is_cancelled: 返回任务是否已取消.
+        queue_size: 队列中最多缓存的批次数，队列满时拉取线程阻塞(背压)，内存占用以此为上限.
+    注意：拉取与写入重叠执行，数据库网络 I/O 与 Excel 序列化可以同时进行
+    """
+    def produce(emit: Callable[[List[Any]], bool]):
+        while not is_cancelled():
+            batch = fetch_batch()
+            if not batch or not emit(batch):
+                return
+
+    return iter_produced_batches(produce, is_cancelled, queue_size)
+
+
+def iter_produced_batches(produce: Callable[[Callable[[List[Any]], bool]], None],
+                          is_cancelled: Callable[[], bool],
+                          queue_size: int = 4) -> Iterator[List[Any]]:
+    """
+    在后台线程中执行 produce，由其主动推送数据批次(如 COPY 的输出)，通过有界队列交给调用方写入.
+
+    参数:
+        produce: 生产函数，调用 emit(batch) 推送批次；emit 返回 False 表示调用方已停止读取，应尽快返回.
+        is_cancelled: 返回任务是否已取消.
+        queue_size: 队列中最多缓存的批次数.
+    """
+    batches: queue.Queue = queue.Queue(maxsize=queue_size)
+    stop_event = threading.Event()
+
+    def put(item) -> bool:
+        # 带超时地放入队列，以便在消费方提前结束时及时退出
+        while not stop_event.is_set():
+            try:
+                batches.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def run():
+        try:
+            produce(put)
+        except BaseException as e:
+            put(_FetchError(e))
+            return
+        put(_END_OF_DATA)
+
+    producer = threading.Thread(target=run, name="export-fetch", daemon=True)
+    producer.start()
+    try:
+        while True:
+            try:
+                item = batches.get(timeout=0.1)
+            except queue.Empty:
+                if is_cancelled():
+                    return
+                continue
+            if item is _END_OF_DATA:
+                return
+            if isinstance(item, _FetchError):
+                raise item.error
+            # 取消后不再写入队列中剩余的批次，由 finally 通知拉取线程停止
+            if is_cancelled():
+                return
+            yield item
+    finally:
+        stop_event.set()
+        producer.join()
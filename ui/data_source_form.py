@@ -1,6 +1,6 @@
 from PySide6.QtCore import Signal
 from PySide6.QtWidgets import (QWidget, QFormLayout, QLineEdit, QComboBox,
-                               QPushButton, QHBoxLayout, QMessageBox)
+                               QPushButton, QHBoxLayout, QMessageBox, QSpinBox)
 
 from core.models import DataBase, DataBaseType
 from datasource import datasource_container
@@ -29,6 +29,16 @@ class DataSourceForm(QWidget):
         self.password_edit = QLineEdit()
         self.password_edit.setEchoMode(QLineEdit.EchoMode.Password)
         self.database_edit = QLineEdit()
+        self.pool_size_spin = QSpinBox()
+        self.pool_size_spin.setRange(0, 64)
+        self.pool_size_spin.setValue(2)
+        self.pool_idle_timeout_spin = QSpinBox()
+        self.pool_idle_timeout_spin.setRange(0, 86400)
+        self.pool_idle_timeout_spin.setValue(300)
+        self.pool_idle_timeout_spin.setSuffix(" 秒")
+        self.max_concurrent_exports_spin = QSpinBox()
+        self.max_concurrent_exports_spin.setRange(1, 32)
+        self.max_concurrent_exports_spin.setValue(2)
 
         layout.addRow("名称:", self.name_edit)
         layout.addRow("类型:", self.type_combo)
@@ -37,6 +47,9 @@ class DataSourceForm(QWidget):
         layout.addRow("用户名:", self.username_edit)
         layout.addRow("密码:", self.password_edit)
         layout.addRow("数据库:", self.database_edit)
+        layout.addRow("连接池大小:", self.pool_size_spin)
+        layout.addRow("空闲超时:", self.pool_idle_timeout_spin)
+        layout.addRow("并发导出数:", self.max_concurrent_exports_spin)
 
         # 测试连接按钮
         self.test_btn = QPushButton("测试连接")
@@ -74,6 +87,9 @@ class DataSourceForm(QWidget):
             self.username_edit.clear()
             self.password_edit.clear()
             self.database_edit.clear()
+            self.pool_size_spin.setValue(2)
+            self.pool_idle_timeout_spin.setValue(300)
+            self.max_concurrent_exports_spin.setValue(2)
             self.name_edit.setEnabled(True)
             self.delete_btn.setVisible(False)
             self.current_name = ''
@@ -85,6 +101,9 @@ class DataSourceForm(QWidget):
             self.username_edit.setText(data_source.username)
             self.password_edit.setText(data_source.password)
             self.database_edit.setText(data_source.database)
+            self.pool_size_spin.setValue(data_source.pool_size)
+            self.pool_idle_timeout_spin.setValue(data_source.pool_idle_timeout)
+            self.max_concurrent_exports_spin.setValue(data_source.max_concurrent_exports)
             self.name_edit.setEnabled(False)
             self.delete_btn.setVisible(True)
             self.current_name = data_source.name
@@ -129,8 +148,12 @@ class DataSourceForm(QWidget):
 
     @staticmethod
     def _test_connection(data_source: DataBase) -> bool:
-        data_source = datasource_container.get_datasource(data_source)
-        return data_source.is_valid_connection()
+        # 尚未保存的配置使用临时数据源，测试后关闭，不影响已保存数据源的连接池
+        data_source = datasource_container.create_datasource(data_source)
+        try:
+            return data_source.is_valid_connection()
+        finally:
+            data_source.close()
 
     def save_data_source(self):
         name = self.name_edit.text().strip()
@@ -146,11 +169,19 @@ class DataSourceForm(QWidget):
                 port=self.port_edit.text().strip(),
                 username=self.username_edit.text().strip(),
                 password=self.password_edit.text(),
-                database=self.database_edit.text().strip()
+                database=self.database_edit.text().strip(),
+                pool_size=self.pool_size_spin.value(),
+                pool_idle_timeout=self.pool_idle_timeout_spin.value(),
+                max_concurrent_exports=self.max_concurrent_exports_spin.value()
             )
 
-            self.db.data_sources[name] = ds
-            self.db.save()
+            with self.db.lock:
+                changed = self.db.data_sources.get(name) not in (None, ds)
+                self.db.data_sources[name] = ds
+                self.db.save()
+            if changed:
+                # 连接配置已修改，关闭旧连接池，下次使用时按新配置创建
+                datasource_container.remove_datasource(name)
             self.saved.emit()
             QMessageBox.information(self, "成功", "数据源保存成功")
         except Exception as e:
@@ -186,8 +217,10 @@ class DataSourceForm(QWidget):
                     return
 
                 # 执行删除
-                del self.db.data_sources[self.current_name]
-                self.db.save()
+                with self.db.lock:
+                    del self.db.data_sources[self.current_name]
+                    self.db.save()
+                datasource_container.remove_datasource(self.current_name)
                 self.deleted.emit(self.current_name)  # 发射删除信号
                 QMessageBox.information(self, "成功", "数据源已删除")
 
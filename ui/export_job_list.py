@@ -0,0 +1,84 @@
+from PySide6.QtCore import Qt
+from PySide6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QTableWidget, QTableWidgetItem,
+                               QPushButton, QLabel, QHeaderView, QAbstractItemView)
+
+from core.exporter import Exporter, ExportJob
+
+
+class ExportJobList(QWidget):
+    """导出任务列表：显示排队中、导出中和已结束的任务，可取消选中的任务"""
+    COLUMNS = ["脚本", "输出文件", "状态", "进度", "信息"]
+
+    def __init__(self, exporter: Exporter):
+        super().__init__()
+        self.exporter = exporter
+        self.exporter.job_updated.connect(self.refresh_job)
+        self.init_ui()
+
+    def init_ui(self):
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(5, 5, 5, 5)
+
+        header_layout = QHBoxLayout()
+        header_layout.addWidget(QLabel("导出任务"))
+        header_layout.addStretch()
+
+        self.cancel_btn = QPushButton("取消任务")
+        self.cancel_btn.setObjectName("cancel_btn")
+        self.cancel_btn.clicked.connect(self.cancel_selected)
+        self.clear_btn = QPushButton("清除已结束")
+        self.clear_btn.clicked.connect(self.exporter.clear_completed)
+        header_layout.addWidget(self.cancel_btn)
+        header_layout.addWidget(self.clear_btn)
+
+        self.table = QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+        self.table.horizontalHeader().setStretchLastSection(True)
+
+        layout.addLayout(header_layout)
+        layout.addWidget(self.table)
+
+    def refresh_job(self, job_id):
+        row = self._find_row(job_id)
+        job = self.exporter.jobs.get(job_id)
+        if job is None:
+            # 任务记录已被清除
+            if row >= 0:
+                self.table.removeRow(row)
+            return
+
+        if row < 0:
+            row = self.table.rowCount()
+            self.table.insertRow(row)
+        values = [job.script_name, job.output_path, job.status.value, self._progress_text(job), job.message]
+        for column, value in enumerate(values):
+            item = QTableWidgetItem(value)
+            if column == 0:
+                item.setData(Qt.ItemDataRole.UserRole, job_id)
+            self.table.setItem(row, column, item)
+
+    def cancel_selected(self):
+        for index in self.table.selectionModel().selectedRows():
+            job_id = self.table.item(index.row(), 0).data(Qt.ItemDataRole.UserRole)
+            self.exporter.cancel_export(job_id)
+
+    def _find_row(self, job_id) -> int:
+        for row in range(self.table.rowCount()):
+            item = self.table.item(row, 0)
+            if item and item.data(Qt.ItemDataRole.UserRole) == job_id:
+                return row
+        return -1
+
+    @staticmethod
+    def _progress_text(job: ExportJob) -> str:
+        if not job.progress:
+            return ""
+        progress = job.progress
+        if progress.total_rows > 0:
+            percent = min(int(progress.processed_rows / progress.total_rows * 100), 100)
+            return f"{progress.processed_rows}/{progress.total_rows} ({percent}%)"
+        return f"{progress.processed_rows} 行"
@@ -4,7 +4,9 @@ from PySide6.QtWidgets import (QMainWindow, QSplitter, QWidget, QVBoxLayout, QHB
 
 from core.local_storage import LocalStorage
 from ui.data_source_form import DataSourceForm
+from ui.export_job_list import ExportJobList
 from ui.script_form import ScriptForm
+from ui.workbook_form import WorkbookForm
 from ui.styles import apply_style
 
 
@@ -26,6 +28,7 @@ class MainWindow(QMainWindow):
         self.db = LocalStorage()
         self.current_data_source = None
         self.current_script = None
+        self.current_workbook = None
 
         self.init_ui()
         apply_style(self)
@@ -49,22 +52,30 @@ class MainWindow(QMainWindow):
         self.add_script_btn = QPushButton("新增脚本")
         self.add_script_btn.clicked.connect(self.show_add_script_form)
 
+        self.add_workbook_btn = QPushButton("新增工作簿")
+        self.add_workbook_btn.clicked.connect(self.show_add_workbook_form)
+
         btn_layout.addWidget(self.add_ds_btn)
         btn_layout.addWidget(self.add_script_btn)
+        btn_layout.addWidget(self.add_workbook_btn)
 
         # 下部标签页区域
         self.tab_widget = QTabWidget()
         self.data_source_list = QListWidget()
         self.script_list = QListWidget()
+        self.workbook_list = QListWidget()
 
         self.data_source_list.itemClicked.connect(self.show_data_source_details)
         self.script_list.itemClicked.connect(self.show_script_details)
+        self.workbook_list.itemClicked.connect(self.show_workbook_details)
 
         self.data_source_list.setFrameShape(QFrame.Shape.NoFrame)
         self.script_list.setFrameShape(QFrame.Shape.NoFrame)
+        self.workbook_list.setFrameShape(QFrame.Shape.NoFrame)
 
         self.tab_widget.addTab(self.data_source_list, "数据源")
         self.tab_widget.addTab(self.script_list, "脚本")
+        self.tab_widget.addTab(self.workbook_list, "工作簿")
         # 去除标签页边框
         self.tab_widget.setDocumentMode(True)
 
@@ -90,8 +101,21 @@ class MainWindow(QMainWindow):
         self.script_form.deleted.connect(self.handle_script_deleted)
         self.right_stacked.addWidget(self.script_form)
 
+        # 工作簿表单，与脚本共用导出调度器
+        self.workbook_form = WorkbookForm(self.db, self.script_form.exporter)
+        self.workbook_form.saved.connect(self.refresh_workbooks)
+        self.workbook_form.deleted.connect(self.handle_workbook_deleted)
+        self.right_stacked.addWidget(self.workbook_form)
+
+        # 右侧下方的导出任务列表
+        self.job_list = ExportJobList(self.script_form.exporter)
+        right_splitter = QSplitter(Qt.Orientation.Vertical)
+        right_splitter.addWidget(self.right_stacked)
+        right_splitter.addWidget(self.job_list)
+        right_splitter.setSizes([450, 150])
+
         splitter.addWidget(left_widget)
-        splitter.addWidget(self.right_stacked)
+        splitter.addWidget(right_splitter)
         splitter.setSizes([250, 750])
 
         self.setCentralWidget(splitter)
@@ -99,6 +123,7 @@ class MainWindow(QMainWindow):
         self.tab_widget.currentChanged.connect(self.on_tab_changed)
         self.refresh_data_sources()
         self.refresh_scripts()
+        self.refresh_workbooks()
 
     def show_first_data_source(self):
         """显示第一个数据源(如果有)"""
@@ -118,11 +143,22 @@ class MainWindow(QMainWindow):
         else:
             self.right_stacked.setCurrentWidget(self.blank_page)
 
+    def show_first_workbook(self):
+        """显示第一个工作簿(如果有)"""
+        if self.workbook_list.count() > 0:
+            first_item = self.workbook_list.item(0)
+            first_item.setSelected(True)
+            self.show_workbook_details(first_item)
+        else:
+            self.right_stacked.setCurrentWidget(self.blank_page)
+
     def on_tab_changed(self, index):
         if index == 0:  # 数据源标签页
             self.show_first_data_source()
         elif index == 1:  # 脚本标签页
             self.show_first_script()
+        elif index == 2:  # 工作簿标签页
+            self.show_first_workbook()
 
 
     def show_add_data_source_form(self):
@@ -133,6 +169,10 @@ class MainWindow(QMainWindow):
         self.script_form.set_mode('add')
         self.right_stacked.setCurrentWidget(self.script_form)
 
+    def show_add_workbook_form(self):
+        self.workbook_form.set_mode('add')
+        self.right_stacked.setCurrentWidget(self.workbook_form)
+
     def show_data_source_details(self, item):
         self.current_data_source = item.text()
         ds = self.db.data_sources.get(self.current_data_source)
@@ -147,6 +187,13 @@ class MainWindow(QMainWindow):
             self.script_form.set_mode('edit', script)
             self.right_stacked.setCurrentWidget(self.script_form)
 
+    def show_workbook_details(self, item):
+        self.current_workbook = item.text()
+        workbook = self.db.workbooks.get(self.current_workbook)
+        if workbook:
+            self.workbook_form.set_mode('edit', workbook)
+            self.right_stacked.setCurrentWidget(self.workbook_form)
+
     def refresh_data_sources(self):
         self.data_source_list.clear()
         for name in self.db.data_sources.keys():
@@ -166,4 +213,13 @@ class MainWindow(QMainWindow):
 
     def handle_script_deleted(self, name):
         self.refresh_scripts()
+        self.right_stacked.setCurrentWidget(self.blank_page)
+
+    def refresh_workbooks(self):
+        self.workbook_list.clear()
+        for name in self.db.workbooks.keys():
+            self.workbook_list.addItem(name)
+
+    def handle_workbook_deleted(self, name):
+        self.refresh_workbooks()
         self.right_stacked.setCurrentWidget(self.blank_page)
\ No newline at end of file
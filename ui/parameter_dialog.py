@@ -0,0 +1,71 @@
+from typing import Dict, List, Union
+
+from PySide6.QtWidgets import (QDialog, QFormLayout, QLineEdit, QDialogButtonBox, QLabel, QMessageBox,
+                               QPlainTextEdit)
+
+from core import parameters
+from core.models import ScriptParameter, ParameterType
+
+
+class ParameterDialog(QDialog):
+    """导出前填写脚本参数，默认填入参数的默认值；allow_multiple_values 为 False 时每个参数只能填写一个值"""
+
+    def __init__(self, script_parameters: List[ScriptParameter], parent=None, allow_multiple_values=True):
+        super().__init__(parent)
+        self.script_parameters = script_parameters
+        self.allow_multiple_values = allow_multiple_values
+        self.setWindowTitle("脚本参数")
+        self.init_ui()
+
+    def init_ui(self):
+        layout = QFormLayout(self)
+        if self.allow_multiple_values:
+            layout.addRow(QLabel("每行填写一个值，填写多行时每个值导出一个文件"))
+
+        self.value_edits: Dict[str, Union[QLineEdit, QPlainTextEdit]] = {}
+        for parameter in self.script_parameters:
+            if self.allow_multiple_values:
+                # 多个值按行分隔，值中的逗号等字符原样保留
+                edit = QPlainTextEdit(parameter.default)
+                edit.setTabChangesFocus(True)
+                edit.setFixedHeight(edit.fontMetrics().lineSpacing() * 3 + 12)
+            else:
+                edit = QLineEdit(parameter.default)
+            edit.setPlaceholderText(self._type_hint(parameter))
+            self.value_edits[parameter.name] = edit
+            layout.addRow(f"{parameter.name}:", edit)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addRow(buttons)
+
+    def values(self) -> Dict[str, Union[str, List[str]]]:
+        """参数名称 -> 填写的文本值，填写多行时为各行文本值的列表(忽略空行)"""
+        values = {}
+        for name, edit in self.value_edits.items():
+            if isinstance(edit, QLineEdit):
+                values[name] = edit.text()
+                continue
+            lines = [line for line in edit.toPlainText().splitlines() if line.strip()]
+            values[name] = lines[0] if len(lines) == 1 else lines
+        return values
+
+    def accept(self):
+        try:
+            runs = parameters.resolve_runs(self.script_parameters, self.values())
+        except ValueError as e:
+            QMessageBox.warning(self, "警告", str(e))
+            return
+        if len(runs) > 1 and not self.allow_multiple_values:
+            QMessageBox.warning(self, "警告", "每个参数只能填写一个值")
+            return
+        super().accept()
+
+    @staticmethod
+    def _type_hint(parameter: ScriptParameter) -> str:
+        hints = {
+            ParameterType.DATE: "如 2024-01-31",
+            ParameterType.DATETIME: "如 2024-01-31 08:00:00",
+        }
+        return hints.get(parameter.type, parameter.type.value)
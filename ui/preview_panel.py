@@ -0,0 +1,113 @@
+from typing import Any, List
+
+from PySide6.QtCore import QAbstractTableModel, QModelIndex, Qt, Signal
+from PySide6.QtGui import QColor
+from PySide6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QTableView
+
+from core.models import ColumnType
+from core.preview import PreviewResult, format_value
+
+# 右对齐显示的列类型
+_NUMERIC_TYPES = {ColumnType.INTEGER, ColumnType.NUMBER, ColumnType.DECIMAL}
+
+
+class PreviewTableModel(QAbstractTableModel):
+    """预览结果的表格模型，单元格文本在视图绘制时才生成，只有可见的行会被格式化"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.columns: List[str] = []
+        self.column_types: List[ColumnType] = []
+        self.rows: List[tuple] = []
+
+    def set_result(self, result: PreviewResult = None):
+        self.beginResetModel()
+        self.columns = result.columns if result else []
+        self.column_types = result.column_types if result else []
+        self.rows = result.rows if result else []
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.columns)
+
+    def data(self, index: QModelIndex, role=Qt.ItemDataRole.DisplayRole) -> Any:
+        if not index.isValid():
+            return None
+        value = self.rows[index.row()][index.column()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return format_value(value)
+        if role == Qt.ItemDataRole.ForegroundRole and value is None:
+            return QColor(Qt.GlobalColor.gray)
+        if role == Qt.ItemDataRole.TextAlignmentRole and self.column_types[index.column()] in _NUMERIC_TYPES:
+            return int(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+        return None
+
+    def headerData(self, section: int, orientation: Qt.Orientation, role=Qt.ItemDataRole.DisplayRole) -> Any:
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        if orientation == Qt.Orientation.Horizontal:
+            return self.columns[section]
+        return str(section + 1)
+
+
+class PreviewPanel(QWidget):
+    """脚本查询结果的预览：状态栏(行数、耗时、是否来自缓存)和数据表格"""
+    refresh_requested = Signal()  # 忽略缓存重新查询
+    close_requested = Signal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.init_ui()
+
+    def init_ui(self):
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+
+        header_layout = QHBoxLayout()
+        self.status_label = QLabel()
+        self.refresh_btn = QPushButton("刷新")
+        self.refresh_btn.setToolTip("忽略缓存，重新查询数据库")
+        self.refresh_btn.clicked.connect(self.refresh_requested.emit)
+        self.close_btn = QPushButton("关闭预览")
+        self.close_btn.clicked.connect(self.close_requested.emit)
+        header_layout.addWidget(self.status_label)
+        header_layout.addStretch()
+        header_layout.addWidget(self.refresh_btn)
+        header_layout.addWidget(self.close_btn)
+        layout.addLayout(header_layout)
+
+        self.model = PreviewTableModel(self)
+        self.table_view = QTableView()
+        self.table_view.setModel(self.model)
+        self.table_view.setMinimumHeight(200)
+        self.table_view.setAlternatingRowColors(True)
+        self.table_view.setEditTriggers(QTableView.EditTrigger.NoEditTriggers)
+        layout.addWidget(self.table_view)
+
+    def show_loading(self):
+        self.status_label.setText("正在查询...")
+        self.refresh_btn.setEnabled(False)
+        self.setVisible(True)
+
+    def show_result(self, result: PreviewResult, limit: int):
+        self.model.set_result(result)
+        text = f"前 {len(result.rows)} 行" if len(result.rows) >= limit else f"共 {len(result.rows)} 行"
+        text += f"，{len(result.columns)} 列"
+        text += "(来自缓存)" if result.from_cache else f"，查询耗时 {result.elapsed_seconds:.2f} 秒"
+        self.status_label.setText(text)
+        self.refresh_btn.setEnabled(True)
+        self.setVisible(True)
+
+    def show_error(self, message: str):
+        self.model.set_result(None)
+        self.status_label.setText(f"预览失败: {message}")
+        self.refresh_btn.setEnabled(True)
+        self.setVisible(True)
+
+    def clear(self):
+        self.model.set_result(None)
+        self.status_label.clear()
+        self.setVisible(False)
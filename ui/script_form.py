@@ -1,28 +1,65 @@
-from PySide6.QtCore import Signal, Qt
-from PySide6.QtWidgets import (QWidget, QFormLayout, QLineEdit, QTextEdit,
-                               QComboBox, QPushButton, QHBoxLayout, QMessageBox,
-                               QFileDialog, QProgressBar, QLabel)
+import os
+import re
+from typing import List, Optional
 
-from core.exporter import Exporter
-from core.models import ExportScript
+from PySide6.QtCore import Signal, Qt, QThreadPool
+from PySide6.QtWidgets import (QWidget, QFormLayout, QLineEdit, QTextEdit,
+                               QComboBox, QPushButton, QHBoxLayout, QVBoxLayout, QMessageBox,
+                               QFileDialog, QProgressBar, QLabel, QSpinBox, QCheckBox,
+                               QTableWidget, QTableWidgetItem, QHeaderView, QAbstractItemView, QDialog)
+
+from core import checkpoint, parameters, schema_registry
+from core.export_context import ExportStats, STAGES, STAGE_CONNECT, STAGE_COUNT, STAGE_EXECUTE, STAGE_FETCH, \
+    STAGE_CACHE, STAGE_WRITE, STAGE_CLOSE, EXTRACTION_CURSOR, EXTRACTION_COPY, EXTRACTION_COPY_RAW, EXTRACTION_CACHE
+from core.exporter import Exporter, ExportProgress, ExportJobStatus, PreviewTask
+from core.models import ExportScript, TotalRowsStrategy, OutputFormat, OutputCompression, ExtractionMode, \
+    WatermarkMode, ScriptParameter, ParameterType
+from core.preview import PreviewResult
+from ui.parameter_dialog import ParameterDialog
+from ui.preview_panel import PreviewPanel
+from utils.output_writer import file_extension
 
 
 class ScriptForm(QWidget):
     saved = Signal()
     deleted = Signal(str)
+    # 统计中各导出阶段的显示名称
+    STAGE_NAMES = {
+        STAGE_CONNECT: "连接",
+        STAGE_COUNT: "统计行数",
+        STAGE_EXECUTE: "执行查询",
+        STAGE_FETCH: "拉取",
+        STAGE_CACHE: "读取缓存",
+        STAGE_WRITE: "写入",
+        STAGE_CLOSE: "关闭文件",
+    }
+    # 统计中实际提取方式的显示名称
+    EXTRACTION_NAMES = {
+        EXTRACTION_CURSOR: "游标",
+        EXTRACTION_COPY: "COPY(解析后写入：结果缓存、水位、断点或拆分文件需要逐行处理)",
+        EXTRACTION_COPY_RAW: "COPY(原样写入文件)",
+        EXTRACTION_CACHE: "结果缓存",
+    }
+    # 预览的行数
+    PREVIEW_ROWS = 200
 
     def __init__(self, db):
         super().__init__()
         self.db = db
         self.mode = 'add'  # 'add' or 'edit'
         self.current_script_name = ""  # 当前编辑的脚本名称
-        # 导出标识
-        self.export_in_progress = False
+        # 当前脚本正在执行的导出任务 ID
+        self.current_job_id = None
         self.exporter = Exporter(db)
         self.exporter.progress_updated.connect(self.update_progress)
         self.exporter.total_rows_updated.connect(self.set_total_rows)
         self.exporter.export_finished.connect(self.export_finished)
         self.exporter.export_failed.connect(self.export_failed)
+        self.exporter.job_updated.connect(self._on_job_updated)
+        # 正在执行的预览，新的预览开始时取消旧的
+        self.preview_task = None
+        self.preview_fill_fields = False
+        self._preview_ids = 0
         self.init_ui()
 
     def init_ui(self):
@@ -30,17 +67,160 @@ class ScriptForm(QWidget):
 
         self.name_edit = QLineEdit()
         self.fields_edit = QLineEdit()
-        self.fields_edit.setPlaceholderText("多个字段用逗号分隔")
+        self.fields_edit.setPlaceholderText("表头名称，多个用逗号分隔，为空时使用查询返回的列名")
+        self.fetch_fields_btn = QPushButton("从查询获取")
+        self.fetch_fields_btn.setToolTip("执行查询的前几行，使用返回的列名作为字段名称")
+        self.fetch_fields_btn.clicked.connect(lambda: self.preview_data(fill_fields=True))
+        fields_layout = QHBoxLayout()
+        fields_layout.addWidget(self.fields_edit)
+        fields_layout.addWidget(self.fetch_fields_btn)
         self.sql_edit = QTextEdit()
-        self.sql_edit.setPlaceholderText("请输入SQL查询语句")
+        self.sql_edit.setPlaceholderText("请输入SQL查询语句，参数以 %(名称)s 引用(使用参数时 % 需写为 %%)")
+
+        # 脚本参数：名称、类型、默认值
+        self.parameters_table = QTableWidget(0, 3)
+        self.parameters_table.setHorizontalHeaderLabels(["名称", "类型", "默认值"])
+        self.parameters_table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.parameters_table.verticalHeader().setVisible(False)
+        self.parameters_table.horizontalHeader().setStretchLastSection(True)
+        self.parameters_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        self.parameters_table.setMaximumHeight(120)
+        self.add_parameter_btn = QPushButton("添加")
+        self.add_parameter_btn.clicked.connect(lambda: self._add_parameter_row())
+        self.remove_parameter_btn = QPushButton("删除")
+        self.remove_parameter_btn.clicked.connect(self._remove_parameter_rows)
+        parameter_btn_layout = QVBoxLayout()
+        parameter_btn_layout.addWidget(self.add_parameter_btn)
+        parameter_btn_layout.addWidget(self.remove_parameter_btn)
+        parameter_btn_layout.addStretch()
+        parameters_layout = QHBoxLayout()
+        parameters_layout.addWidget(self.parameters_table)
+        parameters_layout.addLayout(parameter_btn_layout)
 
         self.ds_combo = QComboBox()
         self.refresh_ds_combo()
 
+        self.fetch_size_spin = QSpinBox()
+        self.fetch_size_spin.setRange(1, 1000000)
+        self.fetch_size_spin.setValue(500)
+        self.adaptive_fetch_check = QCheckBox("自适应")
+        self.adaptive_fetch_check.setChecked(True)
+        self.fetch_memory_limit_spin = QSpinBox()
+        self.fetch_memory_limit_spin.setRange(1, 65536)
+        self.fetch_memory_limit_spin.setValue(64)
+        self.fetch_memory_limit_spin.setSuffix(" MB")
+        fetch_layout = QHBoxLayout()
+        fetch_layout.addWidget(self.fetch_size_spin)
+        fetch_layout.addWidget(self.adaptive_fetch_check)
+        fetch_layout.addWidget(QLabel("内存上限:"))
+        fetch_layout.addWidget(self.fetch_memory_limit_spin)
+
+        self.extraction_mode_combo = QComboBox()
+        self.extraction_mode_combo.addItem("游标(fetchmany)", ExtractionMode.CURSOR)
+        self.extraction_mode_combo.addItem("COPY(仅 PostgreSQL，不分区时)", ExtractionMode.COPY)
+
+        self.total_rows_combo = QComboBox()
+        self.total_rows_combo.addItem("精确统计(COUNT)", TotalRowsStrategy.EXACT)
+        self.total_rows_combo.addItem("估算(EXPLAIN)", TotalRowsStrategy.ESTIMATE)
+        self.total_rows_combo.addItem("不统计", TotalRowsStrategy.NONE)
+
+        self.max_rows_per_file_spin = QSpinBox()
+        self.max_rows_per_file_spin.setRange(0, 1000000000)
+        self.max_rows_per_file_spin.setSpecialValueText("不拆分")
+        # 拆分文件时并行生成 XLSX 的进程数
+        self.xlsx_processes_spin = QSpinBox()
+        self.xlsx_processes_spin.setRange(1, os.cpu_count() or 1)
+        self.xlsx_processes_spin.setToolTip("拆分文件且导出 Excel 时，由多个进程并行生成各个文件")
+        split_layout = QHBoxLayout()
+        split_layout.addWidget(self.max_rows_per_file_spin)
+        split_layout.addWidget(QLabel("并行进程:"))
+        split_layout.addWidget(self.xlsx_processes_spin)
+
+        # 分区并行导出
+        self.partition_column_edit = QLineEdit()
+        self.partition_column_edit.setPlaceholderText("数值或日期字段，为空表示不分区")
+        self.partition_count_spin = QSpinBox()
+        self.partition_count_spin.setRange(1, 64)
+        partition_layout = QHBoxLayout()
+        partition_layout.addWidget(self.partition_column_edit)
+        partition_layout.addWidget(QLabel("并行数:"))
+        partition_layout.addWidget(self.partition_count_spin)
+
+        # 增量导出
+        self.watermark_column_edit = QLineEdit()
+        self.watermark_column_edit.setPlaceholderText("自增 ID 或更新时间字段，为空表示全量导出")
+        self.watermark_mode_combo = QComboBox()
+        self.watermark_mode_combo.addItem("生成增量文件", WatermarkMode.DELTA)
+        self.watermark_mode_combo.addItem("追加到文件(CSV/TSV)", WatermarkMode.APPEND)
+        self.watermark_label = QLabel()
+        self.reset_watermark_btn = QPushButton("重置")
+        self.reset_watermark_btn.setToolTip("清除已记录的水位，下次导出全部数据")
+        self.reset_watermark_btn.clicked.connect(self.reset_watermark)
+        watermark_layout = QHBoxLayout()
+        watermark_layout.addWidget(self.watermark_column_edit)
+        watermark_layout.addWidget(self.watermark_mode_combo)
+        watermark_state_layout = QHBoxLayout()
+        watermark_state_layout.addWidget(self.watermark_label)
+        watermark_state_layout.addStretch()
+        watermark_state_layout.addWidget(self.reset_watermark_btn)
+
+        # 断点续传
+        self.checkpoint_column_edit = QLineEdit()
+        self.checkpoint_column_edit.setPlaceholderText("唯一且有序的字段(如主键)，需设置单文件最大行数，每写完一个文件记录一次断点")
+
+        # 语句超时
+        self.statement_timeout_spin = QSpinBox()
+        self.statement_timeout_spin.setRange(0, 24 * 3600)
+        self.statement_timeout_spin.setSingleStep(30)
+        self.statement_timeout_spin.setSuffix(" 秒")
+        self.statement_timeout_spin.setSpecialValueText("不限制")
+        self.statement_timeout_spin.setToolTip("单条语句(统计行数、查询、拉取)超过该时间时由数据库中止")
+
+        # 查询结果缓存
+        self.cache_ttl_spin = QSpinBox()
+        self.cache_ttl_spin.setRange(0, 7 * 24 * 3600)
+        self.cache_ttl_spin.setSingleStep(60)
+        self.cache_ttl_spin.setSuffix(" 秒")
+        self.cache_ttl_spin.setSpecialValueText("不缓存")
+        self.cache_ttl_spin.setToolTip("有效期内再次导出相同的查询时直接使用本地缓存，不访问数据库")
+
+        self.decimal_as_text_check = QCheckBox("超过 15 位有效数字的小数以文本保存(保留精度)")
+
+        # 导出格式
+        self.output_format_combo = QComboBox()
+        self.output_format_combo.addItem("Excel(xlsx)", OutputFormat.XLSX)
+        self.output_format_combo.addItem("CSV", OutputFormat.CSV)
+        self.output_format_combo.addItem("TSV", OutputFormat.TSV)
+        self.output_format_combo.addItem("Parquet", OutputFormat.PARQUET)
+        self.output_compression_combo = QComboBox()
+        self.output_compression_combo.addItem("不压缩", OutputCompression.NONE)
+        self.output_compression_combo.addItem("gzip", OutputCompression.GZIP)
+        self.output_compression_combo.addItem("zstd", OutputCompression.ZSTD)
+        self.output_compression_combo.addItem("snappy", OutputCompression.SNAPPY)
+        self.output_format_combo.currentIndexChanged.connect(self._on_output_format_changed)
+        self._on_output_format_changed()
+        output_layout = QHBoxLayout()
+        output_layout.addWidget(self.output_format_combo)
+        output_layout.addWidget(QLabel("压缩:"))
+        output_layout.addWidget(self.output_compression_combo)
+
         layout.addRow("脚本名称:", self.name_edit)
         layout.addRow("数据源:", self.ds_combo)
-        layout.addRow("字段名称:", self.fields_edit)
+        layout.addRow("字段名称:", fields_layout)
         layout.addRow("SQL脚本:", self.sql_edit)
+        layout.addRow("脚本参数:", parameters_layout)
+        layout.addRow("导出格式:", output_layout)
+        layout.addRow("每批行数:", fetch_layout)
+        layout.addRow("拉取方式:", self.extraction_mode_combo)
+        layout.addRow("总行数:", self.total_rows_combo)
+        layout.addRow("语句超时:", self.statement_timeout_spin)
+        layout.addRow("单文件最大行数:", split_layout)
+        layout.addRow("分区字段:", partition_layout)
+        layout.addRow("水位字段:", watermark_layout)
+        layout.addRow("当前水位:", watermark_state_layout)
+        layout.addRow("断点排序键:", self.checkpoint_column_edit)
+        layout.addRow("结果缓存:", self.cache_ttl_spin)
+        layout.addRow("", self.decimal_as_text_check)
 
         # 进度条
         self.progress_bar = QProgressBar()
@@ -53,14 +233,41 @@ class ScriptForm(QWidget):
         self.progress_label.setVisible(False)
         layout.addRow(self.progress_label)
 
+        # 最近一次导出的分阶段耗时
+        self.stats_label = QLabel()
+        self.stats_label.setWordWrap(True)
+        self.stats_label.setTextInteractionFlags(Qt.TextInteractionFlag.TextSelectableByMouse)
+        self.stats_label.setVisible(False)
+        layout.addRow(self.stats_label)
+
+        # 查询结果预览
+        self.preview_panel = PreviewPanel()
+        self.preview_panel.refresh_requested.connect(lambda: self.preview_data(force_refresh=True))
+        self.preview_panel.close_requested.connect(self._close_preview)
+        self.preview_panel.setVisible(False)
+        layout.addRow(self.preview_panel)
+
         # 按钮区域
         btn_layout = QHBoxLayout()
         self.save_btn = QPushButton("保存")
         self.save_btn.setObjectName("save_btn")
         self.save_btn.clicked.connect(self.save_script)
 
+        self.force_refresh_check = QCheckBox("忽略缓存")
+        self.force_refresh_check.setToolTip("重新查询数据库，刷新缓存和登记的列信息")
+        self.force_refresh_check.setVisible(False)
+
+        self.preview_btn = QPushButton("预览")
+        self.preview_btn.setToolTip(f"查询前 {self.PREVIEW_ROWS} 行，检查列和数据")
+        self.preview_btn.clicked.connect(lambda: self.preview_data())
+
         self.export_btn = QPushButton("执行导出")
-        self.export_btn.clicked.connect(self.export_data)
+        self.export_btn.clicked.connect(lambda: self.export_data())
+
+        self.resume_btn = QPushButton("继续导出")
+        self.resume_btn.setToolTip("选择上次中断的导出文件，从断点继续导出")
+        self.resume_btn.clicked.connect(lambda: self.export_data(resume=True))
+        self.resume_btn.setVisible(False)
 
         self.cancel_btn = QPushButton("取消导出")
         self.cancel_btn.setObjectName("cancel_btn")
@@ -74,8 +281,11 @@ class ScriptForm(QWidget):
         self.delete_btn.setVisible(False)
 
         btn_layout.addStretch()
+        btn_layout.addWidget(self.force_refresh_check)
         btn_layout.addWidget(self.save_btn)
+        btn_layout.addWidget(self.preview_btn)
         btn_layout.addWidget(self.export_btn)
+        btn_layout.addWidget(self.resume_btn)
         btn_layout.addWidget(self.cancel_btn)
         btn_layout.addWidget(self.delete_btn)
 
@@ -94,20 +304,67 @@ class ScriptForm(QWidget):
             self.name_edit.clear()
             self.fields_edit.clear()
             self.sql_edit.clear()
+            self._set_parameters([])
             self.ds_combo.setCurrentIndex(0)
+            self.fetch_size_spin.setValue(500)
+            self.adaptive_fetch_check.setChecked(True)
+            self.fetch_memory_limit_spin.setValue(64)
+            self.total_rows_combo.setCurrentIndex(0)
+            self.statement_timeout_spin.setValue(0)
+            self.max_rows_per_file_spin.setValue(0)
+            self.xlsx_processes_spin.setValue(1)
+            self.cache_ttl_spin.setValue(0)
+            self.checkpoint_column_edit.clear()
+            self.watermark_column_edit.clear()
+            self.watermark_mode_combo.setCurrentIndex(0)
+            self.partition_column_edit.clear()
+            self.partition_count_spin.setValue(1)
+            self.decimal_as_text_check.setChecked(False)
+            self.output_format_combo.setCurrentIndex(0)
+            self.output_compression_combo.setCurrentIndex(0)
+            self.extraction_mode_combo.setCurrentIndex(0)
             self.name_edit.setEnabled(True)
             self.export_btn.setVisible(False)
+            self.resume_btn.setVisible(False)
+            self.force_refresh_check.setVisible(False)
             self.delete_btn.setVisible(False)  # 添加模式隐藏删除按钮
             self.current_script_name = ""
         elif mode == 'edit' and script:
             self.name_edit.setText(script.name)
             self.fields_edit.setText(script.fields)
             self.sql_edit.setPlainText(script.sql)
+            self._set_parameters(script.parameters)
             self.ds_combo.setCurrentText(script.data_source_name)
+            self.fetch_size_spin.setValue(script.fetch_size)
+            self.adaptive_fetch_check.setChecked(script.adaptive_fetch)
+            self.fetch_memory_limit_spin.setValue(script.fetch_memory_limit_mb)
+            self.total_rows_combo.setCurrentIndex(self.total_rows_combo.findData(script.total_rows_strategy))
+            self.statement_timeout_spin.setValue(script.statement_timeout_seconds)
+            self.max_rows_per_file_spin.setValue(script.max_rows_per_file)
+            self.xlsx_processes_spin.setValue(script.xlsx_processes)
+            self.cache_ttl_spin.setValue(script.cache_ttl_seconds)
+            self.checkpoint_column_edit.setText(script.checkpoint_column)
+            self.watermark_column_edit.setText(script.watermark_column)
+            self.watermark_mode_combo.setCurrentIndex(self.watermark_mode_combo.findData(script.watermark_mode))
+            self.partition_column_edit.setText(script.partition_column)
+            self.partition_count_spin.setValue(script.partition_count)
+            self.decimal_as_text_check.setChecked(script.decimal_as_text)
+            self.output_format_combo.setCurrentIndex(self.output_format_combo.findData(script.output_format))
+            self.output_compression_combo.setCurrentIndex(
+                self.output_compression_combo.findData(script.output_compression))
+            self.extraction_mode_combo.setCurrentIndex(self.extraction_mode_combo.findData(script.extraction_mode))
             self.name_edit.setEnabled(False)
             self.export_btn.setVisible(True)
+            # 仅启用缓存的脚本显示
+            self.force_refresh_check.setVisible(script.cache_ttl_seconds > 0)
+            self.force_refresh_check.setChecked(False)
             self.delete_btn.setVisible(True)  # 编辑模式显示删除按钮
             self.current_script_name = script.name
+        self.stats_label.setVisible(False)
+        self._close_preview()
+        self._refresh_watermark()
+        self._refresh_resume()
+        self._sync_job_state()
 
     def save_script(self):
         name = self.name_edit.text().strip()
@@ -116,52 +373,235 @@ class ScriptForm(QWidget):
             return
 
         fields = self.fields_edit.text().strip()
-        if not fields:
-            QMessageBox.warning(self, "警告", "请输入字段名称")
-            return
 
         sql = self.sql_edit.toPlainText().strip()
         if not sql:
             QMessageBox.warning(self, "警告", "请输入SQL脚本")
             return
 
+        try:
+            script_parameters = self._read_parameters()
+        except ValueError as e:
+            QMessageBox.warning(self, "警告", str(e))
+            return
+
+        if self.checkpoint_column_edit.text().strip() and self.max_rows_per_file_spin.value() == 0:
+            QMessageBox.warning(self, "警告", "设置断点排序键时需同时设置单文件最大行数，每写完一个文件记录一次断点")
+            return
+
         try:
             script = ExportScript(
                 name=name,
                 fields=fields,
                 sql=sql,
-                data_source_name=self.ds_combo.currentText()
+                data_source_name=self.ds_combo.currentText(),
+                fetch_size=self.fetch_size_spin.value(),
+                adaptive_fetch=self.adaptive_fetch_check.isChecked(),
+                fetch_memory_limit_mb=self.fetch_memory_limit_spin.value(),
+                total_rows_strategy=self.total_rows_combo.currentData(),
+                statement_timeout_seconds=self.statement_timeout_spin.value(),
+                max_rows_per_file=self.max_rows_per_file_spin.value(),
+                xlsx_processes=self.xlsx_processes_spin.value(),
+                cache_ttl_seconds=self.cache_ttl_spin.value(),
+                checkpoint_column=self.checkpoint_column_edit.text().strip(),
+                watermark_column=self.watermark_column_edit.text().strip(),
+                watermark_mode=self.watermark_mode_combo.currentData(),
+                partition_column=self.partition_column_edit.text().strip(),
+                partition_count=self.partition_count_spin.value(),
+                decimal_as_text=self.decimal_as_text_check.isChecked(),
+                output_format=self.output_format_combo.currentData(),
+                output_compression=self.output_compression_combo.currentData(),
+                extraction_mode=self.extraction_mode_combo.currentData(),
+                parameters=script_parameters
             )
 
-            self.db.scripts[name] = script
-            self.db.save()
+            # 按登记的列信息(SQL 和数据源未修改时有效)核对字段名称的数量
+            schema = self.db.schemas.get(name)
+            data_source = self.db.data_sources.get(script.data_source_name)
+            if schema and data_source and \
+                    schema.fingerprint == schema_registry.schema_fingerprint(data_source, script.sql):
+                message = self._fields_mismatch([column.name for column in schema.columns])
+                if message:
+                    QMessageBox.warning(self, "警告", message)
+                    return
+
+            # 导出线程会同时保存水位和列信息，修改配置和保存都在同一把锁内完成
+            with self.db.lock:
+                self.db.scripts[name] = script
+                self.db.save()
             self.saved.emit()
             QMessageBox.information(self, "成功", "脚本保存成功")
         except Exception as e:
             QMessageBox.critical(self, "错误", f"保存失败: {str(e)}")
 
-    def export_data(self):
+    def export_data(self, resume=False):
         script_name = self.name_edit.text().strip()
         if not script_name:
             QMessageBox.warning(self, "警告", "请先保存脚本")
             return
 
-        file_path, _ = QFileDialog.getSaveFileName(
-            self, "导出Excel文件", "", "Excel Files (*.xlsx)"
-        )
+        script = self.db.scripts.get(script_name)
+        params = None
+        if script and script.parameters:
+            dialog = ParameterDialog(script.parameters, self)
+            if dialog.exec() != QDialog.DialogCode.Accepted:
+                return
+            params = dialog.values()
+
+        if script and script.output_format != OutputFormat.XLSX:
+            extension = file_extension(script.output_format, script.output_compression)
+            title, file_filter = "导出文件", f"{script.output_format.value.upper()} Files (*{extension})"
+        else:
+            title, file_filter = "导出Excel文件", "Excel Files (*.xlsx)"
+        if resume:
+            # 继续导出时选择上次的输出文件(默认选中)，已写完的拆分文件保留
+            file_path, _ = QFileDialog.getSaveFileName(
+                self, "选择要继续的导出文件", self.db.checkpoint_outputs.get(script_name, ""), file_filter,
+                options=QFileDialog.Option.DontConfirmOverwrite
+            )
+        else:
+            file_path, _ = QFileDialog.getSaveFileName(self, title, "", file_filter)
 
         if file_path:
-            self.export_in_progress = True
             # 禁用按钮避免重复点击
             self._toggle_ui_status(True)
 
             # 显示进度条
             self.progress_bar.setVisible(True)
+            self.progress_bar.setRange(0, 100)
             self.progress_bar.setValue(0)
             self.progress_label.setVisible(True)
             self.progress_label.setText("准备导出...")
 
-            self.exporter.export_to_excel(script_name, file_path)
+            self.current_job_id = self.exporter.export_to_excel(script_name, file_path,
+                                                                self.force_refresh_check.isChecked(), params,
+                                                                resume)
+
+    def preview_data(self, fill_fields=False, force_refresh=False):
+        """在后台查询编辑中的 SQL 的前几行并显示；fill_fields 为 True 时用返回的列名填写字段名称"""
+        sql = self.sql_edit.toPlainText().strip()
+        if not sql:
+            QMessageBox.warning(self, "警告", "请输入SQL脚本")
+            return
+        try:
+            script_parameters = self._read_parameters()
+        except ValueError as e:
+            QMessageBox.warning(self, "警告", str(e))
+            return
+
+        params = None
+        if script_parameters:
+            dialog = ParameterDialog(script_parameters, self)
+            if dialog.exec() != QDialog.DialogCode.Accepted:
+                return
+            params = dialog.values()
+
+        script = ExportScript(
+            name=self.current_script_name,
+            fields=self.fields_edit.text().strip(),
+            sql=sql,
+            data_source_name=self.ds_combo.currentText(),
+            statement_timeout_seconds=self.statement_timeout_spin.value(),
+            parameters=script_parameters
+        )
+        self._cancel_preview()
+        self._preview_ids += 1
+        self.preview_fill_fields = fill_fields
+        self.preview_task = PreviewTask(self._preview_ids, self.db, script, params, self.PREVIEW_ROWS, force_refresh)
+        self.preview_task.signals.finished.connect(self._preview_finished)
+        self.preview_task.signals.failed.connect(self._preview_failed)
+        self.preview_panel.show_loading()
+        QThreadPool.globalInstance().start(self.preview_task)
+
+    def _preview_finished(self, preview_id, result: PreviewResult):
+        # 已被新的预览取代或已关闭
+        if not self.preview_task or preview_id != self.preview_task.preview_id:
+            return
+        self.preview_task = None
+        if self.preview_fill_fields:
+            self.fields_edit.setText(",".join(result.columns))
+        self.preview_panel.show_result(result, self.PREVIEW_ROWS)
+        message = self._fields_mismatch(result.columns)
+        if message:
+            QMessageBox.warning(self, "警告", message)
+
+    def _fields_mismatch(self, columns: List[str]) -> Optional[str]:
+        """填写的字段名称数量与查询列数不一致时返回提示(导出时表头改用查询列名)"""
+        text = self.fields_edit.text()
+        fields = [name.strip() for name in text.split(',')] if text.strip() else []
+        if not fields or len(fields) == len(columns):
+            return None
+        return (f"填写了 {len(fields)} 个字段名称，但查询返回 {len(columns)} 列：{', '.join(columns)}\n"
+                f"请修改字段名称，或留空使用查询返回的列名")
+
+    def _preview_failed(self, preview_id, message):
+        if not self.preview_task or preview_id != self.preview_task.preview_id:
+            return
+        self.preview_task = None
+        self.preview_panel.show_error(message)
+
+    def _cancel_preview(self):
+        if self.preview_task:
+            self.preview_task.cancel()
+            self.preview_task = None
+
+    def _close_preview(self):
+        self._cancel_preview()
+        self.preview_panel.clear()
+
+    def _on_output_format_changed(self):
+        # Excel 不支持压缩，snappy 仅适用于 Parquet(默认使用 snappy)
+        output_format = self.output_format_combo.currentData()
+        is_parquet = output_format == OutputFormat.PARQUET
+        snappy_index = self.output_compression_combo.findData(OutputCompression.SNAPPY)
+        self.output_compression_combo.model().item(snappy_index).setEnabled(is_parquet)
+        self.output_compression_combo.setEnabled(output_format != OutputFormat.XLSX)
+        current = self.output_compression_combo.currentData()
+        if output_format == OutputFormat.XLSX or (current == OutputCompression.SNAPPY and not is_parquet):
+            self.output_compression_combo.setCurrentIndex(0)
+        elif is_parquet and current == OutputCompression.NONE:
+            self.output_compression_combo.setCurrentIndex(snappy_index)
+
+    def _add_parameter_row(self, parameter: ScriptParameter = None):
+        row = self.parameters_table.rowCount()
+        self.parameters_table.insertRow(row)
+        type_combo = QComboBox()
+        for parameter_type in ParameterType:
+            type_combo.addItem(parameter_type.value, parameter_type)
+        if parameter:
+            type_combo.setCurrentIndex(type_combo.findData(parameter.type))
+        self.parameters_table.setItem(row, 0, QTableWidgetItem(parameter.name if parameter else ""))
+        self.parameters_table.setCellWidget(row, 1, type_combo)
+        self.parameters_table.setItem(row, 2, QTableWidgetItem(parameter.default if parameter else ""))
+
+    def _remove_parameter_rows(self):
+        rows = sorted({index.row() for index in self.parameters_table.selectedIndexes()}, reverse=True)
+        for row in rows:
+            self.parameters_table.removeRow(row)
+
+    def _set_parameters(self, script_parameters: List[ScriptParameter]):
+        self.parameters_table.setRowCount(0)
+        for parameter in script_parameters:
+            self._add_parameter_row(parameter)
+
+    def _read_parameters(self) -> List[ScriptParameter]:
+        """读取参数表格，名称需为合法标识符且不重复，默认值需符合类型"""
+        script_parameters = []
+        for row in range(self.parameters_table.rowCount()):
+            name_item = self.parameters_table.item(row, 0)
+            default_item = self.parameters_table.item(row, 2)
+            name = name_item.text().strip() if name_item else ""
+            default = default_item.text().strip() if default_item else ""
+            # 下划线开头的名称保留给内部参数(分区边界、水位)
+            if not re.fullmatch(r'[A-Za-z]\w*', name):
+                raise ValueError(f"参数名称 '{name}' 无效，需以字母开头且只能包含字母、数字和下划线")
+            if any(parameter.name == name for parameter in script_parameters):
+                raise ValueError(f"参数名称 '{name}' 重复")
+            parameter = ScriptParameter(name, self.parameters_table.cellWidget(row, 1).currentData(), default)
+            if default:
+                parameters.resolve_runs([parameter])
+            script_parameters.append(parameter)
+        return script_parameters
 
     def delete_script(self):
         """删除当前脚本"""
@@ -178,9 +618,27 @@ class ScriptForm(QWidget):
 
         if reply == QMessageBox.StandardButton.Yes:
             try:
+                # 检查是否有工作簿使用此脚本
+                used_by_workbooks = [
+                    name for name, workbook in self.db.workbooks.items()
+                    if any(sheet.script_name == self.current_script_name for sheet in workbook.sheets)
+                ]
+
+                if used_by_workbooks:
+                    QMessageBox.warning(
+                        self,
+                        "无法删除",
+                        f"该脚本被以下工作簿引用，无法删除:\n{', '.join(used_by_workbooks)}"
+                    )
+                    return
+
                 # 执行删除
-                del self.db.scripts[self.current_script_name]
-                self.db.save()
+                with self.db.lock:
+                    del self.db.scripts[self.current_script_name]
+                    self.db.watermarks.pop(self.current_script_name, None)
+                    self.db.schemas.pop(self.current_script_name, None)
+                    self.db.checkpoint_outputs.pop(self.current_script_name, None)
+                    self.db.save()
                 self.deleted.emit(self.current_script_name)  # 发射删除信号
                 QMessageBox.information(self, "成功", "脚本已删除")
 
@@ -190,58 +648,152 @@ class ScriptForm(QWidget):
             except Exception as e:
                 QMessageBox.critical(self, "错误", f"删除失败: {str(e)}")
 
-    def set_total_rows(self, total):
-        self.total_rows = total
-        self.update_progress(0)
+    def reset_watermark(self):
+        """清除当前脚本的水位"""
+        with self.db.lock:
+            if self.db.watermarks.pop(self.current_script_name, None) is not None:
+                self.db.save()
+        self._refresh_watermark()
+
+    def _refresh_watermark(self):
+        watermark = self.db.watermarks.get(self.current_script_name)
+        self.watermark_label.setText("无(下次导出全部数据)" if watermark is None else str(watermark))
+        self.reset_watermark_btn.setEnabled(watermark is not None)
+
+    def _refresh_resume(self):
+        """仅当上次的导出留下了有进度的断点时显示“继续导出”"""
+        script = self.db.scripts.get(self.current_script_name)
+        output_file = self.db.checkpoint_outputs.get(self.current_script_name)
+        self.resume_btn.setVisible(bool(script and script.checkpoint_column and output_file
+                                        and checkpoint.has_progress(output_file)))
+
+    def set_total_rows(self, job_id, total):
+        if job_id != self.current_job_id:
+            return
+        # 总行数未知时显示为忙碌状态的进度条
+        self.progress_bar.setRange(0, 100 if total > 0 else 0)
+        self.progress_bar.setValue(0)
 
-    def update_progress(self, processed):
-        if hasattr(self, 'total_rows') and self.total_rows > 0:
-            percent = int(processed / self.total_rows * 100)
+    def update_progress(self, job_id, progress: ExportProgress):
+        if job_id != self.current_job_id:
+            return
+        speed_text = f"{progress.rows_per_second:,.0f} 行/秒"
+        if progress.total_rows > 0:
+            percent = int(progress.processed_rows / progress.total_rows * 100)
+            total_text = str(progress.total_rows)
+            if progress.is_estimate:
+                # 估算值可能小于实际行数，完成前不显示 100%
+                percent = min(percent, 99)
+                total_text = f"约 {total_text}"
+            eta_text = self._format_seconds(progress.eta_seconds) if progress.eta_seconds is not None else "--"
             self.progress_label.setText(
-                f"导出进度: {processed}/{self.total_rows} ({percent}%)"
+                f"导出进度: {progress.processed_rows}/{total_text} ({percent}%)  {speed_text}  剩余: {eta_text}"
             )
             self.progress_bar.setValue(percent)
         else:
-            self.progress_label.setText(f"已处理: {processed} 行")
+            self.progress_label.setText(f"已处理: {progress.processed_rows} 行  {speed_text}")
+
+    @staticmethod
+    def _format_seconds(seconds: float) -> str:
+        minutes, seconds = divmod(int(seconds), 60)
+        hours, minutes = divmod(minutes, 60)
+        return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
 
     def cancel_export(self):
-        """取消正在进行的导出"""
-        if self.export_in_progress:
+        """取消当前脚本正在进行的导出"""
+        if self.current_job_id is not None:
             # 调用导出器的取消方法
-            self.exporter.cancel_export()
-            self.export_in_progress = False
+            self.exporter.cancel_export(self.current_job_id)
+            self.current_job_id = None
             self._toggle_ui_status(False)
             self.progress_label.setText("导出已取消")
             self.progress_bar.setValue(0)
 
             QMessageBox.information(self, "信息", "导出操作已取消")
 
-    def export_finished(self, message):
-        self.export_in_progress = False
+    def export_finished(self, job_id, message, stats: ExportStats):
+        # 其他脚本的任务结果在任务列表中查看
+        if job_id != self.current_job_id:
+            return
+        self.current_job_id = None
         # 重新启用按钮
         self._toggle_ui_status(False)
-        # 隐藏进度条
-        self.progress_bar.setVisible(False)
-        self.progress_bar.setValue(0)
-        self.progress_label.setVisible(False)
+        self._hide_progress()
+        self.stats_label.setText(self._format_stats(stats))
+        self.stats_label.setVisible(True)
 
         # 显示完成消息
         QMessageBox.information(self, "完成", message)
 
-    def export_failed(self, message):
-        self.export_in_progress = False
+    @classmethod
+    def _format_stats(cls, stats: ExportStats) -> str:
+        summary = (f"总耗时 {stats.elapsed_seconds:.2f} 秒，输出 {stats.output_bytes / 1024 / 1024:,.1f} MB，"
+                   f"峰值内存 {stats.peak_rss_bytes / 1024 / 1024:,.0f} MB")
+        stage_texts = []
+        for stage in STAGES:
+            stage_stats = stats.stages.get(stage)
+            if not stage_stats:
+                continue
+            text = f"{cls.STAGE_NAMES[stage]} {stage_stats.seconds:.2f} 秒"
+            if stage_stats.batches:
+                text += f"({stage_stats.rows} 行, {stage_stats.batches} 批)"
+            stage_texts.append(text)
+        if stats.extractions:
+            summary += "，拉取方式 " + "、".join(cls.EXTRACTION_NAMES.get(extraction, extraction)
+                                              for extraction in stats.extractions)
+        return summary + "\n" + "  ".join(stage_texts)
+
+    def export_failed(self, job_id, message):
+        if job_id != self.current_job_id:
+            return
+        self.current_job_id = None
         # 重新启用按钮
         self._toggle_ui_status(False)
+        self._hide_progress()
+        # 显示错误消息
+        QMessageBox.critical(self, "错误", message)
+
+    def _on_job_updated(self, job_id):
+        # 在任务列表中取消了当前脚本的任务
+        job = self.exporter.jobs.get(job_id)
+        if job_id == self.current_job_id and job and job.status == ExportJobStatus.CANCELLED:
+            self.current_job_id = None
+            self._toggle_ui_status(False)
+            self._hide_progress()
+        # 导出任务结束后水位可能已更新
+        if job and job.script_name == self.current_script_name and not job.is_active:
+            self._refresh_watermark()
+            self._refresh_resume()
+
+    def _sync_job_state(self):
+        """切换脚本时恢复该脚本正在执行的导出任务的进度显示"""
+        job = self.exporter.active_job_for_script(self.current_script_name) if self.current_script_name else None
+        self.current_job_id = job.job_id if job else None
+        self._toggle_ui_status(job is not None)
+        if not job:
+            self._hide_progress()
+            return
+
+        self.progress_bar.setVisible(True)
+        self.progress_label.setVisible(True)
+        if job.progress:
+            self.set_total_rows(job.job_id, job.progress.total_rows)
+            self.update_progress(job.job_id, job.progress)
+        else:
+            self.progress_bar.setRange(0, 100)
+            self.progress_bar.setValue(0)
+            self.progress_label.setText(job.status.value)
+
+    def _hide_progress(self):
         # 隐藏进度条
         self.progress_bar.setVisible(False)
         self.progress_bar.setValue(0)
         self.progress_label.setVisible(False)
-        # 显示错误消息
-        QMessageBox.critical(self, "错误", message)
 
     def _toggle_ui_status(self, exporting):
         """切换UI状态"""
         self.export_btn.setEnabled(not exporting)
+        self.resume_btn.setEnabled(not exporting)
         self.save_btn.setEnabled(not exporting)
         self.delete_btn.setEnabled(not exporting)
 
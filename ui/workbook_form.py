@@ -0,0 +1,225 @@
+from typing import Dict, List
+
+from PySide6.QtCore import Signal
+from PySide6.QtWidgets import (QWidget, QFormLayout, QLineEdit, QComboBox, QPushButton, QHBoxLayout, QVBoxLayout,
+                               QMessageBox, QSpinBox, QFileDialog, QTableWidget, QTableWidgetItem, QHeaderView,
+                               QAbstractItemView, QDialog)
+
+from core import workbook_service
+from core.exporter import Exporter
+from core.models import ScriptParameter, WorkbookJob, WorkbookSheet
+from ui.parameter_dialog import ParameterDialog
+
+
+class WorkbookForm(QWidget):
+    """工作簿：把多个脚本按顺序导出为同一个 Excel 文件的不同工作表"""
+    saved = Signal()
+    deleted = Signal(str)
+
+    def __init__(self, db, exporter: Exporter):
+        super().__init__()
+        self.db = db
+        self.exporter = exporter
+        self.mode = 'add'  # 'add' or 'edit'
+        self.current_name = ''
+        self.init_ui()
+
+    def init_ui(self):
+        layout = QFormLayout(self)
+
+        self.name_edit = QLineEdit()
+
+        # 工作表：名称(为空时使用脚本名称)、脚本，按表格顺序写入
+        self.sheets_table = QTableWidget(0, 2)
+        self.sheets_table.setHorizontalHeaderLabels(["工作表名称", "脚本"])
+        self.sheets_table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.sheets_table.verticalHeader().setVisible(False)
+        self.sheets_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        self.add_sheet_btn = QPushButton("添加")
+        self.add_sheet_btn.clicked.connect(lambda: self._add_sheet_row())
+        self.remove_sheet_btn = QPushButton("删除")
+        self.remove_sheet_btn.clicked.connect(self._remove_sheet_rows)
+        self.move_up_btn = QPushButton("上移")
+        self.move_up_btn.clicked.connect(lambda: self._move_sheet_row(-1))
+        self.move_down_btn = QPushButton("下移")
+        self.move_down_btn.clicked.connect(lambda: self._move_sheet_row(1))
+        sheet_btn_layout = QVBoxLayout()
+        sheet_btn_layout.addWidget(self.add_sheet_btn)
+        sheet_btn_layout.addWidget(self.remove_sheet_btn)
+        sheet_btn_layout.addWidget(self.move_up_btn)
+        sheet_btn_layout.addWidget(self.move_down_btn)
+        sheet_btn_layout.addStretch()
+        sheets_layout = QHBoxLayout()
+        sheets_layout.addWidget(self.sheets_table)
+        sheets_layout.addLayout(sheet_btn_layout)
+
+        self.max_concurrent_queries_spin = QSpinBox()
+        self.max_concurrent_queries_spin.setRange(1, 32)
+        self.max_concurrent_queries_spin.setValue(4)
+        self.max_concurrent_queries_spin.setToolTip("同时执行的查询数，每个查询占用一个数据库连接")
+
+        layout.addRow("名称:", self.name_edit)
+        layout.addRow("工作表:", sheets_layout)
+        layout.addRow("并发查询数:", self.max_concurrent_queries_spin)
+
+        # 按钮区域
+        btn_layout = QHBoxLayout()
+        self.save_btn = QPushButton("保存")
+        self.save_btn.setObjectName("save_btn")
+        self.save_btn.clicked.connect(self.save_workbook)
+
+        self.export_btn = QPushButton("导出")
+        self.export_btn.setObjectName("export_btn")
+        self.export_btn.clicked.connect(self.export_workbook)
+
+        self.delete_btn = QPushButton("删除")
+        self.delete_btn.setObjectName("delete_btn")
+        self.delete_btn.clicked.connect(self.delete_workbook)
+        self.delete_btn.setVisible(False)
+
+        btn_layout.addStretch()
+        btn_layout.addWidget(self.save_btn)
+        btn_layout.addWidget(self.export_btn)
+        btn_layout.addWidget(self.delete_btn)
+
+        layout.addRow(btn_layout)
+
+    def set_mode(self, mode, workbook: WorkbookJob = None):
+        self.mode = mode
+        self.sheets_table.setRowCount(0)
+        if mode == 'add':
+            self.name_edit.clear()
+            self.max_concurrent_queries_spin.setValue(4)
+            self.name_edit.setEnabled(True)
+            self.delete_btn.setVisible(False)
+            self.current_name = ''
+        elif mode == 'edit' and workbook:
+            self.name_edit.setText(workbook.name)
+            for sheet in workbook.sheets:
+                self._add_sheet_row(sheet)
+            self.max_concurrent_queries_spin.setValue(workbook.max_concurrent_queries)
+            self.name_edit.setEnabled(False)
+            self.delete_btn.setVisible(True)
+            self.current_name = workbook.name
+
+    def save_workbook(self):
+        name = self.name_edit.text().strip()
+        if not name:
+            QMessageBox.warning(self, "警告", "请输入工作簿名称")
+            return
+        sheets = self._read_sheets()
+        if not sheets:
+            QMessageBox.warning(self, "警告", "请至少添加一个工作表")
+            return
+        if not all(sheet.script_name for sheet in sheets):
+            QMessageBox.warning(self, "警告", "请为每个工作表选择脚本")
+            return
+        try:
+            workbook_service.check_sheet_names(sheets)
+        except ValueError as e:
+            QMessageBox.warning(self, "警告", str(e))
+            return
+
+        try:
+            with self.db.lock:
+                self.db.workbooks[name] = WorkbookJob(
+                    name=name,
+                    sheets=sheets,
+                    max_concurrent_queries=self.max_concurrent_queries_spin.value()
+                )
+                self.db.save()
+            self.current_name = name
+            self.saved.emit()
+            QMessageBox.information(self, "成功", "工作簿保存成功")
+        except Exception as e:
+            QMessageBox.critical(self, "错误", f"保存失败: {str(e)}")
+
+    def export_workbook(self):
+        workbook = self.db.workbooks.get(self.name_edit.text().strip())
+        if not workbook:
+            QMessageBox.warning(self, "警告", "请先保存工作簿")
+            return
+
+        params = None
+        script_parameters = self._script_parameters(workbook)
+        if script_parameters:
+            dialog = ParameterDialog(script_parameters, self, allow_multiple_values=False)
+            if dialog.exec() != QDialog.DialogCode.Accepted:
+                return
+            params = dialog.values()
+
+        file_path, _ = QFileDialog.getSaveFileName(self, "导出Excel文件", "", "Excel Files (*.xlsx)")
+        if file_path:
+            # 进度和结果在任务列表中查看
+            self.exporter.export_workbook(workbook.name, file_path, params)
+
+    def delete_workbook(self):
+        """删除当前工作簿"""
+        if not self.current_name:
+            return
+
+        # 确认对话框
+        reply = QMessageBox.question(
+            self,
+            "确认删除",
+            f"确定要删除工作簿 '{self.current_name}' 吗?\n此操作不可恢复!",
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
+        )
+
+        if reply == QMessageBox.StandardButton.Yes:
+            try:
+                with self.db.lock:
+                    del self.db.workbooks[self.current_name]
+                    self.db.save()
+                self.deleted.emit(self.current_name)  # 发射删除信号
+                QMessageBox.information(self, "成功", "工作簿已删除")
+
+                # 重置表单
+                self.set_mode('add')
+
+            except Exception as e:
+                QMessageBox.critical(self, "错误", f"删除失败: {str(e)}")
+
+    def _script_parameters(self, workbook: WorkbookJob) -> List[ScriptParameter]:
+        """各工作表脚本的参数，同名参数只填写一次"""
+        script_parameters: Dict[str, ScriptParameter] = {}
+        for sheet in workbook.sheets:
+            script = self.db.scripts.get(sheet.script_name)
+            for parameter in script.parameters if script else []:
+                script_parameters.setdefault(parameter.name, parameter)
+        return list(script_parameters.values())
+
+    def _add_sheet_row(self, sheet: WorkbookSheet = None):
+        row = self.sheets_table.rowCount()
+        self.sheets_table.insertRow(row)
+        script_combo = QComboBox()
+        script_combo.addItems(list(self.db.scripts.keys()))
+        if sheet:
+            script_combo.setCurrentText(sheet.script_name)
+        self.sheets_table.setItem(row, 0, QTableWidgetItem(sheet.sheet_name if sheet else ""))
+        self.sheets_table.setCellWidget(row, 1, script_combo)
+
+    def _remove_sheet_rows(self):
+        rows = sorted({index.row() for index in self.sheets_table.selectedIndexes()}, reverse=True)
+        for row in rows:
+            self.sheets_table.removeRow(row)
+
+    def _move_sheet_row(self, offset: int):
+        row = self.sheets_table.currentRow()
+        target = row + offset
+        if row < 0 or not 0 <= target < self.sheets_table.rowCount():
+            return
+        sheets = self._read_sheets()
+        sheets[row], sheets[target] = sheets[target], sheets[row]
+        self.sheets_table.setRowCount(0)
+        for sheet in sheets:
+            self._add_sheet_row(sheet)
+        self.sheets_table.selectRow(target)
+
+    def _read_sheets(self) -> List[WorkbookSheet]:
+        sheets = []
+        for row in range(self.sheets_table.rowCount()):
+            name_item = self.sheets_table.item(row, 0)
+            script_name = self.sheets_table.cellWidget(row, 1).currentText()
+            sheets.append(WorkbookSheet(script_name, name_item.text().strip() if name_item else ""))
+        return sheets
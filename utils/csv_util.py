@@ -0,0 +1,122 @@
+import base64
+import csv
+import gzip
+import io
+import os
+from typing import Any, List, IO
+
+from core.models import ColumnType, OutputCompression
+from utils.output_writer import OutputWriter, part_file_path
+
+
+def open_text_file(write_file_path: str, compression: OutputCompression = OutputCompression.NONE,
+                   append: bool = False) -> IO[str]:
+    """
+            以文本方式打开写入文件，按需边写边压缩.
+
+            参数:
+                write_file_path: 写入文件路径.
+                compression: 压缩方式，zstd 需要安装 zstandard.
+                append: 追加写入(gzip/zstd 追加为新的压缩帧，解压时与原内容连续).
+            """
+    mode = 'a' if append else 'w'
+    if compression == OutputCompression.GZIP:
+        return gzip.open(write_file_path, f'{mode}t', encoding='utf-8', newline='', compresslevel=6)
+    if compression == OutputCompression.ZSTD:
+        try:
+            import zstandard
+        except ImportError:
+            raise RuntimeError("zstd compression requires the 'zstandard' package")
+        raw = open(write_file_path, f'{mode}b')
+        stream = zstandard.ZstdCompressor().stream_writer(raw, closefd=True)
+        return io.TextIOWrapper(stream, encoding='utf-8', newline='')
+    if compression != OutputCompression.NONE:
+        raise ValueError(f"{compression.value} compression is not supported for CSV/TSV")
+    return open(write_file_path, mode, encoding='utf-8', newline='')
+
+
+class CsvWriter(OutputWriter):
+    """
+    流式写入 CSV/TSV 文件，可选 gzip/zstd 压缩.
+
+    参数:
+        write_file_path: 写入文件路径.
+        header_columns: 写入数据表头字段.
+        delimiter: 分隔符.
+        compression: 压缩方式.
+        max_rows_per_file: 每个文件最多写入的数据行数，超过后拆分为 name_2.csv …，0 表示不拆分.
+        append: 追加到已有文件，文件已有内容时不再写表头(增量导出).
+    """
+
+    def __init__(self, write_file_path: str, header_columns: Any, delimiter: str = ',',
+                 compression: OutputCompression = OutputCompression.NONE, max_rows_per_file: int = 0,
+                 append: bool = False):
+        super().__init__()
+        self.write_file_path = write_file_path
+        self.header_columns = list(header_columns)
+        self.delimiter = delimiter
+        self.compression = compression
+        self.max_rows_per_file = max_rows_per_file
+        self.append = append
+        self.bytes_columns: List[int] = []  # 需要转为文本的二进制列
+        self.file = None
+        self.writer = None
+        self.file_rows = 0
+        self._open_file()
+
+    def set_column_types(self, column_types: List[ColumnType], description: Any = None):
+        super().set_column_types(column_types, description)
+        self.bytes_columns = [index for index, column_type in enumerate(column_types)
+                              if column_type == ColumnType.BYTES]
+
+    def write_rows(self, rows: List[Any]):
+        if self.bytes_columns:
+            rows = [self._encode_bytes(data) for data in rows]
+        start = 0
+        while start < len(rows):
+            if self.max_rows_per_file and self.file_rows >= self.max_rows_per_file:
+                self.file.close()
+                self._open_file()
+            room = self.max_rows_per_file - self.file_rows if self.max_rows_per_file else len(rows) - start
+            chunk = rows[start:start + room]
+            self.writer.writerows(chunk)
+            self.file_rows += len(chunk)
+            self.rows_written += len(chunk)
+            start += len(chunk)
+
+    def write_raw(self, text: str, rows: int):
+        """
+                直接写入已是 CSV 格式的文本(如 PostgreSQL COPY 的输出)，不经过 csv 模块.
+
+                参数:
+                    text: 以换行结尾的若干完整行.
+                    rows: 文本中的行数.
+                注意：不支持按行数拆分文件
+                """
+        self.file.write(text)
+        self.file_rows += rows
+        self.rows_written += rows
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+
+    def _encode_bytes(self, data: Any) -> List[Any]:
+        data = list(data)
+        for index in self.bytes_columns:
+            value = data[index]
+            if isinstance(value, (bytes, bytearray, memoryview)):
+                data[index] = base64.b64encode(bytes(value)).decode('ascii')
+        return data
+
+    def _open_file(self):
+        path = part_file_path(self.write_file_path, len(self.output_files) + 1)
+        has_content = self.append and os.path.exists(path) and os.path.getsize(path) > 0
+        self.file = open_text_file(path, self.compression, self.append)
+        # 与 PostgreSQL COPY 的输出一致使用 \n 换行
+        self.writer = csv.writer(self.file, delimiter=self.delimiter, lineterminator='\n')
+        if not has_content:
+            self.writer.writerow(self.header_columns)
+        self.output_files.append(path)
+        self.file_rows = 0
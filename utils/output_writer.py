@@ -0,0 +1,115 @@
+import os
+from typing import Any, List, Optional
+
+from core.models import ColumnType, OutputCompression, OutputFormat
+
+# 压缩格式对应的文件后缀
+COMPRESSION_EXTENSIONS = {
+    OutputCompression.NONE: "",
+    OutputCompression.GZIP: ".gz",
+    OutputCompression.ZSTD: ".zst",
+}
+
+
+class OutputWriter:
+    """
+    导出文件写入器接口：按批次流式写入数据行.
+
+    属性:
+        column_types: 每列的类型，未设置时为 None.
+        description: 查询结果的 cursor.description(列名、精度等).
+        rows_written: 已写入的数据行数.
+        output_files: 已生成的文件路径(拆分文件时有多个).
+    """
+
+    def __init__(self):
+        self.column_types: Optional[List[ColumnType]] = None
+        self.description: Any = None
+        self.rows_written = 0
+        self.output_files: List[str] = []
+
+    def set_column_types(self, column_types: List[ColumnType], description: Any = None):
+        """设置每列的类型(来自 cursor.description)"""
+        self.column_types = list(column_types)
+        self.description = description
+
+    def write_rows(self, rows: List[Any]):
+        pass
+
+    def close(self):
+        pass
+
+    def abort(self):
+        """放弃剩余的写入(导出取消或出错时)，默认与 close 相同"""
+        self.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def file_extension(output_format: OutputFormat, compression: OutputCompression = OutputCompression.NONE) -> str:
+    """导出格式的文件后缀，如 .xlsx、.csv.gz(Parquet 的压缩在文件内部，不改变后缀)"""
+    if output_format in (OutputFormat.XLSX, OutputFormat.PARQUET):
+        return f".{output_format.value}"
+    return f".{output_format.value}{COMPRESSION_EXTENSIONS[compression]}"
+
+
+def output_file_path(write_file_path: str, output_format: OutputFormat,
+                     compression: OutputCompression = OutputCompression.NONE) -> str:
+    """文件路径缺少导出格式的后缀时补上"""
+    extension = file_extension(output_format, compression)
+    return write_file_path if write_file_path.endswith(extension) else f"{write_file_path}{extension}"
+
+
+def part_file_path(write_file_path: str, part: int) -> str:
+    """第 part 个拆分文件的路径，第一个文件保持原路径，之后为 name_2.xlsx、name_3.csv.gz …"""
+    if part <= 1:
+        return write_file_path
+    return suffixed_file_path(write_file_path, str(part))
+
+
+def suffixed_file_path(write_file_path: str, suffix: str) -> str:
+    """在文件名与后缀之间插入 _suffix，如 name.csv.gz -> name_suffix.csv.gz"""
+    root, ext = os.path.splitext(write_file_path)
+    if ext in COMPRESSION_EXTENSIONS.values():
+        root, inner_ext = os.path.splitext(root)
+        ext = inner_ext + ext
+    return f"{root}_{suffix}{ext}"
+
+
+def create_output_writer(output_format: OutputFormat, write_file_path: str, header_columns: Any,
+                         compression: OutputCompression = OutputCompression.NONE,
+                         max_rows_per_file: int = 0, decimal_as_text: bool = False,
+                         processes: int = 1, append: bool = False) -> OutputWriter:
+    """
+            按导出格式创建写入器.
+
+            参数:
+                output_format: 导出格式.
+                write_file_path: 写入文件路径.
+                header_columns: 写入数据表头字段.
+                compression: CSV/TSV 文件或 Parquet 列数据的压缩方式.
+                max_rows_per_file: 每个文件最多写入的数据行数，0 表示不拆分.
+                decimal_as_text: 超过 Excel 精度的 Decimal 以文本写入(仅 XLSX).
+                processes: 拆分文件时并行写入 XLSX 的进程数，1 表示在当前线程写入.
+                append: 追加到已有文件(仅 CSV/TSV).
+            """
+    # 按需导入，未使用的格式不加载其依赖
+    if output_format == OutputFormat.XLSX:
+        from utils.xlsxwriter_util import ExcelWriter, ParallelExcelWriter
+        if processes > 1 and max_rows_per_file:
+            return ParallelExcelWriter(write_file_path, header_columns, max_rows_per_file, decimal_as_text, processes)
+        return ExcelWriter(write_file_path, header_columns, max_rows_per_file, decimal_as_text)
+    if output_format == OutputFormat.PARQUET:
+        from utils.parquet_util import ParquetWriter
+        return ParquetWriter(write_file_path, header_columns, compression, max_rows_per_file)
+
+    from utils.csv_util import CsvWriter
+    delimiter = '\t' if output_format == OutputFormat.TSV else ','
+    return CsvWriter(write_file_path, header_columns, delimiter, compression, max_rows_per_file, append)
@@ -0,0 +1,184 @@
+import datetime
+import json
+from typing import Any, List, Optional
+
+from core.models import ColumnType, OutputCompression
+from utils.output_writer import OutputWriter, part_file_path
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # 可选依赖，仅导出 Parquet 时需要
+    pyarrow = None
+
+# 累积到该行数后写出一个 row group，避免每个 fetchmany 批次都生成很小的 row group
+ROW_GROUP_ROWS = 65536
+# Arrow decimal128 支持的最大精度
+MAX_DECIMAL_PRECISION = 38
+PARQUET_COMPRESSIONS = {
+    OutputCompression.NONE: 'none',
+    OutputCompression.GZIP: 'gzip',
+    OutputCompression.ZSTD: 'zstd',
+    OutputCompression.SNAPPY: 'snappy',
+}
+
+
+def arrow_type(column_type: ColumnType, column_description: Any = None) -> Any:
+    """
+            列类型对应的 Arrow 类型.
+
+            参数:
+                column_type: 列类型.
+                column_description: 该列的 cursor.description，用于确定 Decimal 的精度和小数位.
+            """
+    if column_type == ColumnType.INTEGER:
+        return pyarrow.int64()
+    if column_type == ColumnType.NUMBER:
+        return pyarrow.float64()
+    if column_type == ColumnType.DECIMAL:
+        precision = column_description[4] if column_description else None
+        scale = column_description[5] if column_description else None
+        # 未声明精度的 numeric 无法确定小数位，以文本保存
+        if not precision or scale is None or precision > MAX_DECIMAL_PRECISION:
+            return pyarrow.string()
+        return pyarrow.decimal128(precision, scale)
+    if column_type == ColumnType.DATETIME:
+        return pyarrow.timestamp('us')
+    if column_type == ColumnType.DATE:
+        return pyarrow.date32()
+    if column_type == ColumnType.TIME:
+        return pyarrow.time64('us')
+    if column_type == ColumnType.BOOLEAN:
+        return pyarrow.bool_()
+    if column_type == ColumnType.BYTES:
+        return pyarrow.binary()
+    return pyarrow.string()
+
+
+def _coerce(value: Any, value_type: Any) -> Any:
+    """把驱动返回的值转换为 Arrow 可接受的值(如 MySQL TIME 返回的 timedelta)"""
+    if value is None:
+        return None
+    if pyarrow.types.is_string(value_type):
+        if isinstance(value, str):
+            return value
+        if isinstance(value, (dict, list)):
+            return json.dumps(value, ensure_ascii=False, default=str)
+        return str(value)
+    if pyarrow.types.is_binary(value_type):
+        return bytes(value) if isinstance(value, (bytes, bytearray, memoryview)) else str(value).encode('utf-8')
+    if pyarrow.types.is_time(value_type) and isinstance(value, datetime.timedelta):
+        return (datetime.datetime.min + value).time() if datetime.timedelta(0) <= value < datetime.timedelta(1) else None
+    return value
+
+
+def _to_array(values: Any, value_type: Any) -> Any:
+    try:
+        return pyarrow.array(values, type=value_type)
+    except (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError, OverflowError, TypeError, ValueError):
+        pass
+    values = [_coerce(value, value_type) for value in values]
+    try:
+        return pyarrow.array(values, type=value_type)
+    except (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError, OverflowError, TypeError, ValueError):
+        # 仍无法转换的值(如 MySQL 的零日期)写为 null
+        return pyarrow.array([_convertible_or_none(value, value_type) for value in values], type=value_type)
+
+
+def _convertible_or_none(value: Any, value_type: Any) -> Any:
+    try:
+        pyarrow.scalar(value, type=value_type)
+        return value
+    except (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError, OverflowError, TypeError, ValueError):
+        return None
+
+
+class ParquetWriter(OutputWriter):
+    """
+    把每个拉取批次转换为 Arrow record batch，累积到 ROW_GROUP_ROWS 行后写出一个 Parquet row group.
+
+    参数:
+        write_file_path: 写入文件路径.
+        header_columns: 列名.
+        compression: 列数据的压缩方式.
+        max_rows_per_file: 每个文件最多写入的数据行数，超过后拆分为 name_2.parquet …，0 表示不拆分.
+    注意：Arrow schema 在 set_column_types 时根据 cursor.description 确定，文件在首次写入时创建
+    """
+
+    def __init__(self, write_file_path: str, header_columns: Any,
+                 compression: OutputCompression = OutputCompression.SNAPPY, max_rows_per_file: int = 0):
+        if pyarrow is None:
+            raise RuntimeError("Parquet export requires the 'pyarrow' package")
+        super().__init__()
+        self.write_file_path = write_file_path
+        self.header_columns = list(header_columns)
+        self.compression = PARQUET_COMPRESSIONS[compression]
+        self.max_rows_per_file = max_rows_per_file
+        self.schema: Optional[Any] = None
+        self.writer = None
+        self.pending: List[Any] = []  # 尚未写出的 record batch
+        self.pending_rows = 0
+        self.file_rows = 0
+
+    def set_column_types(self, column_types: List[ColumnType], description: Any = None):
+        super().set_column_types(column_types, description)
+        fields = []
+        for index, column_type in enumerate(column_types):
+            column_description = description[index] if description else None
+            if index < len(self.header_columns):
+                name = self.header_columns[index]
+            else:
+                name = column_description[0] if column_description else f"column_{index + 1}"
+            fields.append(pyarrow.field(name, arrow_type(column_type, column_description)))
+        self.schema = pyarrow.schema(fields)
+
+    def write_rows(self, rows: List[Any]):
+        if self.schema is None:
+            # 未设置列类型时全部按文本写入
+            self.set_column_types([ColumnType.STRING] * (len(rows[0]) if rows else len(self.header_columns)))
+        start = 0
+        while start < len(rows):
+            if self.writer is None:
+                self._open_file()
+            room = self.max_rows_per_file - self.file_rows if self.max_rows_per_file else len(rows) - start
+            chunk = rows[start:start + room]
+            self.pending.append(self._to_record_batch(chunk))
+            self.pending_rows += len(chunk)
+            self.file_rows += len(chunk)
+            self.rows_written += len(chunk)
+            start += len(chunk)
+            if self.pending_rows >= ROW_GROUP_ROWS:
+                self._flush_row_group()
+            if self.max_rows_per_file and self.file_rows >= self.max_rows_per_file:
+                self._close_file()
+
+    def close(self):
+        if self.writer is None and not self.output_files:
+            # 没有数据时也生成只包含表头的文件
+            if self.schema is None:
+                self.set_column_types([ColumnType.STRING] * len(self.header_columns))
+            self._open_file()
+        self._close_file()
+
+    def _to_record_batch(self, rows: List[Any]) -> Any:
+        columns = list(zip(*rows)) if rows else [()] * len(self.schema)
+        arrays = [_to_array(values, field.type) for values, field in zip(columns, self.schema)]
+        return pyarrow.RecordBatch.from_arrays(arrays, schema=self.schema)
+
+    def _flush_row_group(self):
+        if self.pending:
+            self.writer.write_table(pyarrow.Table.from_batches(self.pending, schema=self.schema))
+            self.pending = []
+            self.pending_rows = 0
+
+    def _open_file(self):
+        path = part_file_path(self.write_file_path, len(self.output_files) + 1)
+        self.writer = pyarrow.parquet.ParquetWriter(path, self.schema, compression=self.compression)
+        self.output_files.append(path)
+        self.file_rows = 0
+
+    def _close_file(self):
+        if self.writer is not None:
+            self._flush_row_group()
+            self.writer.close()
+            self.writer = None
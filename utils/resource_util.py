@@ -0,0 +1,23 @@
+import sys
+
+try:
+    import resource
+except ImportError:  # Windows 没有 resource 模块
+    resource = None
+
+try:
+    import psutil
+except ImportError:  # 可选依赖，Windows 上统计内存时需要
+    psutil = None
+
+
+def peak_rss_bytes() -> int:
+    """当前进程的峰值常驻内存(字节)，无法获取时返回 0"""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # macOS 以字节为单位，Linux 以 KB 为单位
+        return peak if sys.platform == 'darwin' else peak * 1024
+    if psutil is not None:
+        memory = psutil.Process().memory_info()
+        return getattr(memory, 'peak_wset', memory.rss)
+    return 0
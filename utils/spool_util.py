@@ -0,0 +1,52 @@
+import os
+import pickle
+import tempfile
+from typing import Any, Iterator, List
+
+
+class SpoolWriter:
+    """
+    将数据批次顺序写入临时文件(每个批次一个 pickle 帧)，用于暂存尚未轮到写入 Excel 的数据.
+
+    参数:
+        directory: 临时文件目录，默认使用系统临时目录.
+    """
+
+    def __init__(self, directory: str = None):
+        fd, self.path = tempfile.mkstemp(prefix="sql2excel_", suffix=".spool", dir=directory)
+        self.file = os.fdopen(fd, 'wb')
+        self.rows = 0
+
+    def write_batch(self, batch: List[Any]):
+        pickle.dump(batch, self.file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.rows += len(batch)
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        if exc_type is not None:
+            # 出错时调用方拿不到路径，在此删除
+            remove_spool(self.path)
+
+
+def read_batches(path: str) -> Iterator[List[Any]]:
+    """按写入顺序读取暂存文件中的数据批次"""
+    with open(path, 'rb') as f:
+        while True:
+            try:
+                yield pickle.load(f)
+            except EOFError:
+                return
+
+
+def remove_spool(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
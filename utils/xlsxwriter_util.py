@@ -1,9 +1,34 @@
-from typing import List, Any
+import base64
+import json
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from decimal import Decimal
+from typing import Callable, Dict, List, Any, Optional
 
 import xlsxwriter
 from xlsxwriter import Workbook
+from xlsxwriter.format import Format
 from xlsxwriter.worksheet import Worksheet
 
+from core.models import ColumnType
+from utils import spool_util
+from utils.output_writer import OutputWriter, part_file_path
+
+# Excel 单个工作表的最大行数(含表头)
+MAX_SHEET_ROWS = 1048576
+# 工作表名称的最大长度
+MAX_SHEET_NAME_LENGTH = 31
+# Excel 数值的最大有效数字位数
+EXCEL_NUMBER_PRECISION = 15
+# 流式写入；带时区的时间去掉时区后写入(Excel 不支持时区)
+WORKBOOK_OPTIONS = {'constant_memory': True, 'remove_timezone': True}
+# 日期时间列的单元格格式
+DATETIME_FORMATS = {
+    ColumnType.DATETIME: 'yyyy-mm-dd hh:mm:ss',
+    ColumnType.DATE: 'yyyy-mm-dd',
+    ColumnType.TIME: 'hh:mm:ss',
+}
+
 
 def create_worksheet(write_file_path: str, header_columns: Any) -> tuple[Workbook, Worksheet]:
     """
@@ -14,8 +39,76 @@ def create_worksheet(write_file_path: str, header_columns: Any) -> tuple[Workboo
                 columns: 写入数据表头字段
             注意：数据从第一行开始写入
             """
-    workbook = xlsxwriter.Workbook(write_file_path, {'constant_memory': True})
-    worksheet = workbook.add_worksheet("data")
+    workbook = xlsxwriter.Workbook(write_file_path, WORKBOOK_OPTIONS)
+    worksheet = _add_data_sheet(workbook, "data", header_columns)
+    return workbook, worksheet
+
+
+def build_cell_writers(worksheet: Worksheet, column_types: List[ColumnType], formats: Dict[ColumnType, Format],
+                       decimal_as_text: bool = False) -> List[Callable[[int, int, Any], Any]]:
+    """
+            按列类型生成每列的写入函数，绕过 worksheet.write 对每个单元格的类型判断.
+
+            参数:
+                worksheet: 写入的工作表.
+                column_types: 每列的类型(来自 cursor.description).
+                formats: 日期时间列使用的单元格格式.
+                decimal_as_text: 超过 Excel 精度的 Decimal 以文本写入.
+            """
+    return [_cell_writer(worksheet, column_type, formats, decimal_as_text) for column_type in column_types]
+
+
+def _cell_writer(worksheet: Worksheet, column_type: ColumnType, formats: Dict[ColumnType, Format],
+                 decimal_as_text: bool) -> Callable[[int, int, Any], Any]:
+    if column_type in (ColumnType.NUMBER, ColumnType.INTEGER):
+        return worksheet.write_number
+    if column_type == ColumnType.DECIMAL:
+        if decimal_as_text:
+            return lambda row, col, value: _write_decimal(worksheet, row, col, value)
+        return worksheet.write_number
+    if column_type in DATETIME_FORMATS:
+        cell_format = formats[column_type]
+        return lambda row, col, value: worksheet.write_datetime(row, col, value, cell_format)
+    if column_type == ColumnType.BOOLEAN:
+        return worksheet.write_boolean
+    if column_type == ColumnType.BYTES:
+        return lambda row, col, value: worksheet.write_string(row, col, _to_text(value))
+    return lambda row, col, value: worksheet.write_string(row, col, value if isinstance(value, str) else _to_text(value))
+
+
+def _write_decimal(worksheet: Worksheet, row: int, col: int, value: Decimal):
+    if isinstance(value, Decimal) and len(value.as_tuple().digits) > EXCEL_NUMBER_PRECISION:
+        worksheet.write_string(row, col, str(value))
+    else:
+        worksheet.write_number(row, col, value)
+
+
+def _to_text(value: Any) -> str:
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return base64.b64encode(bytes(value)).decode('ascii')
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False, default=str)
+    return str(value)
+
+
+def _write_fallback(worksheet: Worksheet, row: int, col: int, value: Any):
+    """值与列类型不符时(如 MySQL 的零日期字符串)退回通用写入"""
+    try:
+        worksheet.write(row, col, value)
+    except (TypeError, ValueError, OverflowError):
+        worksheet.write_string(row, col, _to_text(value))
+
+
+def sheet_part_name(sheet_name: str, part: int) -> str:
+    """数据行超过工作表上限时续写的工作表名称：data、data_2、data_3 …(截断后不超过名称长度上限)"""
+    if part <= 1:
+        return sheet_name
+    suffix = f"_{part}"
+    return sheet_name[:MAX_SHEET_NAME_LENGTH - len(suffix)] + suffix
+
+
+def _add_data_sheet(workbook: Workbook, sheet_name: str, header_columns: Any) -> Worksheet:
+    worksheet = workbook.add_worksheet(sheet_name)
     # 写 ExcelHeader
     header_format = workbook.add_format({
         'bold': True,  # 加粗
@@ -23,5 +116,243 @@ def create_worksheet(write_file_path: str, header_columns: Any) -> tuple[Workboo
         'bg_color': '#92D050',  # 背景颜色
     })
     worksheet.write_row('A1', header_columns, header_format)
+    return worksheet
 
-    return workbook, worksheet
+
+class ExcelWriter(OutputWriter):
+    """
+    流式写入 Excel，数据行超过工作表上限时自动新建 data_2、data_3 … 工作表并重复表头.
+
+    参数:
+        write_file_path: 写入文件路径.
+        header_columns: 写入数据表头字段.
+        max_rows_per_file: 每个文件最多写入的数据行数，超过后拆分为 name_2.xlsx …，0 表示不拆分.
+        decimal_as_text: 超过 Excel 精度的 Decimal 以文本写入.
+        sheet_name: 工作表名称，续写的工作表依次加上 _2、_3 …
+    注意：调用 set_column_types 后按列类型写入，否则使用通用的 write_row
+    """
+
+    def __init__(self, write_file_path: str, header_columns: Any, max_rows_per_file: int = 0,
+                 decimal_as_text: bool = False, sheet_name: str = "data"):
+        super().__init__()
+        self.write_file_path = write_file_path
+        self.header_columns = list(header_columns)
+        self.sheet_name = sheet_name
+        self.max_rows_per_file = max_rows_per_file
+        self.decimal_as_text = decimal_as_text
+        self.cell_writers = None
+        self.formats: Dict[ColumnType, Format] = {}
+        self.workbook = None
+        self.worksheet = None
+        self.sheet_count = 0
+        self.sheet_names = set()  # 当前文件中已使用的工作表名称(小写，Excel 不区分大小写)
+        self.sheet_row = 0  # 当前工作表下一个写入行
+        self.file_rows = 0  # 当前文件已写入的数据行数
+        self._open_file()
+
+    def write_rows(self, rows: List[Any]):
+        start = 0
+        while start < len(rows):
+            if self.max_rows_per_file and self.file_rows >= self.max_rows_per_file:
+                self.workbook.close()
+                self._open_file()
+            if self.sheet_row >= MAX_SHEET_ROWS:
+                self._add_sheet()
+
+            # 本次最多可写入的行数受工作表和文件两个上限约束
+            room = MAX_SHEET_ROWS - self.sheet_row
+            if self.max_rows_per_file:
+                room = min(room, self.max_rows_per_file - self.file_rows)
+            chunk = rows[start:start + room]
+            if self.cell_writers is None:
+                worksheet = self.worksheet
+                row = self.sheet_row
+                for data in chunk:
+                    worksheet.write_row(row, 0, data)
+                    row += 1
+                self.sheet_row = row
+            else:
+                self._write_typed_rows(chunk)
+            self.file_rows += len(chunk)
+            self.rows_written += len(chunk)
+            start += len(chunk)
+
+    def set_column_types(self, column_types: List[ColumnType], description: Any = None):
+        """设置每列的类型，之后写入的行按列类型直接调用对应的写入方法"""
+        super().set_column_types(column_types, description)
+        self._bind_cell_writers()
+
+    def _write_typed_rows(self, rows: List[Any]):
+        worksheet = self.worksheet
+        cell_writers = self.cell_writers
+        row = self.sheet_row
+        for data in rows:
+            for col, value in enumerate(data):
+                if value is None:
+                    continue
+                try:
+                    cell_writers[col](row, col, value)
+                except (TypeError, ValueError, OverflowError, IndexError):
+                    _write_fallback(worksheet, row, col, value)
+            row += 1
+        self.sheet_row = row
+
+    def _bind_cell_writers(self):
+        if self.column_types is None:
+            return
+        self.cell_writers = build_cell_writers(self.worksheet, self.column_types, self.formats,
+                                               self.decimal_as_text)
+
+    def close(self):
+        if self.workbook:
+            self.workbook.close()
+            self.workbook = None
+
+    def _open_file(self):
+        path = part_file_path(self.write_file_path, len(self.output_files) + 1)
+        self.workbook = xlsxwriter.Workbook(path, WORKBOOK_OPTIONS)
+        # 日期时间格式属于工作簿，每个文件缓存一份
+        self.formats = {column_type: self.workbook.add_format({'num_format': num_format})
+                        for column_type, num_format in DATETIME_FORMATS.items()}
+        self.output_files.append(path)
+        self.sheet_count = 0
+        self.sheet_names = set()
+        self.file_rows = 0
+        self._add_sheet()
+
+    def _add_sheet(self):
+        self.sheet_count += 1
+        sheet_name = sheet_part_name(self.sheet_name, self.sheet_count)
+        # 续写的名称可能已被占用(如长名称截断后相同)，跳过已使用的编号
+        while sheet_name.lower() in self.sheet_names:
+            self.sheet_count += 1
+            sheet_name = sheet_part_name(self.sheet_name, self.sheet_count)
+        self.sheet_names.add(sheet_name.lower())
+        self.worksheet = _add_data_sheet(self.workbook, sheet_name, self.header_columns)
+        self.sheet_row = 1
+        self._bind_cell_writers()
+
+
+class WorkbookWriter(ExcelWriter):
+    """
+    把多个查询结果依次写入同一个工作簿的不同工作表，单个结果超过工作表行数上限时续写到 name_2 ….
+
+    参数:
+        write_file_path: 写入文件路径.
+        sheet_name: 第一个工作表的名称.
+        header_columns: 第一个工作表的表头.
+        decimal_as_text: 第一个工作表中超过 Excel 精度的 Decimal 以文本写入.
+    注意：constant_memory 模式下新建工作表时之前的工作表即已写完，因此各工作表须按顺序逐个写完；
+    工作表名称需事先检查，不能与其它工作表续写时的名称相同
+    """
+
+    def __init__(self, write_file_path: str, sheet_name: str, header_columns: Any, decimal_as_text: bool = False):
+        super().__init__(write_file_path, header_columns, decimal_as_text=decimal_as_text, sheet_name=sheet_name)
+
+    def start_sheet(self, sheet_name: str, header_columns: Any, decimal_as_text: bool = False):
+        """开始写入下一个工作表，之后需重新设置列类型"""
+        self.sheet_name = sheet_name
+        self.header_columns = list(header_columns)
+        self.decimal_as_text = decimal_as_text
+        self.column_types = None
+        self.description = None
+        self.cell_writers = None
+        self.sheet_count = 0
+        self._add_sheet()
+
+
+def _write_part_file(spool_path: str, write_file_path: str, header_columns: List[str],
+                     column_types: Optional[List[ColumnType]], decimal_as_text: bool) -> int:
+    """在子进程中把一个拆分文件的暂存数据写为工作簿，返回写入的行数"""
+    with ExcelWriter(write_file_path, header_columns, decimal_as_text=decimal_as_text) as writer:
+        if column_types is not None:
+            writer.set_column_types(column_types)
+        for batch in spool_util.read_batches(spool_path):
+            writer.write_rows(batch)
+    return writer.rows_written
+
+
+class ParallelExcelWriter(OutputWriter):
+    """
+    拆分文件时使用进程池并行生成各个工作簿，绕开 GIL 对 XML 序列化的限制.
+
+    当前进程只把数据行按 max_rows_per_file 切分并暂存到临时文件，每满一个文件就交给子进程，
+    由子进程使用 ExcelWriter(constant_memory，超出工作表行数上限时同样新建工作表)写出.
+
+    参数:
+        write_file_path: 写入文件路径.
+        header_columns: 写入数据表头字段.
+        max_rows_per_file: 每个文件最多写入的数据行数，必须大于 0.
+        decimal_as_text: 超过 Excel 精度的 Decimal 以文本写入.
+        processes: 子进程数.
+    注意：同一个工作簿无法由多个进程分别写入后合并，因此只在拆分文件时并行
+    """
+
+    def __init__(self, write_file_path: str, header_columns: Any, max_rows_per_file: int,
+                 decimal_as_text: bool = False, processes: int = 2):
+        super().__init__()
+        self.write_file_path = write_file_path
+        self.header_columns = list(header_columns)
+        self.max_rows_per_file = max_rows_per_file
+        self.decimal_as_text = decimal_as_text
+        self.processes = processes
+        # spawn 启动子进程，避免在带有线程的进程(Qt、拉取线程)中 fork
+        self.executor = ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context('spawn'))
+        self.futures: List[Future] = []
+        self.spool_paths: List[str] = []
+        self.spool: Optional[spool_util.SpoolWriter] = None
+
+    def write_rows(self, rows: List[Any]):
+        start = 0
+        while start < len(rows):
+            if self.spool is None:
+                self._start_part()
+            chunk = rows[start:start + self.max_rows_per_file - self.spool.rows]
+            self.spool.write_batch(chunk)
+            self.rows_written += len(chunk)
+            start += len(chunk)
+            if self.spool.rows >= self.max_rows_per_file:
+                self._submit_part()
+
+    def close(self):
+        if self.executor is None:
+            return
+        try:
+            if self.spool is None and not self.output_files:
+                # 没有数据时也生成只包含表头的文件
+                self._start_part()
+            if self.spool is not None:
+                self._submit_part()
+            for future in self.futures:
+                future.result()
+        finally:
+            self._shutdown(cancel=False)
+
+    def abort(self):
+        if self.executor is None:
+            return
+        if self.spool is not None:
+            self.spool.close()
+        self._shutdown(cancel=True)
+
+    def _start_part(self):
+        self.spool = spool_util.SpoolWriter()
+        self.spool_paths.append(self.spool.path)
+        self.output_files.append(part_file_path(self.write_file_path, len(self.output_files) + 1))
+
+    def _submit_part(self):
+        self.spool.close()
+        # 暂存文件在磁盘上积压过多时等待最早的文件写完(背压)
+        pending = [future for future in self.futures if not future.done()]
+        if len(pending) >= self.processes * 2:
+            pending[0].result()
+        self.futures.append(self.executor.submit(
+            _write_part_file, self.spool.path, self.output_files[-1], self.header_columns, self.column_types,
+            self.decimal_as_text))
+        self.spool = None
+
+    def _shutdown(self, cancel: bool):
+        self.executor.shutdown(wait=True, cancel_futures=cancel)
+        self.executor = None
+        for spool_path in self.spool_paths:
+            spool_util.remove_spool(spool_path)